@@ -0,0 +1,221 @@
+import time
+import asyncio
+import logging
+import aiohttp
+import config
+import metrics
+import instruments
+from datetime import datetime, timezone
+from tick_records import Tick, TRADE, trade_key
+
+logger = logging.getLogger("Backfill")
+
+# --- Gap Detection / REST Backfill ---
+# Tracks the last trade per (market, symbol) as MarketFeed parses it. A hole is:
+#   * an aggTrade id jump (Binance ids are sequential per symbol), or
+#   * the span between the last trade before a reconnect and the first one after
+#     it (Bybit ids are not sequential, so the window is by time).
+# Each hole becomes a row in feed_gaps and is filled from the venue's historical
+# trades endpoint. Requests are bounded per venue (config.BACKFILL_CONCURRENCY)
+# so a reconnect storm can't burn the REST rate limit. Backfilled trades go
+# through MarketFeed.queue_put like live ones; trade-ID dedup drops overlap.
+
+OPEN, FILLED, PARTIAL, FAILED = "open", "filled", "partial", "failed"
+
+
+class Gap:
+    __slots__ = ("market", "symbol", "source", "reason", "from_id", "to_id", "start_ts", "end_ts",
+                 "ledger_id", "rows", "status", "error")
+
+    def __init__(self, market, symbol, source, reason, start_ts, end_ts, from_id=None, to_id=None):
+        self.market = market
+        self.symbol = symbol
+        self.source = source
+        self.reason = reason  # "reconnect" or "sequence"
+        self.start_ts = start_ts  # Last trade seen before the hole (epoch s)
+        self.end_ts = end_ts  # First trade seen after it
+        self.from_id = from_id  # Inclusive id range, when the venue has sequential ids
+        self.to_id = to_id
+        self.ledger_id = None
+        self.rows = 0
+        self.status = OPEN
+        self.error = None
+
+    def __repr__(self):
+        span = f"ids {self.from_id}-{self.to_id}" if self.from_id is not None else f"{self.end_ts - self.start_ts:.1f}s"
+        return f"<gap {self.market} {self.symbol} {span} ({self.reason})>"
+
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+class GapBackfill:
+    def __init__(self, feed):
+        self.feed = feed
+        self.last = {}  # (market, symbol) -> (trade seq or None, ts, source)
+        self.resumed = set()  # Keys whose next trade closes a reconnect hole
+        self.limits = {venue: asyncio.Semaphore(n) for venue, n in config.BACKFILL_CONCURRENCY.items()}
+        self.fetchers = {
+            "binance-futures": self.fetch_binance,
+            "binance-spot": self.fetch_binance,
+            "bybit-linear": self.fetch_bybit,
+        }
+
+    # --- Detection ---
+    def reconnected(self, market):
+        """A socket for `market` (re)connected: the next trade per known symbol closes the hole"""
+        self.resumed.update(key for key in self.last if key[0] == market)
+
+    def forget(self, symbol):
+        """Symbol was unsubscribed: a later re-subscribe must not look like one huge gap"""
+        for key in [k for k in self.last if k[1] == symbol]:
+            del self.last[key]
+            self.resumed.discard(key)
+
+    def on_trade(self, market, tick, seq=None):
+        key = (market, tick.symbol)
+        prev = self.last.get(key)
+        if prev is not None and seq is not None and prev[0] is not None and seq <= prev[0]:
+            return  # Replayed / out-of-order print, nothing moved forward
+        self.last[key] = (seq, tick.timestamp, tick.source)
+        if prev is None:
+            self.resumed.discard(key)
+            return
+        prev_seq, prev_ts, _ = prev
+        reconnect = key in self.resumed
+        self.resumed.discard(key)
+        gap = None
+        if seq is not None and prev_seq is not None:
+            if seq > prev_seq + 1:
+                gap = Gap(market, tick.symbol, tick.source, "reconnect" if reconnect else "sequence",
+                          prev_ts, tick.timestamp, from_id=prev_seq + 1, to_id=seq - 1)
+        elif reconnect and tick.timestamp > prev_ts:
+            gap = Gap(market, tick.symbol, tick.source, "reconnect", prev_ts, tick.timestamp)
+        if gap is not None:
+            metrics.counter("feed_gaps_total", market=market, reason=gap.reason).inc()
+            logger.warning(f"Detected {gap}")
+            if self.feed.running:  # Offline replay / benchmarks only count gaps
+                self.feed.spawn(self.fill(gap))
+
+    # --- Backfill ---
+    async def fill(self, gap):
+        fetch = self.fetchers.get(gap.market)
+        if fetch is None:
+            return
+        await self.ledger(self._open_gap, gap)
+        venue = gap.market.split("-")[0]
+        async with self.limits.get(venue) or asyncio.Semaphore(1):
+            try:
+                gap.status = await fetch(gap)
+            except Exception as e:
+                gap.status, gap.error = FAILED, str(e)[:500]
+                logger.error(f"Backfill {gap} failed: {e}")
+        metrics.counter("feed_backfill_rows_total", market=gap.market).inc(gap.rows)
+        metrics.counter("feed_backfills_total", market=gap.market, status=gap.status).inc()
+        logger.info(f"Backfill {gap}: {gap.status}, {gap.rows} trades")
+        await self.ledger(self._close_gap, gap)
+
+    async def _get(self, session, venue, url, params):
+        proxy = self.feed.proxy_manager.get_proxy(venue)
+        try:
+            async with session.get(url, params=params, proxy=proxy, ssl=False) as resp:
+                if resp.status != 200:
+                    raise aiohttp.ClientResponseError(resp.request_info, (), status=resp.status,
+                                                      message=(await resp.text())[:200])
+                return await resp.json()
+        except Exception as e:
+            self.feed.proxy_manager.report_failure(venue, proxy, e)
+            raise
+
+    async def fetch_binance(self, gap):
+        """Page /aggTrades by fromId until the id range is covered"""
+        if gap.market == "binance-futures":
+            url = f"{config.BINANCE_FUTURES_REST}/fapi/v1/aggTrades"
+        else:
+            url = f"{config.BINANCE_SPOT_REST}/api/v3/aggTrades"
+        next_id = gap.from_id
+        inst = instruments.intern(gap.market, gap.symbol)
+        async with aiohttp.ClientSession() as session:
+            while next_id <= gap.to_id:
+                if gap.rows >= config.BACKFILL_MAX_ROWS:
+                    return PARTIAL
+                page = await self._get(session, "binance", url, {"symbol": gap.symbol, "fromId": next_id,
+                                                      "limit": config.BACKFILL_PAGE_LIMIT})
+                if not page:
+                    return PARTIAL
+                for t in page:
+                    if t["a"] > gap.to_id:
+                        break
+                    await self.feed.queue_put(Tick(
+                        TRADE, float(t["T"]) / 1000, gap.symbol, float(t["p"]), volume=float(t["q"]),
+                        side="SELL" if t["m"] else "BUY", source=gap.source,
+                        trade_id=trade_key(gap.market, t["a"]), instrument=inst
+                    ), backfilled=True)
+                    gap.rows += 1
+                next_id = page[-1]["a"] + 1
+                await asyncio.sleep(config.BACKFILL_PAGE_DELAY)
+        return FILLED
+
+    async def fetch_bybit(self, gap):
+        """/v5/market/recent-trade only keeps the latest ~1000 prints per symbol; older holes are partial"""
+        url = f"{config.BYBIT_REST}/v5/market/recent-trade"
+        category = gap.market.split("-", 1)[1]
+        async with aiohttp.ClientSession() as session:
+            body = await self._get(session, "bybit", url, {"category": category, "symbol": gap.symbol,
+                                                  "limit": config.BACKFILL_PAGE_LIMIT})
+        if body.get("retCode"):
+            raise RuntimeError(body.get("retMsg"))
+        rows = body.get("result", {}).get("list", [])
+        inst = instruments.intern(gap.market, gap.symbol)
+        for t in rows:
+            ts = float(t["time"]) / 1000
+            if gap.start_ts < ts < gap.end_ts:
+                await self.feed.queue_put(Tick(
+                    TRADE, ts, gap.symbol, float(t["price"]), volume=float(t["size"]),
+                    side=t["side"].upper(), source=gap.source,
+                    trade_id=trade_key(gap.market, t["execId"]), instrument=inst
+                ), backfilled=True)
+                gap.rows += 1
+        oldest = min((float(t["time"]) / 1000 for t in rows), default=None)
+        covered = oldest is not None and (oldest <= gap.start_ts or len(rows) < config.BACKFILL_PAGE_LIMIT)
+        return FILLED if covered or not rows else PARTIAL
+
+    # --- Ledger (feed_gaps) ---
+    async def ledger(self, fn, gap):
+        if self.feed.db_pool is None:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, fn, gap)
+        except Exception as e:
+            logger.error(f"Gap ledger write failed for {gap}: {e}")
+
+    def _run(self, sql, args):
+        pool = self.feed.db_pool
+        conn = pool.get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, args)
+                row = cur.fetchone() if cur.description else None
+            conn.commit()
+            return row
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.put_conn(conn)
+
+    def _open_gap(self, gap):
+        row = self._run(
+            "INSERT INTO feed_gaps (market, symbol, reason, from_id, to_id, gap_start, gap_end, status) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id",
+            (gap.market, gap.symbol, gap.reason, gap.from_id, gap.to_id,
+             _utc(gap.start_ts), _utc(gap.end_ts), OPEN))
+        gap.ledger_id = row[0]
+
+    def _close_gap(self, gap):
+        if gap.ledger_id is None:
+            return
+        self._run(
+            "UPDATE feed_gaps SET status = %s, rows_filled = %s, filled_at = %s, error = %s WHERE id = %s",
+            (gap.status, gap.rows, _utc(time.time()), gap.error, gap.ledger_id))
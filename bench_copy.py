@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+import argparse
+import psycopg2
+from datetime import datetime
+
+import config
+from tick_records import Tick, DerivTicker, TRADE
+
+os.makedirs(config.LOG_DIR, exist_ok=True)
+import direct_feed
+
+# --- flush_batch Throughput Benchmark ---
+# Replays a synthetic Deribit-heavy tick mix through MarketFeed.flush_batch in each
+# DB_WRITE_MODE and reports rows/sec. Writes go to TEMP tables that shadow
+# market_ticks / derivatives_stats for this session only, so production data is untouched.
+
+SHADOW_DDL = """
+CREATE TEMP TABLE market_ticks (
+    time TIMESTAMPTZ NOT NULL, symbol TEXT NOT NULL, price DOUBLE PRECISION,
+    bid DOUBLE PRECISION, ask DOUBLE PRECISION, volume DOUBLE PRECISION,
+    source TEXT, side VARCHAR(4), trade_id TEXT, instrument_id INTEGER
+);
+CREATE TEMP TABLE derivatives_stats (
+    time TIMESTAMPTZ NOT NULL, symbol TEXT NOT NULL, funding_rate DOUBLE PRECISION,
+    open_interest DOUBLE PRECISION, turnover DOUBLE PRECISION, iv DOUBLE PRECISION,
+    delta DOUBLE PRECISION, gamma DOUBLE PRECISION, source TEXT,
+    expiry TIMESTAMPTZ, strike DOUBLE PRECISION, option_type VARCHAR(4), instrument_id INTEGER
+);
+"""
+
+
+def make_ticks(n, option_share=0.7):
+    """Synthetic mix of Deribit option tickers and Binance trades (records as built by parse_*)"""
+    now = time.time()
+    out = []
+    for i in range(n):
+        if random.random() < option_share:
+            strike = random.choice([50000, 60000, 70000, 80000, 90000])
+            out.append(DerivTicker(
+                now + i / 1000, f"BTC-27DEC24-{strike}-C", random.uniform(0.001, 0.2),
+                bid=0.01, ask=0.02, volume=random.uniform(0, 500), source="Deribit",
+                open_interest=random.uniform(0, 1000), iv=random.uniform(30, 90),
+                delta=random.random(), gamma=random.random() / 1000,
+                expiry=datetime(2024, 12, 27), strike=float(strike), option_type="CALL",
+                turnover=0.0, funding_rate=0.0,
+            ))
+        else:
+            out.append(Tick(
+                TRADE, now + i / 1000, "BTCUSDT", random.uniform(60000, 70000),
+                volume=random.uniform(0, 2), side=random.choice(["BUY", "SELL"]),
+                source="Binance_AggTrade", trade_id=f"binance-futures:{i}",
+            ))
+    return out
+
+
+def run_mode(conn, feed, mode, ticks, batch_size):
+    config.DB_WRITE_MODE = mode
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for i in range(0, len(ticks), batch_size):
+        feed.flush_batch(cursor, ticks[i:i + batch_size])
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    cursor.execute("SELECT (SELECT count(*) FROM market_ticks) + (SELECT count(*) FROM derivatives_stats)")
+    landed = cursor.fetchone()[0]
+    cursor.execute("TRUNCATE market_ticks, derivatives_stats")
+    conn.commit()
+    return len(ticks) / elapsed, landed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MarketFeed.flush_batch write modes")
+    parser.add_argument("--uri", default=config.DB_URI)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[config.BATCH_SIZE, 1000, 5000])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.uri)
+    with conn.cursor() as cur:
+        cur.execute(SHADOW_DDL)
+    conn.commit()
+
+    feed = direct_feed.MarketFeed(None, None)
+    ticks = make_ticks(args.rows)
+    print(f"--- flush_batch benchmark: {args.rows} rows (70% option tickers) ---")
+    for batch_size in args.batch:
+        for mode in ("insert", "copy", "copy_binary"):
+            rate, landed = run_mode(conn, feed, mode, ticks, batch_size)
+            print(f"batch={str(batch_size).ljust(5)} mode={mode.ljust(12)} {rate:>10.0f} rows/s  (landed {landed})")
+    conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
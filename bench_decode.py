@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import config
+
+os.makedirs(config.LOG_DIR, exist_ok=True)
+import direct_feed
+import ws_decoder
+
+# --- Frame Decode Benchmark ---
+# Frames/sec per exchange and decoder backend, decode only and decode + parse_*.
+# Frames mirror what the venues actually send, including the fields parse_* ignore.
+
+BINANCE_TRADE = json.dumps({"stream": "btcusdt@aggTrade", "data": {
+    "e": "aggTrade", "E": 1718000000123, "a": 2001234567, "s": "BTCUSDT", "p": "67012.10",
+    "q": "0.015", "f": 4001234567, "l": 4001234569, "T": 1718000000120, "m": True}})
+BINANCE_DEPTH = json.dumps({"stream": "btcusdt@depth@100ms", "data": {
+    "e": "depthUpdate", "E": 1718000000123, "T": 1718000000120, "s": "BTCUSDT",
+    "U": 5001, "u": 5010, "pu": 5000,
+    "b": [[f"{67000 - i * 0.1:.1f}", "1.250"] for i in range(5)],
+    "a": [[f"{67000.1 + i * 0.1:.1f}", "0.870"] for i in range(5)]}})
+BYBIT_TRADE = json.dumps({"topic": "publicTrade.BTCUSDT", "type": "snapshot", "ts": 1718000000123, "data": [
+    {"T": 1718000000120, "s": "BTCUSDT", "S": "Buy", "v": "0.010", "p": "67012.10", "L": "PlusTick",
+     "i": "8a7b6c5d-0000-4000-8000-000000000001", "BT": False}]})
+BYBIT_ACK = json.dumps({"success": True, "ret_msg": "", "conn_id": "abc", "op": "subscribe"})
+DERIBIT_TICKER = json.dumps({"jsonrpc": "2.0", "method": "subscription", "params": {
+    "channel": "ticker.BTC-27DEC24-60000-C.100ms", "data": {
+        "timestamp": 1718000000123, "stats": {"volume_usd": 1.2e6, "volume": 18.3, "price_change": 2.1,
+                                              "low": 0.051, "high": 0.061},
+        "state": "open", "settlement_price": 0.0562, "open_interest": 812.4, "min_price": 0.0405,
+        "max_price": 0.0755, "mark_price": 0.0571, "mark_iv": 54.31, "last_price": 0.057,
+        "interest_rate": 0, "instrument_name": "BTC-27DEC24-60000-C", "index_price": 67012.4,
+        "greeks": {"vega": 101.2, "theta": -31.4, "rho": 40.1, "gamma": 0.00002, "delta": 0.61},
+        "estimated_delivery_price": 67012.4, "bid_iv": 53.9, "best_bid_price": 0.0565,
+        "best_bid_amount": 12.0, "best_ask_price": 0.0575, "best_ask_amount": 9.5, "ask_iv": 54.8,
+        "underlying_price": 67500.2, "underlying_index": "BTC-27DEC24"}}})
+
+FRAMES = {
+    "binance": [BINANCE_TRADE, BINANCE_DEPTH],
+    "bybit": [BYBIT_TRADE, BYBIT_ACK],
+    "deribit": [DERIBIT_TICKER],
+}
+PARSERS = {"binance": "parse_binance", "bybit": "parse_bybit", "deribit": "parse_deribit"}
+
+
+def bench_decode(decode, frames, n):
+    start = time.perf_counter()
+    for i in range(n):
+        decode(frames[i % len(frames)])
+    return n / (time.perf_counter() - start)
+
+
+async def bench_parse(feed, venue, decode, frames, n):
+    parse = getattr(feed, PARSERS[venue])
+    start = time.perf_counter()
+    for i in range(n):
+        data = decode(frames[i % len(frames)])
+        if data is not None:
+            await parse(data["params"] if venue == "deribit" else data)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark websocket frame decoders")
+    parser.add_argument("--frames", type=int, default=200000)
+    args = parser.parse_args()
+
+    feed = direct_feed.MarketFeed(None, None)  # write_queue is None, so queue_put is a no-op
+    feed.running = False  # Book resync tasks exit immediately (no network)
+    backends = [b for b in ("json", "orjson", "msgspec") if ws_decoder.backend_name(b) == b]
+    print(f"--- Frame decode benchmark ({args.frames} frames per run) ---")
+    for venue, frames in FRAMES.items():
+        for backend in backends:
+            decode = ws_decoder.get_decoder(venue, backend)
+            d_rate = bench_decode(decode, frames, args.frames)
+            p_rate = asyncio.run(bench_parse(feed, venue, decode, frames, args.frames))
+            print(f"{venue.ljust(8)} {backend.ljust(8)} decode {d_rate:>10.0f} frames/s   decode+parse {p_rate:>10.0f} frames/s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
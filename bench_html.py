@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import tempfile
+import subprocess
+
+import news_extract
+
+# --- News Page Extraction Benchmark ---
+# Pages/sec and peak memory per news_extract backend over a set of saved pages.
+# Each backend runs in its own interpreter so ru_maxrss (which also sees the C
+# parsers' allocations) measures only that backend: peak RSS while parsing minus
+# RSS once the fixtures are loaded.
+#
+# Fixtures: a directory of saved pages named <host>[_anything].html (the host
+# picks the site rule, e.g. decrypt.co_home.html). Without --fixtures, synthetic
+# pages shaped like the real ones (script-heavy head, article cards, hydration
+# JSON at the end) are generated; --save writes them out for reuse.
+
+SITES = {
+    "decrypt.co": ('<article class="card"><a href="/{i}"><h3 class="title">{t}</h3></a><p>{p}</p></article>', 24),
+    "beincrypto.com": ('<div class="story-card"><span class="story-card-text">{t}</span><p>{p}</p></div>', 30),
+    "cointelegraph.com": ('<article class="post-card-inline"><a href="/{i}"><span class="post-card-inline__title">'
+                          '{t}</span></a><p class="post-card-inline__text">{p}</p></article>', 30),
+    "coindesk.com": ('<article><div class="card"><a class="card-title" href="/{i}"><h2>{t}</h2></a>'
+                     '<p>{p}</p></div></article>', 28),
+    "thedefiant.io": ('<article><h2><a href="/{i}">{t}</a></h2><p>{p}</p></article>', 20),
+    "blockworks.co": ('<article><div><h3>{t}</h3></div><p>{p}</p></article>', 20),
+    "whale-alert.io": ('<div class="alert"><p>{p}</p></div>', 40),  # No rule: <title> only
+}
+WORDS = ("bitcoin ether etf inflows whales rally funding liquidations market spot traders "
+         "sec approval outflows stablecoin layer defi tokens price support resistance").split()
+
+
+def synthetic_page(host, rng):
+    card, cards = SITES[host]
+    words = lambda n: " ".join(rng.choice(WORDS) for _ in range(n))
+    head = "".join(f'<script>window.__c{i}={json.dumps(words(400))};</script>' for i in range(40))
+    head += "<style>" + "".join(f".c{i}{{margin:{i}px;color:#{i:06x}}}" for i in range(3000)) + "</style>"
+    nav = "<nav>" + "".join(f'<a href="/c/{i}">{words(2)}</a>' for i in range(150)) + "</nav>"
+    body = "".join(card.format(i=i, t=words(9).capitalize(), p=words(60)) for i in range(cards))
+    state = f'<script id="__NEXT_DATA__" type="application/json">{json.dumps({"items": [words(80) for _ in range(300)]})}</script>'
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{host} | {words(6)}</title>{head}</head>'
+            f'<body>{nav}<main>{body}</main><footer>{words(200)}</footer>{state}</body></html>').encode("utf-8")
+
+
+def make_fixtures(directory, seed=7):
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for host in SITES:
+        with open(os.path.join(directory, f"{host}_home.html"), "wb") as f:
+            f.write(synthetic_page(host, rng))
+
+
+def load_fixtures(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append((f"https://{name[:-5].split('_')[0]}/", f.read()))
+    return pages
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def run_child(backend, directory, seconds):
+    pages = load_fixtures(directory)
+    base = rss_mb()
+    results = {url: [r["title"] for r in news_extract.extract(url, body, backend=backend)] for url, body in pages}
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for url, body in pages:
+            news_extract.extract(url, body, backend=backend)
+        n += len(pages)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"pages_per_sec": n / elapsed, "peak_mb": rss_mb() - base, "results": results}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark news page extraction backends")
+    parser.add_argument("--fixtures", help="Directory of saved pages (<host>[_x].html); default: synthetic")
+    parser.add_argument("--save", help="Write the synthetic fixtures here and use them")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Timed run per backend")
+    parser.add_argument("--backend", nargs="+", default=["bs4", "stream", "lxml", "selectolax"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.fixtures, args.seconds)
+
+    directory = args.fixtures or args.save or tempfile.mkdtemp(prefix="bench_html_")
+    if not args.fixtures:
+        make_fixtures(directory)
+    pages = load_fixtures(directory)
+    size = sum(len(body) for _, body in pages)
+    print(f"--- News extraction benchmark: {len(pages)} pages, {size / len(pages) / 1024:.0f} KB avg ({directory}) ---")
+
+    reference, ref_name = None, None
+    for backend in args.backend:
+        if not news_extract.INSTALLED.get(backend):
+            print(f"{backend.ljust(11)} not installed")
+            continue
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", backend,
+                              "--fixtures", directory, "--seconds", str(args.seconds)],
+                             capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        if reference is None:
+            reference, ref_name = res["results"], backend
+        diff = [url for url in reference if reference[url] != res["results"].get(url)]
+        note = f"   DIFFERS from {ref_name} on {', '.join(diff)}" if diff else ""
+        print(f"{backend.ljust(11)} {res['pages_per_sec']:>9.1f} pages/s   peak +{res['peak_mb']:>6.1f} MB{note}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
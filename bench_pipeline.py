@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import psycopg2
+
+import config
+
+os.makedirs(config.LOG_DIR, exist_ok=True)
+import direct_feed
+import bulk_copy
+import instruments
+import ws_decoder
+from lane_queue import LaneQueue
+from spool import NullSpool
+
+# --- End-to-End Ingestion Benchmark ---
+# Times every stage of both ingestion paths on the same synthetic frame mix:
+#   decode -> parse -> queue hand-off -> SQL/COPY build -> DB commit
+# for direct_feed.MarketFeed and mitm_parser (CryptoParser + DatabaseWriter).
+# Output is one JSON document (rows/s, p50/p99 per stage, peak RSS) so runs can be
+# archived and diffed with --baseline. DB stages write to TEMP tables that shadow
+# the real ones for this session only.
+#
+#   python bench_pipeline.py --out bench/$(git rev-parse --short HEAD).json
+#   python bench_pipeline.py --baseline bench/<older>.json
+
+SHADOWED = ("market_ticks", "derivatives_stats", "orderbook_snapshots", "news_sentiment")
+UNBOUNDED = 10 ** 9
+
+
+# --- Synthetic Frames ---
+def make_frames(n, options=500):
+    """Venue-tagged raw frames: Binance/Bybit trades and Deribit option tickers that move enough to pass conflation"""
+    now = int(time.time() * 1000)
+    instruments = [f"BTC-27DEC24-{40000 + 1000 * (i // 2)}-{'CP'[i % 2]}" for i in range(options)]
+    iv = {name: random.uniform(40, 80) for name in instruments}
+    frames = []
+    for i in range(n):
+        ts = now + i
+        r = random.random()
+        if r < 0.3:
+            frames.append(("binance", json.dumps({"stream": "btcusdt@aggTrade", "data": {
+                "e": "aggTrade", "E": ts, "a": i, "s": "BTCUSDT", "p": f"{67000 + random.uniform(-50, 50):.2f}",
+                "q": f"{random.uniform(0.001, 2):.3f}", "f": i, "l": i, "T": ts, "m": r < 0.15}})))
+        elif r < 0.5:
+            frames.append(("bybit", json.dumps({"topic": "publicTrade.BTCUSDT", "type": "snapshot", "ts": ts, "data": [
+                {"T": ts, "s": "BTCUSDT", "S": "Buy" if r < 0.4 else "Sell", "v": f"{random.uniform(0.001, 2):.3f}",
+                 "p": f"{67000 + random.uniform(-50, 50):.2f}", "L": "PlusTick", "i": str(i), "BT": False}]})))
+        else:
+            name = random.choice(instruments)
+            iv[name] += random.choice((-1, 1)) * random.uniform(0, 1)
+            frames.append(("deribit", json.dumps({"jsonrpc": "2.0", "method": "subscription", "params": {
+                "channel": f"ticker.{name}.100ms", "data": {
+                    "timestamp": ts, "instrument_name": name, "last_price": round(random.uniform(0.01, 0.2), 4),
+                    "mark_iv": round(iv[name], 2), "best_bid_price": 0.05, "best_ask_price": 0.06,
+                    "open_interest": 812.4, "greeks": {"delta": round(random.random(), 4), "gamma": 0.00002},
+                    "stats": {"volume": 18.3}}}})))
+    return frames
+
+
+# --- Measurement ---
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.rows = 0
+        self.elapsed = 0.0
+
+    def result(self):
+        samples = sorted(self.samples)
+        pick = lambda pct: samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+        return {
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_us": round(pick(50), 2),
+            "p99_us": round(pick(99), 2),
+            "samples": len(samples),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def timed(stage, items, fn, rows_of=lambda item: 1):
+    """Run fn(item) for every item, one latency sample per call"""
+    clock = time.perf_counter
+    out = []
+    start = clock()
+    for item in items:
+        t0 = clock()
+        out.append(fn(item))
+        stage.samples.append((clock() - t0) * 1e6)
+        stage.rows += rows_of(item)
+    stage.elapsed += clock() - start
+    return out
+
+
+class BuildCursor:
+    """Stands in for a psycopg2 cursor: SQL and COPY payloads are built, never sent"""
+    def __init__(self, real):
+        self.real = real
+        self.connection = real.connection
+        self.bytes = 0
+
+    def mogrify(self, sql, args=None):
+        return self.real.mogrify(sql, args)  # Client-side in psycopg2
+
+    def execute(self, sql, args=None):
+        self.bytes += len(sql)
+
+    def copy_expert(self, sql, stream):
+        self.bytes += len(stream.read())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def batches(records, size):
+    return [records[i:i + size] for i in range(0, len(records), size)]
+
+
+def db_stages(results, prefix, conn, flush, records, batch_size):
+    build, commit = Stage("build"), Stage("commit")
+    groups = batches(records, batch_size)
+    with conn.cursor() as cur:
+        instruments.ensure(records, cur)  # Ids first, on the real session: BuildCursor can't fetch them
+    cursor = BuildCursor(conn.cursor())
+    timed(build, groups, lambda b: flush(cursor, b), len)
+    bulk_copy.reset_staging(conn)  # BuildCursor never created the staging tables
+
+    def write(batch):
+        with conn.cursor() as cur:
+            flush(cur, batch)
+        conn.commit()
+    timed(commit, groups, write, len)
+    results[f"{prefix}.build"] = dict(build.result(), sql_bytes=cursor.bytes)
+    results[f"{prefix}.commit"] = commit.result()
+
+
+# --- direct_feed ---
+def bench_feed(frames, conn, batch_size, results):
+    feed = direct_feed.MarketFeed(None, None, spool=NullSpool())
+    feed.running = False
+    feed.write_queue = LaneQueue(UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    decoders = feed.decoders
+
+    decode = Stage("decode")
+    decoded = timed(decode, frames, lambda f: (f[0], decoders[f[0]](f[1])))
+    results["direct_feed.decode"] = decode.result()
+
+    parse = Stage("parse")
+    parsers = {
+        "binance": feed.parse_binance,
+        "bybit": feed.parse_bybit,
+        "deribit": lambda data: feed.parse_deribit(data["params"]),
+    }
+    loop = asyncio.new_event_loop()
+    run = loop.run_until_complete
+    timed(parse, [d for d in decoded if d[1] is not None], lambda d: run(parsers[d[0]](d[1])))
+    loop.close()
+    records = feed.write_queue.get_batch_nowait(UNBOUNDED)
+    results["direct_feed.parse"] = dict(parse.result(), records_out=len(records))
+
+    handoff = Stage("queue")
+    lanes = LaneQueue(UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    timed(handoff, records, lanes.put_nowait)
+    drained = timed(handoff, range(0, len(records), batch_size), lambda _: lanes.get_batch_nowait(batch_size), lambda _: 0)
+    results["direct_feed.queue"] = handoff.result()
+
+    db_stages(results, "direct_feed", conn, feed.flush_batch, [r for b in drained for r in b], batch_size)
+
+
+# --- mitm_parser ---
+def bench_mitm(frames, conn, batch_size, results):
+    import mitm_parser
+    parser = mitm_parser.CryptoParser(start_writer=False)
+    parser.queue = queue.Queue()
+    writer = mitm_parser.DatabaseWriter(queue.Queue())
+
+    decode = Stage("decode")
+    raw = [(venue, payload.encode()) for venue, payload in frames]
+    decoded = timed(decode, raw, lambda f: (f[0], json.loads(parser.decode_message(f[1]))))
+    results["mitm.decode"] = decode.result()
+
+    parse = Stage("parse")
+    parsers = {"binance": parser.parse_binance, "bybit": parser.parse_bybit, "deribit": parser.parse_deribit}
+    timed(parse, decoded, lambda d: parsers[d[0]](d[1]))
+    records = []
+    while not parser.queue.empty():
+        records.append(parser.queue.get_nowait())
+    results["mitm.parse"] = dict(parse.result(), records_out=len(records))
+
+    handoff = Stage("queue")
+    q = queue.Queue()
+    timed(handoff, records, q.put_nowait)
+    drained = timed(handoff, records, lambda _: q.get_nowait(), lambda _: 0)
+    results["mitm.queue"] = handoff.result()
+
+    db_stages(results, "mitm", conn, writer.flush_batch, drained, batch_size)
+
+
+def shadow_tables(conn):
+    with conn.cursor() as cur:
+        for table in SHADOWED:
+            cur.execute(f"CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS)")
+    conn.commit()
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline):
+    """Per-stage rows/s and p99 change vs an earlier run, to stderr"""
+    print(f"--- vs baseline {baseline['meta'].get('git_rev')} ({baseline['meta'].get('started')}) ---", file=sys.stderr)
+    for name, now in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if not old:
+            continue
+        rate = (now["rows_per_sec"] / old["rows_per_sec"] - 1) * 100 if old["rows_per_sec"] else 0.0
+        p99 = (now["p99_us"] / old["p99_us"] - 1) * 100 if old["p99_us"] else 0.0
+        print(f"{name.ljust(22)} rows/s {rate:+7.1f}%   p99 {p99:+7.1f}%", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage ingestion benchmark (JSON output)")
+    parser.add_argument("--uri", default=config.DB_URI)
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=config.BATCH_SIZE)
+    parser.add_argument("--target", choices=["all", "feed", "mitm"], default="all")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="Also write the JSON result to this file")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    frames = make_frames(args.frames)
+    conn = psycopg2.connect(args.uri)
+    shadow_tables(conn)
+
+    stages = {}
+    if args.target in ("all", "feed"):
+        bench_feed(frames, conn, args.batch, stages)
+    if args.target in ("all", "mitm"):
+        bench_mitm(frames, conn, args.batch, stages)
+    conn.close()
+
+    result = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_rev": git_rev(),
+            "python": platform.python_version(),
+            "frames": args.frames,
+            "batch": args.batch,
+            "seed": args.seed,
+            "decoder": ws_decoder.backend_name(),
+            "write_mode": config.DB_WRITE_MODE,
+        },
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    doc = json.dumps(result, indent=2)
+    print(doc)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(doc + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
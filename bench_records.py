@@ -0,0 +1,120 @@
+import gc
+import sys
+import time
+import random
+import tracemalloc
+from datetime import datetime
+
+import config
+from tick_records import Tick, DerivTicker, TRADE, QUOTE, DERIV
+
+# --- Tick Record Benchmark ---
+# Fills a queue's worth (config.QUEUE_MAX_SIZE) of ticks in the legacy per-message
+# dict shape and as tick_records, then compares bytes held per queued tick and the
+# cost of the flush_batch classification step.
+
+
+def legacy_dicts(n):
+    """The dict shapes direct_feed.parse_* produced before tick_records"""
+    now = time.time()
+    out = []
+    for i in range(n):
+        r = random.random()
+        if r < 0.6:
+            out.append({
+                "timestamp": now + i, "symbol": "BTC-27DEC24-60000-C", "price": 0.05,
+                "bid": 0.04, "ask": 0.06, "volume": 12.5, "side": None, "source": "Deribit",
+                "open_interest": 100.0, "iv": 55.0, "delta": 0.5, "gamma": 0.0001,
+                "expiry": datetime(2024, 12, 27), "strike": 60000.0, "option_type": "CALL",
+                "turnover": 0.0, "funding_rate": 0.0,
+            })
+        elif r < 0.8:
+            out.append({
+                "timestamp": now + i, "symbol": "BTCUSDT", "price": 65000.0 + i,
+                "volume": 0.01, "bid": None, "ask": None, "side": "BUY",
+                "source": "Binance_AggTrade",
+            })
+        else:
+            out.append({
+                "timestamp": now + i, "symbol": "BTCUSDT", "price": 65000.5 + i,
+                "bid": 65000.0, "ask": 65001.0, "volume": 0, "side": None,
+                "source": "Binance_Depth",
+            })
+    return out
+
+
+def records(n):
+    now = time.time()
+    out = []
+    for i in range(n):
+        r = random.random()
+        if r < 0.6:
+            out.append(DerivTicker(
+                now + i, "BTC-27DEC24-60000-C", 0.05, bid=0.04, ask=0.06, volume=12.5,
+                source="Deribit", open_interest=100.0, iv=55.0, delta=0.5, gamma=0.0001,
+                expiry=datetime(2024, 12, 27), strike=60000.0, option_type="CALL",
+                turnover=0.0, funding_rate=0.0,
+            ))
+        elif r < 0.8:
+            out.append(Tick(TRADE, now + i, "BTCUSDT", 65000.0 + i, volume=0.01, side="BUY",
+                            source="Binance_AggTrade"))
+        else:
+            out.append(Tick(QUOTE, now + i, "BTCUSDT", 65000.5 + i, 65000.0, 65001.0, volume=0,
+                            source="Binance_Depth"))
+    return out
+
+
+def measure_bytes(factory, n):
+    gc.collect()
+    tracemalloc.start()
+    items = factory(n)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, current / n, peak
+
+
+def classify_legacy(batch):
+    ticks, derivs = [], []
+    for item in batch:
+        if item.get("source") == "Bybit_Option" or "iv" in item or item.get("source") == "Deribit":
+            derivs.append(item)
+        else:
+            ticks.append(item)
+    return ticks, derivs
+
+
+def classify_records(batch):
+    ticks, derivs = [], []
+    for item in batch:
+        if item.kind == DERIV:
+            derivs.append(item)
+        else:
+            ticks.append(item)
+    return ticks, derivs
+
+
+def best_of(fn, batch, rounds=20):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return len(batch) / best
+
+
+def main():
+    n = config.QUEUE_MAX_SIZE
+    random.seed(7)
+    dicts, dict_bytes, dict_peak = measure_bytes(legacy_dicts, n)
+    random.seed(7)
+    recs, rec_bytes, rec_peak = measure_bytes(records, n)
+
+    print(f"--- Tick records vs dicts at QUEUE_MAX_SIZE={n} ---")
+    print(f"dict    : {dict_bytes:8.0f} bytes/tick  (peak {dict_peak / 1e6:.1f} MB)")
+    print(f"record  : {rec_bytes:8.0f} bytes/tick  (peak {rec_peak / 1e6:.1f} MB)")
+    print(f"classify dict   : {best_of(classify_legacy, dicts):12.0f} ticks/s")
+    print(f"classify record : {best_of(classify_records, recs):12.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
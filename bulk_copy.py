@@ -0,0 +1,150 @@
+import io
+import struct
+import weakref
+from datetime import datetime, timezone
+
+# --- COPY Bulk Loader ---
+# Streams batches into Postgres with COPY instead of one giant mogrify'd INSERT.
+# Rows land in a per-session staging table first and are merged with
+# INSERT ... SELECT DISTINCT ... ON CONFLICT DO NOTHING, so duplicates inside a
+# batch (and any unique index on the target) are still respected.
+
+# Column layouts (must match schema.sql order used by flush_batch)
+TABLES = {
+    "market_ticks": [
+        ("time", "timestamptz"), ("symbol", "text"), ("price", "float8"),
+        ("bid", "float8"), ("ask", "float8"), ("volume", "float8"),
+        ("source", "text"), ("side", "text"), ("trade_id", "text"), ("instrument_id", "int4"),
+    ],
+    "derivatives_stats": [
+        ("time", "timestamptz"), ("symbol", "text"), ("funding_rate", "float8"),
+        ("open_interest", "float8"), ("turnover", "float8"),
+        ("iv", "float8"), ("delta", "float8"), ("gamma", "float8"),
+        ("source", "text"), ("expiry", "timestamptz"), ("strike", "float8"),
+        ("option_type", "text"), ("instrument_id", "int4"),
+    ],
+    "orderbook_snapshots": [
+        ("time", "timestamptz"), ("symbol", "text"), ("source", "text"),
+        ("mid", "float8"), ("weighted_mid", "float8"), ("imbalance", "float8"),
+        ("bid_px", "float8[]"), ("bid_sz", "float8[]"), ("ask_px", "float8[]"), ("ask_sz", "float8[]"),
+        ("instrument_id", "int4"),
+    ],
+}
+
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+BINARY_TRAILER = struct.pack(">h", -1)
+
+_pack_float8 = struct.Struct(">id").pack  # length prefix + value
+_pack_int8 = struct.Struct(">iq").pack
+_pack_int4 = struct.Struct(">ii").pack
+_pack_len = struct.Struct(">i").pack
+_pack_count = struct.Struct(">h").pack
+_pack_array_head = struct.Struct(">iiiiii").pack  # byte len, ndim, has_null, elem oid, dim len, lbound
+_NULL = _pack_len(-1)
+FLOAT8_OID = 701
+
+# Staging tables already created on a given connection
+_staged = weakref.WeakKeyDictionary()
+
+
+def _pg_micros(value):
+    """datetime -> microseconds since 2000-01-01 UTC (naive values are treated as UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - PG_EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def encode_binary(rows, columns):
+    """Encode row tuples as a PGCOPY binary stream"""
+    types = [ctype for _, ctype in columns]
+    count = _pack_count(len(types))
+    out = [BINARY_HEADER]
+    append = out.append
+    for row in rows:
+        append(count)
+        for value, ctype in zip(row, types):
+            if value is None:
+                append(_NULL)
+            elif ctype == "float8":
+                append(_pack_float8(8, value))
+            elif ctype == "int4":
+                append(_pack_int4(4, value))
+            elif ctype == "timestamptz":
+                append(_pack_int8(8, _pg_micros(value)))
+            elif ctype == "float8[]":
+                n = len(value)
+                if n:
+                    append(_pack_array_head(20 + 12 * n, 1, 0, FLOAT8_OID, n, 1))
+                    append(struct.pack(">" + "id" * n, *[x for v in value for x in (8, v)]))
+                else:
+                    append(struct.pack(">iiii", 12, 0, 0, FLOAT8_OID))  # empty: ndim = 0
+            else:
+                data = str(value).encode("utf-8")
+                append(_pack_len(len(data)))
+                append(data)
+    append(BINARY_TRAILER)
+    return b"".join(out)
+
+
+def _text_field(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "{" + ",".join(map(repr, map(float, value))) + "}"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def encode_text(rows):
+    """Encode row tuples as COPY text format (tab separated, \\N for NULL)"""
+    return "".join("\t".join(map(_text_field, row)) + "\n" for row in rows).encode("utf-8")
+
+
+def ensure_staging(cursor, table):
+    """Create the session-local staging table for `table` once per connection"""
+    conn = cursor.connection
+    created = _staged.setdefault(conn, set())
+    if table in created:
+        return
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {table}_stage "
+        f"(LIKE {table} INCLUDING DEFAULTS)"
+    )
+    created.add(table)
+
+
+def copy_rows(cursor, table, rows, binary=True):
+    """COPY rows into the staging table, then merge them into `table`"""
+    if not rows:
+        return 0
+    columns = TABLES[table]
+    names = ", ".join(name for name, _ in columns)
+    ensure_staging(cursor, table)
+
+    if binary:
+        payload = encode_binary(rows, columns)
+        fmt = "(FORMAT binary)"
+    else:
+        payload = encode_text(rows)
+        fmt = "(FORMAT text)"
+
+    cursor.copy_expert(f"COPY {table}_stage ({names}) FROM STDIN WITH {fmt}", io.BytesIO(payload))
+    # Drain the stage in the same statement so several flushes can share one transaction
+    cursor.execute(
+        f"WITH staged AS (DELETE FROM {table}_stage RETURNING {names}) "
+        f"INSERT INTO {table} ({names}) SELECT DISTINCT {names} FROM staged ON CONFLICT DO NOTHING"
+    )
+    return len(rows)
+
+
+def reset_staging(conn):
+    """Forget staging tables after a rollback (CREATE TEMP TABLE is transactional)"""
+    _staged.pop(conn, None)
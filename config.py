@@ -20,14 +20,136 @@ DB_URI = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # --- Proxy ---
 PROXY_FILE_PATH = os.getenv("PROXY_FILE", "../iproyal-proxies.txt")
+PROXY_SCORES_PATH = os.getenv("PROXY_SCORES_PATH", "proxy_scores.json")  # Per-venue proxy ranking, see proxy_pool
+PROXY_TOP_K = 3  # New connections pick randomly among the K fastest healthy proxies
+PROXY_EWMA_ALPHA = 0.3
+PROXY_QUARANTINE_BASE = 30.0  # Seconds; doubles per consecutive failure, x4 when throttled
+PROXY_QUARANTINE_MAX = 1800.0
+PROXY_PROBE_INTERVAL = 300.0
+PROXY_PROBE_CONCURRENCY = 8
+PROXY_PROBE_TIMEOUT = 10.0
 
 # --- Logging ---
 # Paths
 LOG_DIR = "logs"
 LOG_LEVEL = "INFO" 
+LOG_QUEUE_SIZE = 10000  # Records waiting for the log listener thread; beyond that they are dropped
+LOG_REPEAT_WINDOW = 5.0  # Seconds: identical messages are written once per window, then summarized
 
 # --- Tuning ---
 # Max size of queues before dropping old data (Backpressure)
 QUEUE_MAX_SIZE = 10000 
 BATCH_SIZE = 100
 BATCH_INTERVAL = 1.0 # seconds
+
+# --- Ingestion ---
+# How MarketFeed.flush_batch loads rows:
+#   "insert"      -> multi-row INSERT built with mogrify (legacy)
+#   "copy"        -> COPY text format into a staging table, then merge
+#   "copy_binary" -> COPY binary format into a staging table, then merge (fastest)
+DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "copy_binary")
+# Parallel writer threads (each holds its own DB connection) for direct_feed
+DB_WRITER_THREADS = int(os.getenv("DB_WRITER_THREADS", "4"))
+# Websocket frame decoder: "auto" | "msgspec" (typed) | "orjson" | "json"
+WS_DECODER = os.getenv("WS_DECODER", "auto")
+
+# --- Order Book ---
+ORDERBOOK_DEPTH = 20               # Levels persisted and used for weighted mid / imbalance
+ORDERBOOK_MAX_LEVELS = 1000        # Levels kept in memory per side
+ORDERBOOK_SNAPSHOT_INTERVAL = 1.0  # Seconds between persisted snapshots per book
+
+# --- Conflation (Deribit / Bybit option tickers) ---
+CONFLATION_INTERVAL = 1.0            # Max seconds an instrument's latest state is held back
+CONFLATION_IV_THRESHOLD = 0.25       # Vol points
+CONFLATION_DELTA_THRESHOLD = 0.005
+CONFLATION_PRICE_THRESHOLD = 0.001   # Relative move (0.1%)
+
+# --- Deribit Subscriptions ---
+DERIBIT_CURRENCIES = ["BTC", "ETH", "SOL"]
+DERIBIT_SHARDS = 4                  # Websocket connections the ticker channels are spread over
+DERIBIT_REFRESH_INTERVAL = 300      # Seconds between instrument list diffs (listings / expiries)
+
+# --- Symbol Universe (direct_feed perpetuals, see universe.py) ---
+UNIVERSE_SYMBOLS = os.getenv("UNIVERSE_SYMBOLS", "BTCUSDT,ETHUSDT,SOLUSDT").split(",")  # Always streamed
+UNIVERSE_FILE = os.getenv("UNIVERSE_FILE", "")  # One symbol per line; replaces UNIVERSE_SYMBOLS, re-read live
+UNIVERSE_TOP_N = int(os.getenv("UNIVERSE_TOP_N", "0"))  # Add the N most traded USDT perps (0 = pinned only)
+UNIVERSE_HYSTERESIS = 10  # An incumbent is only dropped once it ranks below TOP_N + this
+UNIVERSE_MAX_SYMBOLS = 100  # 2 streams per symbol; Binance futures allows 200 per connection
+UNIVERSE_REFRESH_INTERVAL = 60
+BYBIT_OPTION_COINS = ["BTC", "ETH", "SOL"]  # tickers.<coin> on the Bybit option socket
+
+# --- Spool (overflow / DB outage buffer) ---
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+SPOOL_SEGMENT_BYTES = 64 * 1024 * 1024  # Rotate segments at 64MB
+SPOOL_FLUSH_RECORDS = 2000              # Records buffered in memory per appended frame
+SPOOL_REPLAY_BATCH = 20000              # Rows per COPY transaction when draining
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "0") == "1"
+
+# --- Write Lanes (direct_feed) ---
+QUEUE_TRADE_CAPACITY = QUEUE_MAX_SIZE  # Trades are never shed; overflow goes to the spool
+QUEUE_QUOTE_CAPACITY = 2000            # Distinct (source, symbol) quotes / book snapshots pending
+QUEUE_DERIV_CAPACITY = 5000
+QUEUE_DERIV_SAMPLE_EVERY = 4           # Above the watermark keep 1 in N tickers per instrument
+QUEUE_DERIV_SAMPLE_WATERMARK = 0.5     # Fraction of QUEUE_DERIV_CAPACITY
+
+# --- Trade Dedup ---
+TRADE_DEDUP_WINDOW = int(os.getenv("TRADE_DEDUP_WINDOW", "500000"))  # Recent (symbol, trade_id) keys kept per process
+
+# --- News Dedup ---
+NEWS_DEDUP_WINDOW = int(os.getenv("NEWS_DEDUP_WINDOW", "50000"))  # Recent headline hashes kept per process
+NEWS_TOUCH_INTERVAL = float(os.getenv("NEWS_TOUCH_INTERVAL", "900"))  # Repeats within this many seconds only count; then last_seen is bumped
+
+# --- Websocket Liveness ---
+WS_SILENCE_TIMEOUT = float(os.getenv("WS_SILENCE_TIMEOUT", "30"))  # No frame for this long -> reconnect
+WS_PING_INTERVAL = 20.0  # aiohttp protocol ping; a missing pong closes the socket
+BYBIT_PING_INTERVAL = 20.0  # {"op": "ping"}
+DERIBIT_HEARTBEAT_INTERVAL = 10  # public/set_heartbeat (Deribit minimum is 10)
+WS_BACKOFF_BASE = 0.5  # Reconnect delay ~ uniform(0, min(cap, base * 2^attempt))
+WS_BACKOFF_CAP = 60.0
+
+# --- Gap Backfill (direct_feed) ---
+BACKFILL_CONCURRENCY = {"binance": 2, "bybit": 1}  # Concurrent REST backfills per venue
+BACKFILL_PAGE_LIMIT = 1000
+BACKFILL_PAGE_DELAY = 0.2  # Seconds between pages of one backfill (REST weight)
+BACKFILL_MAX_ROWS = 200000  # Per gap; anything larger is marked partial
+
+# --- Capture / Replay ---
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")  # Set to record raw websocket frames (ws_capture)
+CAPTURE_CHUNK_SECONDS = 300
+CAPTURE_CHUNK_FRAMES = 500000
+
+# --- mitm Parse Lanes ---
+# Hooks on mitmproxy's event thread only hand flows over; parsing runs on lane
+# workers. Websocket frames are sharded by socket so each one stays in order.
+MITM_WS_WORKERS = int(os.getenv("MITM_WS_WORKERS", "2"))
+MITM_WS_QUEUE = 20000  # Frames per worker; beyond that frames are dropped (and counted)
+MITM_HTTP_WORKERS = int(os.getenv("MITM_HTTP_WORKERS", "2"))
+MITM_HTTP_QUEUE = 64  # Pending responses (news pages, REST JSON)
+MITM_HTML_PROCESSES = int(os.getenv("MITM_HTML_PROCESSES", "2"))  # news_extract runs here; 0 = on the lane thread
+MITM_HTML_PENDING = 32  # Pages handed to the process pool and not yet parsed; beyond that pages are dropped
+NEWS_EXTRACTOR = os.getenv("NEWS_EXTRACTOR", "auto")  # selectolax | lxml | stream | bs4 | auto (see news_extract)
+
+# --- Metrics Endpoint ---
+# Each service serves /metrics (Prometheus text) and /metrics.json on localhost
+FEED_METRICS_PORT = int(os.getenv("FEED_METRICS_PORT", "9108"))
+MITM_METRICS_PORT = int(os.getenv("MITM_METRICS_PORT", "9109"))
+
+# --- Exchange Endpoints ---
+# EXCHANGE_SIM="127.0.0.1:8765" points every venue at a local exchange_sim.py
+# (and disables proxies); individual endpoints can still be overridden by env.
+EXCHANGE_SIM = os.getenv("EXCHANGE_SIM", "")
+
+
+def _endpoint(env, live, sim_path, scheme):
+    return os.getenv(env, f"{scheme}://{EXCHANGE_SIM}{sim_path}" if EXCHANGE_SIM else live)
+
+
+BINANCE_FUTURES_WS = _endpoint("BINANCE_FUTURES_WS", "wss://fstream.binance.com/stream", "/binance/futures/stream", "ws")
+BINANCE_SPOT_WS = _endpoint("BINANCE_SPOT_WS", "wss://stream.binance.com:9443/stream", "/binance/spot/stream", "ws")
+BINANCE_FUTURES_REST = _endpoint("BINANCE_FUTURES_REST", "https://fapi.binance.com", "/binance/futures", "http")
+BINANCE_SPOT_REST = _endpoint("BINANCE_SPOT_REST", "https://api.binance.com", "/binance/spot", "http")
+BYBIT_LINEAR_WS = _endpoint("BYBIT_LINEAR_WS", "wss://stream.bybit.com/v5/public/linear", "/bybit/v5/public/linear", "ws")
+BYBIT_OPTION_WS = _endpoint("BYBIT_OPTION_WS", "wss://stream.bybit.com/v5/public/option", "/bybit/v5/public/option", "ws")
+BYBIT_REST = _endpoint("BYBIT_REST", "https://api.bybit.com", "/bybit", "http")
+DERIBIT_WS = _endpoint("DERIBIT_WS", "wss://www.deribit.com/ws/api/v2", "/deribit/ws/api/v2", "ws")
+DERIBIT_REST = _endpoint("DERIBIT_REST", "https://www.deribit.com/api/v2", "/deribit/api/v2", "http")
@@ -0,0 +1,129 @@
+import time
+import config
+import metrics
+
+# --- Per-Instrument Conflation ---
+# Deribit / Bybit option tickers arrive every 100ms per instrument, most of them
+# carrying no material change. The conflator keeps the latest state per
+# instrument and only lets a record through when:
+#   - it is the first one seen for that instrument,
+#   - iv / delta / price moved past a threshold since the last emitted record, or
+#   - the interval elapsed and a newer state is pending (flush_due).
+# Everything else overwrites the pending state and is counted as collapsed.
+# State is keyed by (source, symbol): Deribit and Bybit list options under the
+# same instrument names.
+
+
+class _State:
+    __slots__ = ("emitted", "prior", "pending", "emitted_at")
+
+    def __init__(self, emitted, emitted_at):
+        self.emitted = emitted
+        self.prior = None  # Emitted before `emitted`, restored if the queue sheds it
+        self.pending = None
+        self.emitted_at = emitted_at
+
+    def emit(self, record, now):
+        self.prior, self.emitted, self.pending, self.emitted_at = self.emitted, record, None, now
+
+
+class Conflator:
+    def __init__(self, interval=None, iv_threshold=None, delta_threshold=None, price_threshold=None):
+        self.interval = interval if interval is not None else config.CONFLATION_INTERVAL
+        self.iv_threshold = iv_threshold if iv_threshold is not None else config.CONFLATION_IV_THRESHOLD
+        self.delta_threshold = delta_threshold if delta_threshold is not None else config.CONFLATION_DELTA_THRESHOLD
+        self.price_threshold = price_threshold if price_threshold is not None else config.CONFLATION_PRICE_THRESHOLD
+        self.states = {}  # (source, symbol) -> _State
+        self._meters = {}  # source -> counters, resolved once per source
+
+    def meters(self, source):
+        m = self._meters.get(source)
+        if m is None:
+            m = self._meters[source] = {
+                "updates": metrics.counter("conflation_updates_total", source=source),
+                "collapsed": metrics.counter("conflation_collapsed_total", source=source),
+                **{reason: metrics.counter("conflation_emitted_total", source=source, reason=reason)
+                   for reason in ("first", "threshold", "interval")},
+            }
+        return m
+
+    def _material(self, old, new):
+        if _moved(old.iv, new.iv, self.iv_threshold):
+            return True
+        if _moved(old.delta, new.delta, self.delta_threshold):
+            return True
+        if old.price and new.price is not None:
+            return abs(new.price - old.price) / abs(old.price) >= self.price_threshold
+        return old.price != new.price
+
+    def offer(self, record, now=None):
+        """Returns the record if it should be written now, else None (held as pending)."""
+        now = now or time.time()
+        m = self.meters(record.source)
+        m["updates"].inc()
+        key = (record.source, record.symbol)
+        state = self.states.get(key)
+
+        if state is None:
+            self.states[key] = _State(record, now)
+            m["first"].inc()
+            return record
+
+        if self._material(state.emitted, record):
+            if state.pending is not None:
+                m["collapsed"].inc()
+            state.emit(record, now)
+            m["threshold"].inc()
+            return record
+
+        if state.pending is not None:
+            m["collapsed"].inc()
+        state.pending = record
+        return None
+
+    def flush_due(self, now=None):
+        """Pending states whose instrument hasn't emitted for `interval` seconds."""
+        now = now or time.time()
+        out = []
+        for state in self.states.values():
+            if state.pending is not None and now - state.emitted_at >= self.interval:
+                record = state.pending
+                state.emit(record, now)
+                self.meters(record.source)["interval"].inc()
+                out.append(record)
+        return out
+
+    def shed(self, record):
+        """The write queue dropped an emitted record: later changes are measured against the
+        last record that was queued, and this one is held as pending (retried after the interval)."""
+        key = (record.source, record.symbol)
+        state = self.states.get(key)
+        if state is None or state.emitted is not record:
+            return
+        if state.prior is None:
+            del self.states[key]  # Nothing of this instrument was queued yet
+            return
+        state.emitted, state.prior = state.prior, None
+        if state.pending is None:
+            state.pending = record
+
+    def forget(self, source, symbol):
+        """Drop state for an instrument (expired / unsubscribed)."""
+        self.states.pop((source, symbol), None)
+
+    def stats(self):
+        updates = metrics.total("conflation_updates_total")
+        collapsed = metrics.total("conflation_collapsed_total")
+        return {
+            "instruments": len(self.states),
+            "updates": updates,
+            "emitted": metrics.total("conflation_emitted_total"),
+            "collapsed": collapsed,
+            "collapse_ratio": collapsed / updates if updates else 0.0,
+        }
+
+
+def _moved(old, new, threshold):
+    if old is None or new is None:
+        return old is not new
+    return abs(new - old) >= threshold
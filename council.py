@@ -5,20 +5,15 @@ import pandas as pd
 from sqlalchemy import create_engine
 from datetime import datetime
 import config
+import log_setup
+import instruments
 import gemini_client
 import openrouter_client
 from paper_exchange import PaperExchange
 import re
 
 # --- Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [HeptaCouncil] %(message)s',
-    handlers=[
-        logging.FileHandler(f"{config.LOG_DIR}/council_ai.log"),
-        logging.StreamHandler()
-    ]
-)
+log_setup.setup("council_ai.log", '%(asctime)s [HeptaCouncil] %(message)s')
 logger = logging.getLogger("HeptaCouncil")
 
 # --- Agent Personas ---
@@ -69,17 +64,17 @@ class TheCouncil:
         self.paper_exchange = PaperExchange()
         logger.info("The Council Assembled (Hybrid: Gemini + OpenRouter). Paper Trading Active.")
 
-    def fetch_market_context(self, symbol="btcusdt"):
+    def fetch_market_context(self, symbol="BTCUSDT"):
         """Fetches the latest features (RSI, CVD, etc) for context."""
         try:
-            # Try both lower and upper case to specific database quirks
-            query = f"""
+            # Features are keyed by canonical symbol (see instruments)
+            query = """
                 SELECT time, feature_group, feature_data 
                 FROM market_features 
-                WHERE symbol = '{symbol.lower()}' OR symbol = '{symbol.upper()}'
+                WHERE symbol = %(symbol)s
                 ORDER BY time DESC LIMIT 20
             """
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(query, self.engine, params={"symbol": instruments.canonical(symbol)})
             if df.empty:
                 logger.warning(f"Feature Context Empty for {symbol}")
                 return "No Market Data Available."
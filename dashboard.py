@@ -8,6 +8,7 @@ from pattern_recognition import PatternRecognizer
 from sqlalchemy import create_engine
 import plotly.graph_objects as go
 import os
+import urllib.request
 
 # --- Config ---
 st.set_page_config(page_title="Crypto Jarvis Dashboard", layout="wide", page_icon="⚡")
@@ -21,7 +22,7 @@ if st.button("Refresh Data"):
 engine = create_engine(config.DB_URI)
 
 # --- Tabs ---
-tab1, tab2, tab3, tab4 = st.tabs(["🚀 Live Market", "🧠 AI Council", "📜 Paper Trading", "📉 Patterns"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🚀 Live Market", "🧠 AI Council", "📜 Paper Trading", "📉 Patterns", "🩺 Feed Health"])
 
 # --- TAB 1: Live Market ---
 with tab1:
@@ -90,7 +91,7 @@ with tab3:
     # Calculate Unrealized PnL (Mock Price for speed)
     current_btc = 90000.0
     try:
-        last_tick = pd.read_sql("SELECT price FROM market_ticks WHERE symbol='btcusdt' ORDER BY time DESC LIMIT 1", engine)
+        last_tick = pd.read_sql("SELECT price FROM market_ticks WHERE symbol='BTCUSDT' ORDER BY time DESC LIMIT 1", engine)
         if not last_tick.empty:
             current_btc = float(last_tick.iloc[0]['price'])
     except: pass
@@ -130,3 +131,57 @@ with tab4:
              st.info("No patterns detected in last candle.")
 
     st.caption("Pattern logic runs on 1-minute aggregations.")
+
+# --- TAB 5: Feed Health ---
+def fetch_metrics(port):
+    """Local /metrics.json of a running service (see metrics.serve); None if it is down"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json", timeout=1) as resp:
+            return json.loads(resp.read())
+    except Exception:
+        return None
+
+HOPS = ("exchange_to_receive", "receive_to_enqueue", "enqueue_to_commit")
+
+with tab5:
+    st.header("Ingestion Latency & Backpressure")
+    for service, port in (("feed", config.FEED_METRICS_PORT), ("mitm", config.MITM_METRICS_PORT)):
+        st.subheader(f"{service} (:{port})")
+        entries = fetch_metrics(port)
+        if entries is None:
+            st.warning(f"No metrics endpoint on port {port}. Is {service} running?")
+            continue
+        by_name = {}
+        for e in entries:
+            by_name.setdefault(e["name"], []).append(e)
+
+        # Per-source p50/p99 for each hop, one row per source
+        rows = {}
+        for hop in HOPS:
+            for e in by_name.get(f"{service}_{hop}_ms", []):
+                row = rows.setdefault(e["labels"].get("source"), {"source": e["labels"].get("source")})
+                row[f"{hop} p50"] = e["p50"]
+                row[f"{hop} p99"] = e["p99"]
+                row["count"] = max(row.get("count", 0), e["count"])
+        if rows:
+            st.dataframe(pd.DataFrame(list(rows.values())).set_index("source").round(2))
+        else:
+            st.info("No records observed yet.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.caption("Clock skew per venue (ms, min exchange→receive)")
+            skew = {e["labels"]["venue"]: e["value"] for e in by_name.get(f"{service}_clock_skew_ms", [])}
+            if skew:
+                st.dataframe(pd.Series(skew, name="skew_ms"))
+        with col2:
+            lag = by_name.get(f"{service}_loop_lag_ms")
+            if lag:
+                st.metric("Loop lag p99 (ms)", f"{lag[0]['p99']:.1f}" if lag[0]["p99"] is not None else "—")
+            lanes = {e["labels"]["lane"]: e["value"] for e in by_name.get("queue_lane_depth", [])}
+            if lanes:
+                st.caption("Write lane depth")
+                st.dataframe(pd.Series(lanes, name="depth"))
+        with col3:
+            for e in by_name.get("spool_depth_bytes", []):
+                st.metric(f"Spool {e['labels']['spool']}", f"{e['value'] / 1e6:.1f} MB")
@@ -1,9 +1,12 @@
 import os
 import time
+import logging
 import multiprocessing
-import traceback
+import log_setup
 # import psycopg2 # Disabled until DB is ready
 
+logger = logging.getLogger("DBWriter")
+
 class DatabaseWriter(multiprocessing.Process):
     def __init__(self, queue, db_uri=None):
         super().__init__()
@@ -14,10 +17,9 @@ class DatabaseWriter(multiprocessing.Process):
         self.running = True
 
     def run(self):
-        debug_path = os.path.join(os.path.dirname(__file__), "writer_debug.log")
-        with open(debug_path, "w") as f:
-             f.write(f"[Writer] Process started. PID: {os.getpid()}\n")
-        
+        logger.info(f"[Writer] Process started. PID: {os.getpid()}")
+        received = log_setup.Tally(logger, "[Writer] Received {n:,} records in last {secs}s", level=logging.DEBUG)
+
         buffer = []
         last_flush = time.time()
         
@@ -31,7 +33,7 @@ class DatabaseWriter(multiprocessing.Process):
                 try:
                     record = self.queue.get(timeout=0.1)
                     buffer.append(record)
-                    with open(debug_path, "a") as f: f.write(f"Received record: {record.get('symbol')}\n")
+                    received.add()
                 except multiprocessing.queues.Empty:
                     pass
 
@@ -43,23 +45,20 @@ class DatabaseWriter(multiprocessing.Process):
                     last_flush = now
                 
             except Exception as e:
-                print(f"[DB Writer] Error loop: {e}")
-                traceback.print_exc()
+                logger.error(f"[DB Writer] Error loop: {e}", exc_info=True)
     
     def flush_batch(self, batch):
-        log_msg = f"[DB Writer] Flushing batch of {len(batch)} records...\n"
+        log_msg = f"[DB Writer] Flushing batch of {len(batch)} records..."
         
         # Separate by table
         ticks = [r for r in batch if r['type'] == 'tick']
         derivs = [r for r in batch if r['type'] == 'derivative']
         news = [r for r in batch if r['type'] == 'news']
         
-        if ticks: log_msg += f"   -> Inserted {len(ticks)} ticks into 'market_ticks'\n"
-        if derivs: log_msg += f"   -> Inserted {len(derivs)} derivs into 'derivatives_stats'\n"
-        if news: log_msg += f"   -> Inserted {len(news)} news into 'news_sentiment'\n"
-
-        with open(os.path.join(os.path.dirname(__file__), "db_activity.log"), "a") as f:
-            f.write(log_msg)
+        if ticks: log_msg += f"\n   -> Inserted {len(ticks)} ticks into 'market_ticks'"
+        if derivs: log_msg += f"\n   -> Inserted {len(derivs)} derivs into 'derivatives_stats'"
+        if news: log_msg += f"\n   -> Inserted {len(news)} news into 'news_sentiment'"
+        logger.info(log_msg)
 
     def stop(self):
         self.running = False
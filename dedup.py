@@ -0,0 +1,116 @@
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import config
+import metrics
+
+# --- Recent-Key Window ---
+# Exact "seen recently?" filter over the last ~capacity keys. Two generations of
+# plain sets: inserts go to the young one, and when it fills it becomes the old
+# one and the previous old set is dropped. Lookups and inserts are O(1) and memory
+# is bounded at 2 x capacity/2 keys. A Bloom filter would be smaller, but a false
+# positive here silently drops a real trade, so the window stays exact and the
+# unique index in the DB backstops anything that has aged out. The check-then-add
+# and the generation swap run under a lock because every ws lane thread shares
+# one window.
+
+
+class RecentKeys:
+    def __init__(self, capacity):
+        self.half = max(1, capacity // 2)
+        self.young = set()
+        self.old = set()
+        self.lock = threading.Lock()
+
+    def seen(self, key):
+        """True if key is in the window; otherwise remember it and return False."""
+        with self.lock:
+            if key in self.young or key in self.old:
+                return True
+            self.young.add(key)
+            if len(self.young) >= self.half:
+                self.old, self.young = self.young, set()
+            return False
+
+    def __len__(self):
+        return len(self.young) + len(self.old)
+
+
+class TradeDedup:
+    """Drops trades whose (symbol, trade_id) was already queued by this process."""
+
+    def __init__(self, service, capacity=None):
+        self.service = service
+        self.window = RecentKeys(capacity or config.TRADE_DEDUP_WINDOW)
+
+    def is_duplicate(self, item):
+        if item.trade_id is None:
+            return False
+        if self.window.seen((item.symbol, item.trade_id)):
+            metrics.counter(f"{self.service}_trades_deduped_total", source=item.source).inc()
+            return True
+        return False
+
+
+# --- News Dedup ---
+# The browser bot reloads the same news pages every few minutes, so most headlines
+# a page yields were already stored. A headline is keyed by a hash of its source
+# and normalized title (NFKC, casefolded, punctuation and extra whitespace gone),
+# plus the amount for whale rows, whose title is a fixed label. news_items in the
+# DB holds one row per key with first_seen / last_seen / seen_count, and only the
+# first sighting becomes a news_sentiment row (DatabaseWriter.flush_batch).
+#
+# In front of that, an LRU of recent keys keeps repeats off the writer queue: a
+# key seen again within NEWS_TOUCH_INTERVAL is only counted, and the next sighting
+# after the interval goes out carrying that count, to bump last_seen. Exact like
+# RecentKeys; keys that fall out of the LRU are caught by the DB unique key.
+
+_PUNCT = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    return " ".join(_PUNCT.sub(" ", unicodedata.normalize("NFKC", title).casefold()).split())
+
+
+def news_key(source, title, amount=None):
+    material = f"{source}\x1f{normalize_title(title or '')}"
+    if amount is not None:
+        material += f"\x1f{amount!r}"
+    return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class NewsDedup:
+    """Tags news rows with content_hash / seen and drops repeats still inside the touch interval"""
+
+    def __init__(self, service, capacity=None, interval=None):
+        self.service = service
+        self.capacity = capacity or config.NEWS_DEDUP_WINDOW
+        self.interval = config.NEWS_TOUCH_INTERVAL if interval is None else interval
+        self.recent = OrderedDict()  # content_hash -> [last forwarded ts, repeats since]
+        self.lock = threading.Lock()  # Rows come from every http lane worker
+
+    def admit(self, row):
+        """True if the row should go to the writer (first sighting or a last_seen touch)"""
+        key = row["content_hash"] = news_key(row["source"], row["title"], row.get("amount"))
+        now = row["timestamp"]
+        with self.lock:
+            state = self.recent.get(key)
+            if state is None:
+                self.recent[key] = [now, 0]
+                if len(self.recent) > self.capacity:
+                    self.recent.popitem(last=False)
+                row["seen"] = 1
+                return True
+            self.recent.move_to_end(key)
+            if now - state[0] < self.interval:
+                state[1] += 1
+                suppressed = True
+            else:
+                row["seen"] = state[1] + 1
+                state[0], state[1] = now, 0
+                suppressed = False
+        if suppressed:
+            metrics.counter(f"{self.service}_news_deduped_total", source=row["source"]).inc()
+        return not suppressed
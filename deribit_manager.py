@@ -0,0 +1,169 @@
+import time
+import asyncio
+import zlib
+import logging
+import aiohttp
+import config
+import liveness
+
+logger = logging.getLogger("DeribitManager")
+
+# --- Sharded Deribit Subscription Manager ---
+# Spreads ticker channels over config.DERIBIT_SHARDS websocket connections.
+# A channel always hashes to the same shard, so new listings and expiries only
+# touch the shard that owns them and a reconnect only loses 1/N of the universe.
+# Instrument lists are fetched over REST for all currencies concurrently and
+# re-diffed every DERIBIT_REFRESH_INTERVAL; changes go out as incremental
+# public/subscribe / public/unsubscribe on the live sockets.
+
+PERPETUALS = ["BTC-PERPETUAL", "ETH-PERPETUAL", "SOL-PERPETUAL"]
+SUBSCRIBE_BATCH = 100
+
+
+def ticker_channel(instrument):
+    return f"ticker.{instrument}.100ms"
+
+
+class Shard:
+    def __init__(self, index):
+        self.index = index
+        self.channels = set()   # Desired channels; replayed in full on every (re)connect
+        self.ws = None
+        self._rpc_id = (index + 1) * 1000000
+
+    def next_id(self):
+        self._rpc_id += 1
+        return self._rpc_id
+
+    async def send(self, method, channels):
+        """public/subscribe or public/unsubscribe in batches. False if the socket is down."""
+        ws = self.ws
+        if ws is None or ws.closed or not channels:
+            return False
+        channels = sorted(channels)
+        for i in range(0, len(channels), SUBSCRIBE_BATCH):
+            await ws.send_json({
+                "jsonrpc": "2.0", "id": self.next_id(), "method": f"public/{method}",
+                "params": {"channels": channels[i:i + SUBSCRIBE_BATCH]}
+            })
+            await asyncio.sleep(0.05)  # Stay under Deribit's subscription rate limit
+        return True
+
+
+class DeribitSubscriptionManager:
+    def __init__(self, feed, currencies=None, shards=None, refresh_interval=None):
+        self.feed = feed
+        self.currencies = currencies or config.DERIBIT_CURRENCIES
+        self.shards = [Shard(i) for i in range(shards or config.DERIBIT_SHARDS)]
+        self.refresh_interval = refresh_interval or config.DERIBIT_REFRESH_INTERVAL
+        self.instruments = set()
+        self.ready = asyncio.Event()
+
+    def shard_for(self, channel):
+        return self.shards[zlib.crc32(channel.encode()) % len(self.shards)]
+
+    async def fetch_instruments(self, session, currency, proxy):
+        params = {"currency": currency, "kind": "option", "expired": "false"}
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with session.get(f"{config.DERIBIT_REST}/public/get_instruments", params=params,
+                               proxy=proxy, ssl=False, timeout=timeout) as resp:
+            data = await resp.json()
+        return [inst["instrument_name"] for inst in data.get("result", [])]
+
+    async def refresh(self):
+        """Fetch all currencies concurrently and apply the diff to the shards."""
+        proxy = self.feed.proxy_manager.get_proxy("deribit")
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(
+                *(self.fetch_instruments(session, cur, proxy) for cur in self.currencies),
+                return_exceptions=True
+            )
+        if all(isinstance(r, Exception) for r in results):
+            self.feed.proxy_manager.report_failure("deribit", proxy, results[0])
+
+        wanted = set(PERPETUALS)
+        for currency, result in zip(self.currencies, results):
+            if isinstance(result, Exception):
+                # Transient REST failure: keep what we already have for this currency
+                logger.error(f"Instrument fetch failed for {currency}: {result}")
+                wanted.update(n for n in self.instruments if n.startswith(f"{currency}-"))
+            else:
+                wanted.update(result)
+
+        added = wanted - self.instruments
+        removed = self.instruments - wanted
+        self.instruments = wanted
+        if not added and not removed:
+            return
+
+        subs, unsubs = {}, {}
+        for name in added:
+            channel = ticker_channel(name)
+            shard = self.shard_for(channel)
+            shard.channels.add(channel)
+            subs.setdefault(shard, []).append(channel)
+        for name in removed:
+            channel = ticker_channel(name)
+            shard = self.shard_for(channel)
+            shard.channels.discard(channel)
+            unsubs.setdefault(shard, []).append(channel)
+            self.feed.conflator.forget("Deribit", name)
+
+        # Only live sockets need the delta; a socket that is down replays shard.channels on connect
+        await asyncio.gather(
+            *(shard.send("subscribe", chans) for shard, chans in subs.items()),
+            *(shard.send("unsubscribe", chans) for shard, chans in unsubs.items())
+        )
+        logger.info(f"Deribit universe: {len(wanted)} instruments (+{len(added)} / -{len(removed)}) "
+                    f"over {len(self.shards)} shards {[len(s.channels) for s in self.shards]}")
+
+    async def refresh_loop(self):
+        while self.feed.running:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Deribit refresh error: {e}")
+            self.ready.set()
+            await asyncio.sleep(self.refresh_interval)
+
+    async def run_shard(self, shard):
+        await self.ready.wait()
+        decode = self.feed.decoders["deribit"]
+        health = self.feed.stream_health(f"deribit_{shard.index}", "deribit")
+        while self.feed.running:
+            proxy = self.feed.proxy_manager.get_proxy("deribit")
+            health.connecting(proxy)
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(config.DERIBIT_WS, proxy=proxy, ssl=False, heartbeat=config.WS_PING_INTERVAL) as ws:
+                        health.connected()
+                        shard.ws = ws
+                        logger.info(f"Deribit shard {shard.index} connected, subscribing {len(shard.channels)} channels")
+                        # Server sends test_request every interval and closes the socket if unanswered
+                        await ws.send_json({"jsonrpc": "2.0", "id": shard.next_id(), "method": "public/set_heartbeat",
+                                            "params": {"interval": config.DERIBIT_HEARTBEAT_INTERVAL}})
+                        await shard.send("subscribe", shard.channels)
+                        async for msg in liveness.watch(ws, health):
+                            if not self.feed.running: break
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self.feed.recv_ts = time.time()
+                                if self.feed.recorder: self.feed.recorder.record("deribit", msg.data, self.feed.recv_ts)
+                                if "test_request" in msg.data:
+                                    await ws.send_json({"jsonrpc": "2.0", "id": shard.next_id(), "method": "public/test"})
+                                    continue
+                                data = decode(msg.data)
+                                if data is not None:
+                                    await self.feed.parse_deribit(data["params"])
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                break
+            except Exception as e:
+                logger.error(f"Deribit shard {shard.index} error: {e}")
+                health.failed(e)
+            finally:
+                shard.ws = None
+            health.disconnected()
+            if self.feed.running:
+                await asyncio.sleep(health.retry_delay())
+
+    async def run(self):
+        await asyncio.gather(self.refresh_loop(), *(self.run_shard(s) for s in self.shards))
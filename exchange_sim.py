@@ -0,0 +1,653 @@
+import sys
+import time
+import uuid
+import math
+import random
+import asyncio
+import logging
+import argparse
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web, WSMsgType
+
+import ws_decoder
+
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"))
+
+logger = logging.getLogger("ExchangeSim")
+
+# --- Local Exchange Simulator ---
+# Speaks enough of each venue's public protocol for MarketFeed to run against it:
+#   Binance  combined streams (?streams=, SUBSCRIBE/UNSUBSCRIBE), aggTrade,
+#            depth diffs with U/u/pu sequencing, REST depth snapshots and
+#            REST aggTrades (fromId / startTime / endTime) history, 24hr / price
+#            tickers for universe ranking
+#   Bybit v5 public linear (publicTrade, orderbook.N snapshot + delta) and
+#            option (tickers.<coin>), op subscribe/unsubscribe/ping,
+#            REST /v5/market/recent-trade and /v5/market/tickers
+#   Deribit  JSON-RPC public/subscribe, public/unsubscribe, public/get_instruments
+#            (ws + REST), public/test, ticker.<instrument>.100ms notifications
+# All rates are per second and scaled by --multiplier, so the same scenario can
+# be replayed at 1x, 10x, ... of normal market load. Trades are generated (and
+# kept for the REST history endpoints) whether or not anyone is subscribed, and
+# --drop-every N closes every socket each N seconds to exercise gap backfill;
+# --stall-every N instead leaves them open but stops sending (half-open socket),
+# which only a client-side silence timeout can detect.
+#
+#   python exchange_sim.py --port 8765 --multiplier 10
+#   EXCHANGE_SIM=127.0.0.1:8765 python direct_feed.py
+
+TICK = 0.01                # Generator step (seconds)
+CLIENT_BACKLOG = 50000     # Frames queued for one socket before it is cut off (like a real venue)
+TRADE_HISTORY = 100000     # Trades kept per symbol for the REST history endpoints
+SPOT_PRICES = {"BTC": 67000.0, "ETH": 3500.0, "SOL": 150.0}
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def base_price(symbol):
+    """Reference price for a simulated symbol; coins without one get a stable made-up price"""
+    coin = symbol[:-4]
+    return SPOT_PRICES.get(coin) or round(random.Random(coin).uniform(0.05, 500), 4)
+
+
+# --- Market State ---
+class Walk:
+    """Geometric random walk used for every simulated price / vol"""
+    def __init__(self, value, vol):
+        self.value = value
+        self.vol = vol
+
+    def step(self):
+        self.value *= math.exp(random.gauss(0, self.vol))
+        return self.value
+
+
+class SimBook:
+    """L2 book whose every mutation bumps the update id, as the real feeds do"""
+    def __init__(self, mid, tick, levels=200):
+        self.tick = tick
+        self.mid = Walk(mid, 0.0002)
+        self.update_id = 1000
+        self.bids = {round(mid - tick * (i + 1), 8): random.uniform(0.1, 5) for i in range(levels)}
+        self.asks = {round(mid + tick * (i + 1), 8): random.uniform(0.1, 5) for i in range(levels)}
+
+    def mutate(self, changes=4):
+        """Random size changes / deletes near the touch. Returns (bids, asks) as [[px, sz]] strings."""
+        mid = self.mid.step()
+        b, a = [], []
+        for _ in range(changes):
+            side, out, sign = (self.bids, b, -1) if random.random() < 0.5 else (self.asks, a, 1)
+            px = round(mid + sign * self.tick * random.randint(1, 50), 8)
+            size = 0.0 if random.random() < 0.2 else random.uniform(0.1, 5)
+            if size:
+                side[px] = size
+            else:
+                side.pop(px, None)
+            out.append([f"{px:.8g}", f"{size:.4f}"])
+        # Uncross after the mid moved
+        best_ask = min(self.asks) if self.asks else mid
+        for px in [p for p in self.bids if p >= best_ask]:
+            del self.bids[px]
+            b.append([f"{px:.8g}", "0"])
+        self.update_id += 1
+        return b, a
+
+    def levels(self, limit):
+        bids = sorted(self.bids.items(), reverse=True)[:limit]
+        asks = sorted(self.asks.items())[:limit]
+        return ([[f"{p:.8g}", f"{s:.4f}"] for p, s in bids],
+                [[f"{p:.8g}", f"{s:.4f}"] for p, s in asks])
+
+
+class Option:
+    __slots__ = ("name", "coin", "strike", "call", "iv", "price", "delta", "gamma", "oi")
+
+    def __init__(self, name, coin, strike, call, spot):
+        self.name, self.coin, self.strike, self.call = name, coin, strike, call
+        self.iv = random.uniform(40, 80)
+        moneyness = (spot - strike) / spot * (1 if call else -1)
+        self.delta = max(0.01, min(0.99, 0.5 + moneyness * 3)) * (1 if call else -1)
+        self.gamma = random.uniform(1e-6, 1e-4)
+        self.price = max(0.0005, 0.05 + moneyness * 0.5)
+        self.oi = random.uniform(10, 2000)
+
+    def step(self):
+        self.iv = max(5.0, self.iv + random.gauss(0, 0.3))
+        self.delta = max(-0.99, min(0.99, self.delta + random.gauss(0, 0.004)))
+        self.price = max(0.0001, self.price * math.exp(random.gauss(0, 0.003)))
+
+
+def expiry_layout(count):
+    """(weekly expiries, instruments per expiry) for `count` options per coin"""
+    expiries = max(1, count // 40)
+    return expiries, max(2, count // expiries)
+
+
+def option_universe(coin, count, spot, start):
+    """count instruments over weekly expiries from `start`, strikes around spot"""
+    options = {}
+    expiries, per_expiry = expiry_layout(count)
+    for e in range(expiries):
+        expiry = start + timedelta(days=7 * e)
+        tag = expiry.strftime("%d%b%y").upper().lstrip("0")
+        options.update(expiry_options(coin, tag, per_expiry, spot))
+    return options
+
+
+def expiry_options(coin, tag, count, spot):
+    options = {}
+    step = spot * 0.01
+    for i in range(count // 2):
+        strike = round(spot + step * (i - count // 4), -1 if spot > 1000 else 0)
+        for cp in "CP":
+            name = f"{coin}-{tag}-{strike:.0f}-{cp}"
+            options[name] = Option(name, coin, strike, cp == "C", spot)
+    return options
+
+
+# --- Fan-out ---
+class Client:
+    """One connected socket with its own outbound queue, so broadcasts never block the generators"""
+    def __init__(self, ws):
+        self.ws = ws
+        self.queue = asyncio.Queue()
+        self.topics = set()
+        self.cut_off = False
+        self.stalled = False  # Half-open: frames are silently discarded
+
+    def send(self, frame):
+        if self.cut_off or self.stalled:
+            return
+        if self.queue.qsize() >= CLIENT_BACKLOG:
+            # Too slow: disconnect like a real venue would; the feed has to recover
+            self.cut_off = True
+            logger.warning(f"Client backlog over {CLIENT_BACKLOG} frames, disconnecting")
+            asyncio.ensure_future(self.ws.close())
+            return
+        self.queue.put_nowait(frame)
+
+    async def pump(self):
+        while not self.ws.closed:
+            frame = await self.queue.get()
+            try:
+                await self.ws.send_str(frame)
+            except Exception:
+                return
+
+
+class Hub:
+    def __init__(self):
+        self.subs = {}  # topic -> set(Client)
+        self.sent = 0
+
+    def subscribe(self, client, topic):
+        self.subs.setdefault(topic, set()).add(client)
+        client.topics.add(topic)
+
+    def unsubscribe(self, client, topic):
+        self.subs.get(topic, set()).discard(client)
+        client.topics.discard(topic)
+
+    def drop(self, client):
+        for topic in list(client.topics):
+            self.unsubscribe(client, topic)
+
+    def wanted(self, topic):
+        return bool(self.subs.get(topic))
+
+    def publish(self, topic, frame):
+        for client in self.subs.get(topic, ()):
+            client.send(frame)
+            self.sent += 1
+
+
+async def serve_ws(request, hub, on_text, on_open=None):
+    ws = web.WebSocketResponse(heartbeat=None, max_msg_size=0)
+    await ws.prepare(request)
+    client = Client(ws)
+    pump = asyncio.ensure_future(client.pump())
+    try:
+        if on_open:
+            on_open(client)
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                try:
+                    on_text(client, ws_decoder.loads(msg.data))
+                except Exception as e:
+                    logger.warning(f"Bad client message {msg.data[:200]}: {e}")
+            elif msg.type == WSMsgType.ERROR:
+                break
+    finally:
+        hub.drop(client)
+        pump.cancel()
+    return ws
+
+
+class Rate:
+    """Turns a per-second rate into a whole number of events per generator step"""
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self.acc = 0.0
+
+    def take(self, dt):
+        self.acc += self.per_second * dt
+        n = int(self.acc)
+        self.acc -= n
+        return n
+
+
+# --- Venues ---
+class BinanceVenue:
+    def __init__(self, futures, symbols, trade_rate, book_rate):
+        self.futures = futures
+        self.hub = Hub()
+        self.books = {s: SimBook(base_price(s), base_price(s) * 1e-5) for s in symbols}
+        # 24h quote volume drifts on every ticker request so volume rankings reshuffle
+        self.volumes = {s: Walk(random.uniform(1e7, 1e10), 0.2) for s in symbols}
+        self.trade_rates = {s: Rate(trade_rate) for s in symbols}
+        self.book_rates = {s: Rate(book_rate) for s in symbols}
+        self.history = {s: deque(maxlen=TRADE_HISTORY) for s in symbols}
+        self.agg_id = {s: 1 for s in symbols}  # Per symbol, like the real aggTrade ids
+
+    def on_text(self, client, msg):
+        method = msg.get("method")
+        for stream in msg.get("params", []):
+            if method == "SUBSCRIBE":
+                self.hub.subscribe(client, stream)
+            elif method == "UNSUBSCRIBE":
+                self.hub.unsubscribe(client, stream)
+        client.send(dumps({"result": None, "id": msg.get("id")}))
+
+    async def ws(self, request):
+        streams = [s for s in request.query.get("streams", "").split("/") if s]
+
+        def on_open(client):
+            for stream in streams:
+                self.hub.subscribe(client, stream)
+        return await serve_ws(request, self.hub, self.on_text, on_open)
+
+    async def depth(self, request):
+        symbol = request.query.get("symbol", "")
+        book = self.books.get(symbol)
+        if book is None:
+            return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+        bids, asks = book.levels(int(request.query.get("limit", 1000)))
+        return web.json_response({"lastUpdateId": book.update_id, "E": now_ms(), "T": now_ms(),
+                                  "bids": bids, "asks": asks})
+
+    async def agg_trades(self, request):
+        """GET aggTrades: fromId, else startTime/endTime, else the most recent `limit`"""
+        history = self.history.get(request.query.get("symbol", ""))
+        if history is None:
+            return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+        q = request.query
+        limit = min(int(q.get("limit", 500)), 1000)
+        if "fromId" in q:
+            from_id = int(q["fromId"])
+            rows = [t for t in history if t["a"] >= from_id][:limit]
+        elif "startTime" in q or "endTime" in q:
+            start, end = int(q.get("startTime", 0)), int(q.get("endTime", 2 ** 62))
+            rows = [t for t in history if start <= t["T"] <= end][:limit]
+        else:
+            rows = list(history)[-limit:]
+        return web.json_response(rows)
+
+    async def ticker_24hr(self, request):
+        return web.json_response([{"symbol": s, "lastPrice": f"{book.mid.value:.8g}", "count": self.agg_id[s],
+                                   "quoteVolume": f"{self.volumes[s].step():.2f}", "closeTime": now_ms()}
+                                  for s, book in self.books.items()])
+
+    async def ticker_price(self, request):
+        return web.json_response([{"symbol": s, "price": f"{book.mid.value:.8g}"} for s, book in self.books.items()])
+
+    def step(self, dt):
+        ts = now_ms()
+        for symbol, book in self.books.items():
+            low = symbol.lower()
+            topic = f"{low}@aggTrade"
+            wanted = self.hub.wanted(topic)
+            for _ in range(self.trade_rates[symbol].take(dt)):
+                self.agg_id[symbol] += 1
+                agg_id = self.agg_id[symbol]
+                trade = {"a": agg_id, "p": f"{book.mid.value:.2f}", "q": f"{random.uniform(0.001, 2):.3f}",
+                         "f": agg_id * 3, "l": agg_id * 3 + 2, "T": ts, "m": random.random() < 0.5}
+                self.history[symbol].append(trade)
+                if wanted:
+                    self.hub.publish(topic, dumps({"stream": topic, "data": dict(
+                        trade, e="aggTrade", E=ts, s=symbol)}))
+            topic = f"{low}@depth@100ms"
+            for _ in range(self.book_rates[symbol].take(dt)):
+                # Book moves whether or not anyone listens, so REST snapshots stay consistent
+                first = book.update_id + 1
+                prev = book.update_id
+                b, a = book.mutate()
+                data = {"e": "depthUpdate", "E": ts, "T": ts, "s": symbol,
+                        "U": first, "u": book.update_id, "b": b, "a": a}
+                if self.futures:
+                    data["pu"] = prev
+                self.hub.publish(topic, dumps({"stream": topic, "data": data}))
+
+
+class BybitVenue:
+    def __init__(self, symbols, coins, trade_rate, book_rate, options_per_coin, ticker_rate, book_depth=50):
+        self.hub = Hub()
+        self.books = {s: SimBook(base_price(s), base_price(s) * 1e-5) for s in symbols}
+        self.seq = {s: 1 for s in symbols}
+        self.trade_rates = {s: Rate(trade_rate) for s in symbols}
+        self.book_rates = {s: Rate(book_rate) for s in symbols}
+        self.book_depth = book_depth
+        self.history = {s: deque(maxlen=1000) for s in symbols}  # recent-trade keeps the last 1000
+        start = next_friday()
+        self.options = {c: list(option_universe(c, options_per_coin, SPOT_PRICES[c], start).values()) for c in coins}
+        self.ticker_rates = {c: Rate(ticker_rate * len(opts)) for c, opts in self.options.items()}
+
+    def on_text(self, client, msg):
+        op = msg.get("op")
+        if op == "ping":
+            client.send(dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+            return
+        for topic in msg.get("args", []):
+            if op == "subscribe":
+                self.hub.subscribe(client, topic)
+                self.send_snapshot(client, topic)
+            elif op == "unsubscribe":
+                self.hub.unsubscribe(client, topic)
+        client.send(dumps({"success": True, "ret_msg": "", "conn_id": str(id(client)), "op": op}))
+
+    def send_snapshot(self, client, topic):
+        if not topic.startswith("orderbook."):
+            return
+        symbol = topic.split(".")[-1]
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        bids, asks = book.levels(self.book_depth)
+        client.send(dumps({"topic": topic, "type": "snapshot", "ts": now_ms(), "data": {
+            "s": symbol, "b": bids, "a": asks, "u": book.update_id, "seq": self.seq[symbol]}, "cts": now_ms()}))
+
+    async def ws(self, request):
+        return await serve_ws(request, self.hub, self.on_text)
+
+    async def recent_trade(self, request):
+        history = self.history.get(request.query.get("symbol", ""))
+        if history is None or request.query.get("category") != "linear":
+            return web.json_response({"retCode": 10001, "retMsg": "params error", "result": {}})
+        limit = min(int(request.query.get("limit", 500)), 1000)
+        rows = [{"execId": t["i"], "symbol": t["s"], "price": t["p"], "size": t["v"], "side": t["S"],
+                 "time": str(t["T"]), "isBlockTrade": False} for t in list(history)[-limit:]]
+        rows.reverse()  # Newest first, like the real endpoint
+        return web.json_response({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": rows},
+                                  "time": now_ms()})
+
+    async def tickers(self, request):
+        if request.query.get("category") != "linear":
+            return web.json_response({"retCode": 10001, "retMsg": "params error", "result": {}})
+        rows = [{"symbol": s, "lastPrice": f"{book.mid.value:.8g}",
+                 "turnover24h": f"{len(self.history[s]) * book.mid.value:.2f}"} for s, book in self.books.items()]
+        return web.json_response({"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": rows},
+                                  "time": now_ms()})
+
+    def step(self, dt):
+        ts = now_ms()
+        for symbol, book in self.books.items():
+            topic = f"publicTrade.{symbol}"
+            n = self.trade_rates[symbol].take(dt)
+            if n:
+                trades = [{"T": ts, "s": symbol, "S": random.choice(("Buy", "Sell")),
+                           "v": f"{random.uniform(0.001, 2):.3f}", "p": f"{book.mid.value:.2f}",
+                           "L": "PlusTick", "i": str(uuid.uuid4()), "BT": False} for _ in range(n)]
+                self.history[symbol].extend(trades)
+                if self.hub.wanted(topic):
+                    self.hub.publish(topic, dumps({"topic": topic, "type": "snapshot", "ts": ts, "data": trades}))
+            topic = f"orderbook.{self.book_depth}.{symbol}"
+            for _ in range(self.book_rates[symbol].take(dt)):
+                b, a = book.mutate()
+                self.seq[symbol] += 1
+                self.hub.publish(topic, dumps({"topic": topic, "type": "delta", "ts": ts, "data": {
+                    "s": symbol, "b": b, "a": a, "u": book.update_id, "seq": self.seq[symbol]}, "cts": ts}))
+
+        for coin, options in self.options.items():
+            topic = f"tickers.{coin}"
+            n = self.ticker_rates[coin].take(dt)
+            if not n or not self.hub.wanted(topic):
+                continue
+            batch = random.sample(options, min(n, len(options)))
+            for i in range(0, len(batch), 50):
+                data = []
+                for o in batch[i:i + 50]:
+                    o.step()
+                    data.append({"symbol": o.name, "lastPrice": f"{o.price * SPOT_PRICES[coin]:.2f}",
+                                 "bid1Price": f"{o.price * SPOT_PRICES[coin] * 0.99:.2f}",
+                                 "ask1Price": f"{o.price * SPOT_PRICES[coin] * 1.01:.2f}",
+                                 "volume24h": f"{o.oi / 10:.2f}", "open_interest": f"{o.oi:.2f}",
+                                 "markIv": f"{o.iv / 100:.4f}", "delta": f"{o.delta:.4f}",
+                                 "gamma": f"{o.gamma:.8f}"})
+                self.hub.publish(topic, dumps({"topic": topic, "type": "snapshot", "ts": ts, "data": data}))
+
+
+class DeribitVenue:
+    def __init__(self, coins, options_per_coin, ticker_rate, churn):
+        self.hub = Hub()
+        self.coins = coins
+        expiries, self.per_expiry = expiry_layout(options_per_coin)
+        self.instruments = {}
+        start = next_friday()
+        for coin in coins:
+            self.instruments.update(option_universe(coin, options_per_coin, SPOT_PRICES[coin], start))
+        self.perps = {f"{c}-PERPETUAL": Walk(SPOT_PRICES[c], 0.0002) for c in coins}
+        self.names = list(self.instruments)
+        self.ticker_rate = Rate(ticker_rate * len(self.names))
+        self.churn = churn
+        self.last_churn = time.time()
+        self.expiry_start = start + timedelta(days=7 * expiries)
+
+    def instrument_list(self, currency):
+        return [{"instrument_name": o.name, "kind": "option", "base_currency": o.coin,
+                 "strike": o.strike, "option_type": "call" if o.call else "put", "is_active": True}
+                for o in self.instruments.values() if o.coin == currency]
+
+    def rpc_result(self, msg, result):
+        return dumps({"jsonrpc": "2.0", "id": msg.get("id"), "result": result,
+                      "usIn": now_ms() * 1000, "usOut": now_ms() * 1000, "usDiff": 1, "testnet": False})
+
+    def on_text(self, client, msg):
+        method = msg.get("method", "")
+        params = msg.get("params") or {}
+        if method == "public/subscribe":
+            channels = params.get("channels", [])
+            for ch in channels:
+                self.hub.subscribe(client, ch)
+            client.send(self.rpc_result(msg, channels))
+        elif method == "public/unsubscribe":
+            channels = params.get("channels", [])
+            for ch in channels:
+                self.hub.unsubscribe(client, ch)
+            client.send(self.rpc_result(msg, channels))
+        elif method == "public/get_instruments":
+            client.send(self.rpc_result(msg, self.instrument_list(params.get("currency", "BTC"))))
+        elif method == "public/set_heartbeat":
+            interval = max(10, int(params.get("interval", 10)))
+            asyncio.ensure_future(self.heartbeat(client, interval))
+            client.send(self.rpc_result(msg, "ok"))
+        elif method in ("public/test", "public/hello"):
+            client.send(self.rpc_result(msg, "ok" if method != "public/test" else {"version": "sim"}))
+        else:
+            client.send(dumps({"jsonrpc": "2.0", "id": msg.get("id"),
+                               "error": {"code": 11050, "message": "bad_request"}}))
+
+    async def heartbeat(self, client, interval):
+        while not client.ws.closed:
+            await asyncio.sleep(interval)
+            client.send(dumps({"jsonrpc": "2.0", "method": "heartbeat", "params": {"type": "test_request"}}))
+
+    async def ws(self, request):
+        return await serve_ws(request, self.hub, self.on_text)
+
+    async def get_instruments(self, request):
+        return web.json_response({"jsonrpc": "2.0", "result": self.instrument_list(request.query.get("currency", "BTC"))})
+
+    def roll_expiries(self):
+        """Expire the nearest expiry of every coin and list a new one at the far end"""
+        tag = self.expiry_start.strftime("%d%b%y").upper().lstrip("0")
+        for coin in self.coins:
+            names = [n for n in self.instruments if n.startswith(f"{coin}-")]
+            if names:
+                nearest = min(names, key=lambda n: datetime.strptime(n.split("-")[1].zfill(7), "%d%b%y"))
+                expiry = nearest.split("-")[1]
+                for n in [n for n in names if n.split("-")[1] == expiry]:
+                    del self.instruments[n]
+            self.instruments.update(expiry_options(coin, tag, self.per_expiry, SPOT_PRICES[coin]))
+        self.expiry_start += timedelta(days=7)
+        self.names = list(self.instruments)
+        logger.info(f"Deribit expiry roll: {len(self.names)} instruments listed")
+
+    def step(self, dt):
+        ts = now_ms()
+        if self.churn and time.time() - self.last_churn >= self.churn:
+            self.last_churn = time.time()
+            self.roll_expiries()
+        for name, walk in self.perps.items():
+            channel = f"ticker.{name}.100ms"
+            if self.hub.wanted(channel) and random.random() < dt * 10:
+                px = walk.step()
+                self.hub.publish(channel, dumps({"jsonrpc": "2.0", "method": "subscription", "params": {
+                    "channel": channel, "data": {
+                        "timestamp": ts, "instrument_name": name, "last_price": round(px, 2),
+                        "best_bid_price": round(px - 0.5, 2), "best_ask_price": round(px + 0.5, 2),
+                        "open_interest": 1e8, "funding_8h": 0.0001, "current_funding": 0.00001,
+                        "stats": {"volume": 1234.5}}}}))
+        n = self.ticker_rate.take(dt)
+        if not n:
+            return
+        for name in random.sample(self.names, min(n, len(self.names))):
+            channel = f"ticker.{name}.100ms"
+            if not self.hub.wanted(channel):
+                continue
+            o = self.instruments[name]
+            o.step()
+            self.hub.publish(channel, dumps({"jsonrpc": "2.0", "method": "subscription", "params": {
+                "channel": channel, "data": {
+                    "timestamp": ts, "instrument_name": name, "last_price": round(o.price, 4),
+                    "mark_iv": round(o.iv, 2), "best_bid_price": round(o.price * 0.98, 4),
+                    "best_ask_price": round(o.price * 1.02, 4), "open_interest": round(o.oi, 1),
+                    "greeks": {"delta": round(o.delta, 5), "gamma": o.gamma},
+                    "stats": {"volume": round(o.oi / 10, 1)}, "state": "open"}}}))
+
+
+def next_friday():
+    today = datetime.now(timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0, tzinfo=None)
+    return today + timedelta(days=(4 - today.weekday()) % 7 or 7)
+
+
+# --- Server ---
+async def generate(venues, report_every=5.0):
+    last = time.perf_counter()
+    last_report, last_sent = last, 0
+    while True:
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        dt, last = now - last, now
+        for venue in venues.values():
+            venue.step(dt)
+        if now - last_report >= report_every:
+            sent = sum(v.hub.sent for v in venues.values())
+            clients = sum(len(set().union(*v.hub.subs.values())) if v.hub.subs else 0 for v in venues.values())
+            logger.info(f"{(sent - last_sent) / (now - last_report):.0f} frames/s to {clients} clients "
+                        + " ".join(f"{k}={v.hub.sent}" for k, v in venues.items()))
+            last_report, last_sent = now, sent
+
+
+async def disrupt(venues, every, stall=False):
+    """Each `every` seconds close every socket (venue restart / LB failover) or, with
+    stall, keep them open and stop sending (half-open connection)"""
+    while True:
+        await asyncio.sleep(every)
+        clients = {c for v in venues.values() for subs in v.hub.subs.values() for c in subs}
+        logger.info(f"{'Stalling' if stall else 'Dropping'} {len(clients)} client sockets")
+        for client in clients:
+            if stall:
+                client.stalled = True
+            else:
+                await client.ws.close()
+
+
+def build_app(args):
+    m = args.multiplier
+    symbols = [s.upper() for s in args.symbols.split(",")]
+    coins = sorted(c.upper() for c in args.option_coins.split(","))
+    venues = {
+        "binance_futures": BinanceVenue(True, symbols, args.trade_rate * m, args.book_rate * m),
+        "binance_spot": BinanceVenue(False, symbols, args.trade_rate * m, args.book_rate * m),
+        "bybit": BybitVenue(symbols, coins, args.trade_rate * m, args.book_rate * m,
+                            args.options, args.ticker_rate * m),
+        "deribit": DeribitVenue(coins, args.options, args.ticker_rate * m, args.churn),
+    }
+    app = web.Application()
+    app.router.add_get("/binance/futures/stream", venues["binance_futures"].ws)
+    app.router.add_get("/binance/futures/fapi/v1/depth", venues["binance_futures"].depth)
+    app.router.add_get("/binance/futures/fapi/v1/aggTrades", venues["binance_futures"].agg_trades)
+    app.router.add_get("/binance/futures/fapi/v1/ticker/24hr", venues["binance_futures"].ticker_24hr)
+    app.router.add_get("/binance/spot/stream", venues["binance_spot"].ws)
+    app.router.add_get("/binance/spot/api/v3/depth", venues["binance_spot"].depth)
+    app.router.add_get("/binance/spot/api/v3/aggTrades", venues["binance_spot"].agg_trades)
+    app.router.add_get("/binance/spot/api/v3/ticker/price", venues["binance_spot"].ticker_price)
+    app.router.add_get("/bybit/v5/public/linear", venues["bybit"].ws)
+    app.router.add_get("/bybit/v5/public/option", venues["bybit"].ws)
+    app.router.add_get("/bybit/v5/market/recent-trade", venues["bybit"].recent_trade)
+    app.router.add_get("/bybit/v5/market/tickers", venues["bybit"].tickers)
+    app.router.add_get("/deribit/ws/api/v2", venues["deribit"].ws)
+    app.router.add_get("/deribit/api/v2/public/get_instruments", venues["deribit"].get_instruments)
+
+    async def start_generator(app):
+        app["generator"] = asyncio.ensure_future(generate(venues))
+        app["disruptors"] = [asyncio.ensure_future(disrupt(venues, every, stall))
+                             for every, stall in ((args.drop_every, False), (args.stall_every, True)) if every]
+
+    async def stop_generator(app):
+        app["generator"].cancel()
+        for task in app["disruptors"]:
+            task.cancel()
+
+    app.on_startup.append(start_generator)
+    app.on_cleanup.append(stop_generator)
+    app["venues"] = venues
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Binance / Bybit / Deribit simulator for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,SOLUSDT", help="USDT perps listed on every venue")
+    parser.add_argument("--option-coins", default="BTC,ETH,SOL", help="Coins with Deribit / Bybit options")
+    parser.add_argument("--trade-rate", type=float, default=20, help="Trades/s per symbol per venue")
+    parser.add_argument("--book-rate", type=float, default=10, help="Book updates/s per symbol per venue")
+    parser.add_argument("--options", type=int, default=1000, help="Option instruments per coin")
+    parser.add_argument("--ticker-rate", type=float, default=1, help="Ticker updates/s per option")
+    parser.add_argument("--multiplier", type=float, default=1, help="Scale every rate (10 = 10x market)")
+    parser.add_argument("--churn", type=float, default=0, help="Roll the nearest Deribit expiry every N seconds")
+    parser.add_argument("--drop-every", type=float, default=0, help="Close every client socket each N seconds")
+    parser.add_argument("--stall-every", type=float, default=0, help="Silence every client socket each N seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    logger.info(f"Exchange simulator on {args.host}:{args.port} at {args.multiplier:g}x "
+                f"(set EXCHANGE_SIM={args.host}:{args.port} for direct_feed)")
+    web.run_app(build_app(args), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,20 +6,19 @@ import pandas_ta as ta  # Technical Analysis Lib
 import psycopg2
 from datetime import datetime, timezone
 import config
+import log_setup
+import universe
+import instruments
 
 from sqlalchemy import create_engine
 
 # --- Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [FeatureEngine] %(message)s',
-    handlers=[
-        logging.FileHandler(f"{config.LOG_DIR}/feature_engine.log"),
-        logging.StreamHandler()
-    ]
-)
+log_setup.setup("feature_engine.log", '%(asctime)s [FeatureEngine] %(message)s')
 logger = logging.getLogger("FeatureEngine")
 
+# Deribit perpetuals are not part of the direct_feed universe but are still scored
+EXTRA_SYMBOLS = ["BTC-PERPETUAL", "ETH-PERPETUAL", "SOL-PERPETUAL"]
+
 class FeatureEngine:
     def __init__(self):
         # SQLAlchemy Engine for Pandas (Read)
@@ -33,15 +32,16 @@ class FeatureEngine:
 
     def fetch_recent_data(self, symbol, limit=500):
         """Fetch OHLVC data for calculation"""
-        query = f"""
+        # Symbols are stored canonical (see instruments), so a single equality uses (symbol, time DESC)
+        query = """
             SELECT time, price, volume, side 
             FROM market_ticks 
-            WHERE (symbol = '{symbol}' OR symbol = '{symbol.upper()}')
+            WHERE symbol = %(symbol)s
             AND time > NOW() - INTERVAL '1 hour'
             ORDER BY time ASC;
         """
         try:
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(query, self.engine, params={"symbol": instruments.canonical(symbol)})
             if not df.empty:
                 df = df.sort_values(by='time').reset_index(drop=True)
                 
@@ -179,12 +179,27 @@ class FeatureEngine:
             except Exception as e:
                 logger.error(f"Save Error: {e}")
 
+    def load_symbols(self, current=None):
+        """Active universe from symbol_universe (written by direct_feed); config fallback if unreadable"""
+        try:
+            symbols = universe.load_active(self.conn)
+        except Exception as e:
+            logger.error(f"Universe Read Error: {e}")
+            symbols = current
+        if not symbols:
+            symbols = [s.upper() for s in config.UNIVERSE_SYMBOLS]
+        symbols = symbols + [s for s in EXTRA_SYMBOLS if s not in symbols]
+        if symbols != current:
+            logger.info(f"Symbol universe: {len(symbols)} symbols {symbols}")
+        return symbols
+
     def run_loop(self):
-        symbols = ["btcusdt", "ethusdt", "solusdt", "BTC-PERPETUAL", "ETH-PERPETUAL", "SOL-PERPETUAL"] 
-        # Note: Symbols in DB might be different case or name, check market_ticks distinct symbol
+        symbols = None
         
         logger.info("Starting Feature Engine Loop...")
         while True:
+            # Re-read every pass so universe changes apply without a restart
+            symbols = self.load_symbols(symbols)
             for sym in symbols:
                 # 1. Fetch
                 df = self.fetch_recent_data(sym)
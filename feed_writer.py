@@ -0,0 +1,101 @@
+import queue
+import logging
+import threading
+import psycopg2
+import config
+import bulk_copy
+
+logger = logging.getLogger("FeedWriter")
+
+# --- Threaded Writer Pool ---
+# The asyncio side only assembles batches and hands them over with put_nowait();
+# every blocking psycopg2 call (COPY/INSERT, commit, rollback, reconnect) happens
+# on one of N writer threads, each holding its own connection from DatabasePool.
+
+
+class BatchWriter(threading.Thread):
+    def __init__(self, batches, db_pool, flush_fn, index, spill=None, on_commit=None):
+        super().__init__(name=f"FeedWriter-{index}")
+        self.batches = batches
+        self.db_pool = db_pool
+        self.flush_fn = flush_fn
+        self.spill = spill  # Called with batches lost to a DB outage (see spool)
+        self.on_commit = on_commit  # Called with every committed batch (latency accounting)
+        self.daemon = True
+        self.rows_written = 0
+        self.batches_failed = 0
+
+    def run(self):
+        conn = None
+        logger.info(f"{self.name} started")
+        while True:
+            batch = self.batches.get()
+            if batch is None:  # Shutdown sentinel
+                break
+            try:
+                if conn is None:
+                    conn = self.db_pool.get_conn()
+                with conn.cursor() as cursor:
+                    self.flush_fn(cursor, batch)
+                conn.commit()
+                self.rows_written += len(batch)
+                if self.on_commit is not None:
+                    self.on_commit(batch)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # Connection is gone: discard it and reconnect on the next batch
+                self.batches_failed += 1
+                if self.spill is not None:
+                    logger.error(f"{self.name} connection lost, spooling {len(batch)} rows: {e}")
+                    self.spill(batch)
+                else:
+                    logger.error(f"{self.name} connection lost, dropping {len(batch)} rows: {e}")
+                if conn is not None:
+                    self.db_pool.put_conn(conn, close=True)
+                    bulk_copy.reset_staging(conn)
+                    conn = None
+            except Exception as e:
+                logger.error(f"{self.name} write error, dropping {len(batch)} rows: {e}", exc_info=True)
+                self.batches_failed += 1
+                if conn is not None:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                    bulk_copy.reset_staging(conn)
+
+        if conn is not None:
+            self.db_pool.put_conn(conn)
+        logger.info(f"{self.name} stopped ({self.rows_written} rows written)")
+
+
+class WriterPool:
+    def __init__(self, db_pool, flush_fn, workers=None, spill=None, on_commit=None):
+        self.workers = workers or config.DB_WRITER_THREADS
+        # A few batches of slack per thread; beyond that the caller must back off
+        self.batches = queue.Queue(maxsize=self.workers * 4)
+        self.threads = [BatchWriter(self.batches, db_pool, flush_fn, i, spill, on_commit) for i in range(self.workers)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def submit(self, batch):
+        """Hand a batch to the writer threads without blocking. False if all are busy."""
+        try:
+            self.batches.put_nowait(batch)
+            return True
+        except queue.Full:
+            return False
+
+    def pending(self):
+        return self.batches.qsize()
+
+    def rows_written(self):
+        return sum(t.rows_written for t in self.threads)
+
+    def stop(self, timeout=10.0):
+        """Blocking: let queued batches drain, then join all threads."""
+        for _ in self.threads:
+            self.batches.put(None)
+        for t in self.threads:
+            t.join(timeout)
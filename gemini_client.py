@@ -4,17 +4,11 @@ import logging
 import httpx
 from itertools import cycle
 import config
+import log_setup
 
 # --- Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [GeminiCouncil] %(message)s',
-    handlers=[
-        logging.FileHandler(f"{config.LOG_DIR}/gemini_client.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger("GeminiCouncil")
+# Also imported by council: only this client's records go to gemini_client.log
+logger = log_setup.setup("gemini_client.log", '%(asctime)s [GeminiCouncil] %(message)s', name="GeminiCouncil")
 
 class KeyRotator:
     def __init__(self):
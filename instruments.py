@@ -0,0 +1,185 @@
+import threading
+import logging
+from datetime import datetime
+import metrics
+
+logger = logging.getLogger("Instruments")
+
+# --- Instrument Registry ---
+# One interned Instrument per (market, symbol): venue symbols are parsed once
+# (underlying, quote, kind, expiry, strike, option type) and every record built
+# from that instrument shares the object. The canonical symbol is the venue
+# symbol upper-cased ('btcusdt' and 'BTCUSDT' are one instrument), which is also
+# what goes into the tick tables' symbol column, so readers query with a plain
+# `symbol = %s` on the (symbol, time DESC) index.
+#
+# Integer ids come from the instruments table so they are the same in every
+# process. Parsers never touch the DB: writer threads call ensure(batch, cursor)
+# first thing in their transaction, which registers the instruments in the batch
+# that have no id yet in one round trip on the writer's own connection (so the
+# pool, --uri and session TEMP tables it runs under apply) and commits right
+# away, before any row of the batch is written: a rolled back tick batch can't
+# take an id with it.
+#
+# Markets use the trade_key namespaces: binance-futures, binance-spot,
+# binance-delivery, bybit-linear, bybit-option, deribit, ... A bare venue name
+# ("bybit") is fine when the segment is unknown; the kind then comes from the
+# symbol alone.
+
+SPOT, PERP, FUTURE, OPTION = "spot", "perp", "future", "option"
+QUOTES = ("FDUSD", "USDT", "USDC", "BUSD", "USD", "BTC", "ETH")  # Longest match first
+
+
+def canonical(symbol):
+    """Upper-cased venue symbol; Deribit's decimal strike marker stays lower case (XRP_USDC-27JUN25-2d5-P)"""
+    symbol = symbol.upper()
+    if symbol.count("-") >= 3:
+        parts = symbol.split("-")
+        parts[2] = parts[2].replace("D", "d")
+        symbol = "-".join(parts)
+    return symbol
+
+
+def _expiry(tag):
+    """Deribit / Bybit '27JUN25' or Binance delivery '250627' -> naive datetime (UTC date)"""
+    if tag.isdigit():
+        return datetime.strptime(tag, "%y%m%d")
+    return datetime.strptime(tag.zfill(7), "%d%b%y")
+
+
+def _split_quote(pair):
+    for quote in QUOTES:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[:-len(quote)], quote
+    return pair, None
+
+
+class Instrument:
+    __slots__ = ("instrument_id", "market", "symbol", "venue", "kind", "underlying", "quote",
+                 "expiry", "strike", "option_type")
+
+    def __init__(self, market, symbol):
+        self.instrument_id = None  # Assigned by InstrumentRegistry.ensure()
+        self.market = market
+        self.symbol = canonical(symbol)
+        self.venue = market.split("-", 1)[0]
+        self.kind = SPOT if market.endswith("-spot") else PERP
+        self.underlying, self.quote = self.symbol, None
+        self.expiry = self.strike = self.option_type = None
+        try:
+            self._parse()
+        except ValueError:
+            logger.debug(f"Unparsed instrument {market} {symbol}")
+
+    def _parse(self):
+        if "-" in self.symbol:
+            # Deribit / Bybit dated: BTC-PERPETUAL, BTC-27JUN25, BTC-27JUN25-60000-C[-USDT], XRP_USDC-27JUN25-2d5-P
+            parts = self.symbol.split("-")
+            self.underlying, _, quote = parts[0].partition("_")
+            self.quote = quote or (parts[4] if len(parts) > 4 else "USD")
+            if parts[1] == "PERPETUAL":
+                self.kind = PERP
+                return
+            self.expiry = _expiry(parts[1])
+            if len(parts) >= 4 and parts[3] in ("C", "P"):
+                self.kind = OPTION
+                self.strike = float(parts[2].replace("d", "."))
+                self.option_type = "CALL" if parts[3] == "C" else "PUT"
+            else:
+                self.kind = FUTURE
+            return
+        pair, _, dated = self.symbol.partition("_")
+        self.underlying, self.quote = _split_quote(pair)
+        if dated:  # Binance delivery BTCUSDT_250627
+            self.kind = FUTURE
+            self.expiry = _expiry(dated)
+
+    @property
+    def key(self):
+        return (self.market, self.symbol)
+
+    def db_row(self):
+        return (self.market, self.symbol, self.venue, self.kind, self.underlying, self.quote,
+                self.expiry, self.strike, self.option_type)
+
+    def __repr__(self):
+        return f"<instrument {self.instrument_id} {self.market} {self.symbol} {self.kind}>"
+
+
+class InstrumentRegistry:
+    def __init__(self):
+        self.by_key = {}  # (market, symbol as received) and (market, canonical) -> Instrument
+        self.ids = {}  # (market, canonical) -> instrument_id
+        self.lock = threading.Lock()  # Held across registration round trips
+        self.intern_lock = threading.Lock()  # Parsers on several lane threads intern concurrently
+
+    def intern(self, market, symbol):
+        inst = self.by_key.get((market, symbol))
+        if inst is not None:
+            return inst
+        with self.intern_lock:
+            inst = self.by_key.get((market, symbol))
+            if inst is None:
+                inst = self.by_key.get((market, canonical(symbol)))
+                if inst is None:
+                    inst = Instrument(market, symbol)
+                    self.by_key[inst.key] = inst
+                    metrics.counter("instruments_interned_total", market=market).inc()
+                self.by_key[(market, symbol)] = inst
+        return inst
+
+    def ensure(self, records, cursor):
+        """Give every instrument referenced by `records` its id; new ones are registered in one round trip
+        on the caller's cursor, which must not have written anything yet in its transaction"""
+        self.resolve([getattr(r, "instrument", None) for r in records], cursor)  # mitm news rows are plain dicts
+
+    def resolve(self, insts, cursor):
+        """ensure() for bare Instruments (None entries are skipped)"""
+        missing = None
+        for inst in insts:
+            if inst is not None and inst.instrument_id is None:
+                if missing is None:
+                    missing = {}
+                missing.setdefault(inst.key, []).append(inst)
+        if missing:
+            self.register(missing, cursor)
+
+    def register(self, missing, cursor):
+        with self.lock:
+            todo = [key for key in missing if key not in self.ids]
+            if todo:
+                self._insert([missing[key][0] for key in todo], cursor)
+            for key, insts in missing.items():
+                for inst in insts:
+                    inst.instrument_id = self.ids[key]
+                interned = self.by_key.get(key)  # Spool replay unpickles copies of interned instruments
+                if interned is not None:
+                    interned.instrument_id = self.ids[key]
+
+    def _insert(self, insts, cursor):
+        values = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s)", i.db_row()).decode("utf-8") for i in insts)
+        cursor.execute(
+            "INSERT INTO instruments (market, symbol, venue, kind, underlying, quote, expiry, strike, "
+            "option_type) VALUES " + values + " ON CONFLICT (market, symbol) DO UPDATE "
+            "SET last_seen = now() RETURNING instrument_id, market, symbol")
+        rows = cursor.fetchall()
+        cursor.connection.commit()  # Ids are only cached once they are durable
+        for instrument_id, market, symbol in rows:
+            self.ids[(market, symbol)] = instrument_id
+        metrics.counter("instruments_registered_total").inc(len(insts))
+        logger.info(f"Registered {len(insts)} instruments ({len(self.ids)} known)")
+
+
+REGISTRY = InstrumentRegistry()
+
+
+def intern(market, symbol):
+    return REGISTRY.intern(market, symbol)
+
+
+def ensure(records, cursor):
+    REGISTRY.ensure(records, cursor)
+
+
+def resolve(insts, cursor):
+    REGISTRY.resolve(insts, cursor)
@@ -0,0 +1,125 @@
+import asyncio
+import collections
+import itertools
+import config
+import metrics
+from tick_records import TRADE, QUOTE, DERIV, BOOK
+
+# --- Priority Lane Queue ---
+# Replaces the single FIFO write queue in MarketFeed. Every record is routed by
+# its kind tag into a lane with its own capacity and shedding policy:
+#   trades -> "never drop": put() returns False when full so the caller spools it
+#             (counted as queue_lane_spilled_total, not as dropped)
+#   quotes -> "conflate":   one pending record per (kind, source, symbol); a newer
+#             top-of-book / book snapshot replaces the queued one in place
+#   derivs -> "sample":     above the watermark only every Nth ticker per
+#             (source, symbol) is kept; at capacity the rest are shed. The
+#             per-instrument counts are cleared once the lane is back under it
+# get_batch() drains lanes in priority order (trades, derivs, quotes).
+
+LANE_OF = {TRADE: "trades", QUOTE: "quotes", BOOK: "quotes", DERIV: "derivs"}
+PRIORITY = ("trades", "derivs", "quotes")
+
+
+class LaneQueue:
+    def __init__(self, trade_capacity=None, quote_capacity=None, deriv_capacity=None,
+                 sample_every=None, sample_watermark=None):
+        self.capacity = {
+            "trades": trade_capacity or config.QUEUE_TRADE_CAPACITY,
+            "quotes": quote_capacity or config.QUEUE_QUOTE_CAPACITY,
+            "derivs": deriv_capacity or config.QUEUE_DERIV_CAPACITY,
+        }
+        self.sample_every = sample_every or config.QUEUE_DERIV_SAMPLE_EVERY
+        self.sample_watermark = sample_watermark if sample_watermark is not None else config.QUEUE_DERIV_SAMPLE_WATERMARK
+        self.trades = collections.deque()
+        self.quotes = {}  # (kind, source, symbol) -> latest record, insertion ordered
+        self.derivs = collections.deque()
+        self._seen = collections.Counter()  # (source, symbol) -> tickers offered while above the watermark
+        self._ready = asyncio.Event()
+        self.m_depth = {lane: metrics.gauge("queue_lane_depth", lane=lane) for lane in PRIORITY}
+        self.m_dropped = {lane: metrics.counter("queue_lane_dropped_total", lane=lane) for lane in PRIORITY}
+        self.m_spilled = metrics.counter("queue_lane_spilled_total", lane="trades")  # Handed back to be spooled
+        self.m_conflated = metrics.counter("queue_lane_conflated_total", lane="quotes")
+        self.m_sampled = metrics.counter("queue_lane_sampled_total", lane="derivs")
+
+    def put_nowait(self, item):
+        """Enqueue by lane policy. True if queued (or conflated), False if shed (dropped or sampled out)."""
+        lane = LANE_OF.get(item.kind, "trades")
+        if lane == "trades":
+            if len(self.trades) >= self.capacity["trades"]:
+                self.m_spilled.inc()
+                return False
+            self.trades.append(item)
+        elif lane == "quotes":
+            key = (item.kind, item.source, item.symbol)
+            if key in self.quotes:
+                self.quotes[key] = item
+                self.m_conflated.inc()
+                return True
+            if len(self.quotes) >= self.capacity["quotes"]:
+                self.m_dropped["quotes"].inc()
+                return False
+            self.quotes[key] = item
+        else:
+            depth, cap = len(self.derivs), self.capacity["derivs"]
+            if depth >= cap:
+                self.m_dropped["derivs"].inc()
+                return False
+            if depth >= cap * self.sample_watermark:
+                key = (item.source, item.symbol)
+                self._seen[key] += 1
+                if self._seen[key] % self.sample_every:
+                    self.m_sampled.inc()
+                    return False
+            elif self._seen:
+                self._seen.clear()
+            self.derivs.append(item)
+        self.m_depth[lane].set(self.depth(lane))
+        self._ready.set()
+        return True
+
+    def depth(self, lane):
+        return len(getattr(self, lane))
+
+    def qsize(self):
+        return len(self.trades) + len(self.quotes) + len(self.derivs)
+
+    def fill(self):
+        """Fullest lane as a fraction of its capacity"""
+        return max(self.depth(lane) / self.capacity[lane] for lane in PRIORITY)
+
+    def get_batch_nowait(self, max_items):
+        batch = []
+        for lane in PRIORITY:
+            room = max_items - len(batch)
+            if room <= 0:
+                break
+            if lane == "quotes":
+                keys = list(itertools.islice(self.quotes, room))
+                batch.extend(self.quotes.pop(k) for k in keys)
+            else:
+                q = getattr(self, lane)
+                for _ in range(min(room, len(q))):
+                    batch.append(q.popleft())
+            self.m_depth[lane].set(self.depth(lane))
+        if not self.qsize():
+            self._ready.clear()
+        return batch
+
+    async def get_batch(self, max_items, timeout):
+        """Up to max_items records, highest priority lanes first; [] after timeout."""
+        if not self.qsize():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.get_batch_nowait(max_items)
+
+    def stats(self):
+        """Per-lane depth / capacity / shed counts (sampled derivs count as shed)"""
+        out = {lane: {"depth": self.depth(lane), "capacity": self.capacity[lane],
+                      "dropped": self.m_dropped[lane].value} for lane in PRIORITY}
+        out["trades"]["spilled"] = self.m_spilled.value
+        out["quotes"]["conflated"] = self.m_conflated.value
+        out["derivs"]["dropped"] += self.m_sampled.value
+        return out
@@ -0,0 +1,83 @@
+import time
+import asyncio
+import threading
+import metrics
+
+# --- Pipeline Latency ---
+# Every record carries three clocks:
+#   timestamp -> exchange event time (set by the parser)
+#   recv_ts   -> when the frame carrying it was read off the socket
+#   enq_ts    -> when it was handed to the write queue
+# LatencyTracker turns them into per-source histograms (ms):
+#   <service>_exchange_to_receive_ms, <service>_receive_to_enqueue_ms,
+#   <service>_enqueue_to_commit_ms
+# and estimates clock skew per venue as the smallest exchange->receive delta
+# seen in a window (network floor; negative means the venue clock runs ahead).
+
+
+def venue_of(source):
+    return (source or "unknown").split("_")[0]
+
+
+class LatencyTracker:
+    def __init__(self, service, skew_window=60.0):
+        self.service = service
+        self.skew_window = skew_window
+        self._hists = {}
+        self._skew_min = {}
+        self._skew_lock = threading.Lock()  # mitm calls enqueued() from several parse lane threads
+        self._window_start = time.time()
+
+    def _hist(self, stage, source):
+        key = (stage, source)
+        h = self._hists.get(key)
+        if h is None:
+            h = self._hists[key] = metrics.histogram(f"{self.service}_{stage}_ms", source=source)
+        return h
+
+    def enqueued(self, item, recv_ts, now=None, venue_time=True):
+        """Stamp a record on its way into the write queue and observe the first two hops.
+        venue_time=False: the record's timestamp is a local clock, so the exchange hop and skew are skipped."""
+        now = now or time.time()
+        if item.recv_ts is None:
+            item.recv_ts = recv_ts or now
+        item.enq_ts = now
+        source = item.source
+        if venue_time and item.timestamp:
+            delta = (item.recv_ts - item.timestamp) * 1000
+            self._hist("exchange_to_receive", source).observe(delta)
+            self._track_skew(venue_of(source), delta, now)
+        self._hist("receive_to_enqueue", source).observe((now - item.recv_ts) * 1000)
+
+    def committed(self, batch, now=None):
+        """Observe enqueue->commit for a batch the writer just committed (writer thread)."""
+        now = now or time.time()
+        for item in batch:
+            enq = getattr(item, "enq_ts", None)
+            if enq is not None:
+                self._hist("enqueue_to_commit", item.source).observe((now - enq) * 1000)
+
+    def _track_skew(self, venue, delta_ms, now):
+        with self._skew_lock:
+            current = self._skew_min.get(venue)
+            if current is None or delta_ms < current:
+                self._skew_min[venue] = delta_ms
+            if now - self._window_start < self.skew_window:
+                return
+            floors, self._skew_min = self._skew_min, {}
+            self._window_start = now
+        for v, floor in floors.items():
+            metrics.gauge(f"{self.service}_clock_skew_ms", venue=v).set(round(floor, 3))
+
+
+async def loop_lag_monitor(service, running, interval=0.25):
+    """Sample asyncio loop lag: how late a sleep(interval) wakes up."""
+    hist = metrics.histogram(f"{service}_loop_lag_ms")
+    gauge = metrics.gauge(f"{service}_loop_lag_last_ms")
+    loop = asyncio.get_running_loop()
+    while running():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, (loop.time() - start - interval) * 1000)
+        hist.observe(lag)
+        gauge.set(round(lag, 3))
@@ -0,0 +1,128 @@
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+import config
+import metrics
+
+logger = logging.getLogger("Liveness")
+
+# --- Websocket Liveness ---
+# `async for msg in ws` never times out, so a half-open socket (venue or proxy
+# silently stopped forwarding) can sit there for minutes. watch() reads with a
+# silence deadline instead and closes the socket when it passes; the connect loop
+# then reconnects after StreamHealth.retry_delay(), a jittered exponential
+# backoff that resets once a connection has delivered data.
+# Protocol keepalives stay with the venue code: aiohttp ping frames
+# (WS_PING_INTERVAL), Bybit {"op": "ping"}, Deribit public/set_heartbeat.
+#
+# When built with a proxy pool, each connection's connect time / time to first
+# frame, or its failure, is reported back so the pool can rank proxies.
+#
+# Metrics per stream:
+#   <service>_stream_up, _stream_uptime_seconds, _stream_silence_seconds (gauges)
+#   <service>_stream_reconnects_total, _stream_stale_total (counters)
+#   <service>_stream_ttfm_ms (histogram: connect start -> first message)
+
+CLOSED_TYPES = (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED)
+
+
+class StreamHealth:
+    def __init__(self, service, stream, silence=None, venue=None, pool=None):
+        self.stream = stream
+        self.silence = silence or config.WS_SILENCE_TIMEOUT
+        self.venue = venue
+        self.pool = pool  # proxy_pool.ProxyPool or None
+        self.proxy = None
+        self.attempt = 0
+        self.connect_started = None
+        self.connect_ms = None
+        self.connected_at = None
+        self.last_message = None
+        self.m_up = metrics.gauge(f"{service}_stream_up", stream=stream)
+        self.m_uptime = metrics.gauge(f"{service}_stream_uptime_seconds", stream=stream)
+        self.m_silence = metrics.gauge(f"{service}_stream_silence_seconds", stream=stream)
+        self.m_reconnects = metrics.counter(f"{service}_stream_reconnects_total", stream=stream)
+        self.m_stale = metrics.counter(f"{service}_stream_stale_total", stream=stream)
+        self.m_ttfm = metrics.histogram(f"{service}_stream_ttfm_ms", stream=stream)
+
+    def connecting(self, proxy=None):
+        if self.connect_started is not None:
+            self.m_reconnects.inc()
+        self.proxy = proxy
+        self.connect_started = time.monotonic()
+        self.connect_ms = None
+        self.connected_at = None
+
+    def connected(self):
+        """Handshake done (socket open, nothing received yet)"""
+        self.connect_ms = (time.monotonic() - self.connect_started) * 1000
+
+    def on_message(self, now):
+        if self.connected_at is None:
+            self.connected_at = now
+            self.attempt = 0  # Healthy again: next drop starts the backoff from scratch
+            ttfm = (now - self.connect_started) * 1000
+            self.m_ttfm.observe(ttfm)
+            self.m_up.set(1)
+            if self.pool is not None:
+                connect_ms = self.connect_ms if self.connect_ms is not None else ttfm
+                self.pool.report_ready(self.venue, self.proxy, connect_ms, ttfm - connect_ms)
+        self.last_message = now
+
+    def failed(self, error):
+        """Connection attempt or live socket failed; blame the proxy it went through"""
+        if self.pool is not None:
+            self.pool.report_failure(self.venue, self.proxy, error)
+
+    def disconnected(self):
+        self.m_up.set(0)
+        self.connected_at = None
+
+    def retry_delay(self):
+        """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))"""
+        ceiling = min(config.WS_BACKOFF_CAP, config.WS_BACKOFF_BASE * (2 ** self.attempt))
+        self.attempt = min(self.attempt + 1, 30)
+        return random.uniform(0, ceiling)
+
+    def refresh(self, now):
+        self.m_up.set(1 if self.connected_at else 0)
+        self.m_uptime.set(round(now - self.connected_at, 1) if self.connected_at else 0)
+        if self.last_message is not None:
+            self.m_silence.set(round(now - self.last_message, 1))
+
+
+async def watch(ws, health):
+    """Yield data frames from ws; close it if nothing arrives within health.silence seconds"""
+    while True:
+        try:
+            msg = await ws.receive(timeout=health.silence)
+        except asyncio.TimeoutError:
+            health.m_stale.inc()
+            logger.warning(f"{health.stream}: no data for {health.silence:g}s, dropping stale connection")
+            health.failed(f"stale for {health.silence:g}s")
+            await ws.close()
+            return
+        if msg.type in CLOSED_TYPES:
+            return
+        health.on_message(time.monotonic())
+        yield msg
+
+
+async def report_loop(healths, running, interval=5.0):
+    """Keeps the uptime / silence gauges current between messages"""
+    while running():
+        now = time.monotonic()
+        for health in healths():
+            health.refresh(now)
+        await asyncio.sleep(interval)
+
+
+async def keepalive(ws, payload, interval):
+    """Application-level ping (e.g. Bybit {"op": "ping"}) for as long as ws is open"""
+    while not ws.closed:
+        await asyncio.sleep(interval)
+        if ws.closed:
+            return
+        await ws.send_json(payload)
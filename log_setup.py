@@ -0,0 +1,232 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+import config
+
+# --- Shared Logging ---
+# Every service logs through one QueueHandler on the root logger. The calling
+# thread only builds the LogRecord and put_nowait()s it; formatting and file /
+# console I/O happen on a single listener thread. A full queue drops the record
+# (counted and reported) rather than block a feed or parser thread.
+#
+# The listener also aggregates repeats: the same message (or the same %-style
+# template) from the same logger is written once per LOG_REPEAT_WINDOW, then one
+# "... (repeated N times in last 5s)" line. Hot paths that would log per event
+# use a Tally instead: add() only bumps a counter and the listener writes one
+# line per interval, e.g. "dropped 1,234 ticks in last 5s".
+#
+# setup(filename) is called once by each entry point. A module that is also
+# imported by another service (the LLM clients under council) passes name= so its
+# file only receives its own logger's records; the process's main log still gets
+# everything.
+
+DEFAULT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+SWEEP_INTERVAL = 1.0  # Listener wakes at least this often to flush repeats and tallies
+
+_lock = threading.Lock()
+_queue = None
+_handler = None
+_listener = None
+_files = {}  # path -> FileHandler
+_console = None
+_tallies = []
+
+
+class LogQueue(queue.Queue):
+    """Bounded record queue. Nobody join()s it, and the listener's sweep wake-ups are not
+    queue items, so task_done() bookkeeping is skipped."""
+
+    def task_done(self):
+        pass
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueues the record unformatted (the listener formats it) and never blocks"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Traceback text now: keeping exc_info would pin every frame until the listener runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Sweep:
+    """Returned by dequeue() when the queue stayed empty for SWEEP_INTERVAL"""
+
+
+_SWEEP = _Sweep()
+
+
+class AggregatingListener(QueueListener):
+    def __init__(self, q, *handlers):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.window = config.LOG_REPEAT_WINDOW
+        self.repeats = {}  # (logger, level, message or template) -> [window start, suppressed, last record]
+        self.last_sweep = time.monotonic()
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get(block, timeout=SWEEP_INTERVAL)
+        except queue.Empty:
+            return _SWEEP
+
+    def handle(self, record):
+        now = time.monotonic()
+        if now - self.last_sweep >= SWEEP_INTERVAL:
+            self.sweep(now)
+        if record is _SWEEP:
+            return
+        key = (record.name, record.levelno, record.msg if record.args else record.getMessage())
+        state = self.repeats.get(key)
+        if state is not None and now - state[0] < self.window:
+            state[1] += 1
+            state[2] = record
+            return
+        if state is not None and state[1]:
+            self.emit_repeats(state, now)
+        self.repeats[key] = [now, 0, record]
+        super().handle(record)
+
+    def emit_repeats(self, state, now):
+        start, count, record = state
+        summary = logging.makeLogRecord(record.__dict__)
+        summary.msg = f"{record.getMessage()} (repeated {count:,} times in last {now - start:.0f}s)"
+        summary.args = None
+        summary.exc_text = None
+        summary.created = time.time()
+        summary.msecs = summary.created % 1 * 1000
+        super().handle(summary)
+
+    def sweep(self, now, force=False):
+        self.last_sweep = now
+        for key, state in list(self.repeats.items()):
+            if force or now - state[0] >= self.window:
+                if state[1]:
+                    self.emit_repeats(state, now)
+                del self.repeats[key]
+        for tally in list(_tallies):
+            tally.flush(now, force)
+        if _handler is not None and _handler.dropped:
+            dropped, _handler.dropped = _handler.dropped, 0
+            record = logging.makeLogRecord({"name": "LogSetup", "levelno": logging.WARNING, "levelname": "WARNING",
+                                            "msg": f"Log queue full, dropped {dropped:,} records"})
+            super().handle(record)
+
+
+class Tally:
+    """Hot-path event counter logged as one aggregated line per interval"""
+
+    def __init__(self, logger, message, level=logging.WARNING, interval=None):
+        self.logger = logger
+        self.message = message  # str.format with {n} (count) and {secs} (interval)
+        self.level = level
+        self.interval = interval or config.LOG_REPEAT_WINDOW
+        self.count = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()  # add() comes from lane and writer threads alike
+        _tallies.append(self)
+
+    def add(self, n=1):
+        with self.lock:
+            self.count += n
+
+    def flush(self, now, force=False):
+        with self.lock:
+            if now - self.started < self.interval and not force:
+                return
+            n, self.count = self.count, 0
+            secs = max(1, round(now - self.started))
+            self.started = now
+        if n:
+            self.logger.log(self.level, self.message.format(n=n, secs=secs))
+
+
+def _only(name):
+    return lambda record: record.name == name
+
+
+def _file_handler(filename, fmt, name):
+    path = os.path.join(config.LOG_DIR, filename)
+    handler = _files.get(path)
+    if handler is None:
+        os.makedirs(config.LOG_DIR, exist_ok=True)
+        handler = _files[path] = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter(fmt))
+        if name is not None:
+            handler.addFilter(_only(name))
+    return handler
+
+
+def setup(filename, fmt=DEFAULT_FORMAT, level=None, name=None, stream=True):
+    """Route this process's logging through the shared queue and into LOG_DIR/filename.
+    With name=, the file (and the console, until an entry point claims it) only gets that logger."""
+    global _queue, _handler, _listener, _console
+    level = getattr(logging, level or config.LOG_LEVEL)
+    with _lock:
+        if _listener is None:
+            _queue = LogQueue(maxsize=config.LOG_QUEUE_SIZE)
+            _handler = LazyQueueHandler(_queue)
+            logging.getLogger().addHandler(_handler)
+            _listener = AggregatingListener(_queue)
+            _listener.start()
+            atexit.register(shutdown)
+        handlers = list(_listener.handlers)
+        handler = _file_handler(filename, fmt, name)
+        if handler not in handlers:
+            handlers.append(handler)
+        if stream:
+            if _console is None:
+                _console = logging.StreamHandler()
+                _console.setFormatter(logging.Formatter(fmt))
+                if name is not None:
+                    _console.addFilter(_only(name))
+                handlers.append(_console)
+            elif name is None and _console.filters:
+                _console.filters.clear()
+                _console.setFormatter(logging.Formatter(fmt))
+        _listener.handlers = tuple(handlers)
+        logger = logging.getLogger(name)  # Root when name is None
+        logger.setLevel(level)
+    return logger
+
+
+def shutdown():
+    """Flush pending repeats / tallies and stop the listener (atexit)"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        listener.sweep(time.monotonic(), force=True)
+
+
+def _after_fork():
+    # The listener thread does not survive fork: the child gets a fresh queue and thread
+    global _queue, _listener, _lock
+    _lock = threading.Lock()
+    for tally in _tallies:
+        tally.lock = threading.Lock()  # May have been held by another thread at fork
+        tally.count = 0  # The parent reports what it counted
+    if _listener is not None:
+        _queue = LogQueue(maxsize=config.LOG_QUEUE_SIZE)
+        _handler.queue = _queue
+        _listener = AggregatingListener(_queue, *_listener.handlers)
+        _listener.start()
+
+
+os.register_at_fork(after_in_child=_after_fork)
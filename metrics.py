@@ -0,0 +1,203 @@
+import json
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("Metrics")
+
+# --- In-Process Metrics ---
+# Tiny counter/gauge/histogram registry shared by the feed components. Metrics are
+# keyed by name + labels and read back with snapshot() for logging, or scraped
+# from the local endpoint started by serve() (/metrics text, /metrics.json).
+# Handles are shared by every thread that resolves the same name + labels (the
+# mitm parse lanes, writer threads), so each update takes the handle's own lock.
+
+_lock = threading.Lock()
+_registry = {}
+
+
+class Counter:
+    __slots__ = ("name", "labels", "value", "lock")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+
+class Gauge:
+    __slots__ = ("name", "labels", "value", "lock")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def dec(self, n=1):
+        with self.lock:
+            self.value -= n
+
+
+# Upper bounds in milliseconds; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    __slots__ = ("name", "labels", "bounds", "buckets", "count", "sum", "lock")
+
+    def __init__(self, name, labels, bounds=LATENCY_BUCKETS_MS):
+        self.name = name
+        self.labels = labels
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.buckets[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket holding the q-th observation (histogram_quantile style)"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                if i >= len(self.bounds):
+                    return float("inf")
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return float("inf")
+
+    @property
+    def value(self):
+        return self.count
+
+
+def _get(cls, name, labels):
+    key = (name, tuple(sorted(labels.items())))
+    metric = _registry.get(key)
+    if metric is None:
+        with _lock:
+            metric = _registry.get(key)
+            if metric is None:
+                metric = _registry[key] = cls(name, dict(labels))
+    return metric
+
+
+def counter(name, **labels):
+    return _get(Counter, name, labels)
+
+
+def gauge(name, **labels):
+    return _get(Gauge, name, labels)
+
+
+def histogram(name, **labels):
+    return _get(Histogram, name, labels)
+
+
+def snapshot(prefix=""):
+    """[(name, labels, value)] for every registered metric starting with prefix"""
+    return [(m.name, m.labels, m.value) for m in list(_registry.values()) if m.name.startswith(prefix)]
+
+
+def total(name, **labels):
+    """Sum a metric across all label sets matching the given labels"""
+    return sum(
+        m.value for m in list(_registry.values())
+        if m.name == name and all(m.labels.get(k) == v for k, v in labels.items())
+    )
+
+
+# --- Export ---
+def _label_str(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_text():
+    """Prometheus text exposition of every registered metric"""
+    lines = []
+    for m in sorted(list(_registry.values()), key=lambda m: m.name):
+        if isinstance(m, Histogram):
+            cumulative = 0
+            for bound, n in zip(list(m.bounds) + ["+Inf"], m.buckets):
+                cumulative += n
+                lines.append(f"{m.name}_bucket{_label_str(m.labels, {'le': bound})} {cumulative}")
+            lines.append(f"{m.name}_sum{_label_str(m.labels)} {m.sum}")
+            lines.append(f"{m.name}_count{_label_str(m.labels)} {m.count}")
+        else:
+            lines.append(f"{m.name}{_label_str(m.labels)} {m.value}")
+    return "\n".join(lines) + "\n"
+
+
+def render_json():
+    """Flat JSON list; histograms are summarized as count / mean / p50 / p99"""
+    out = []
+    for m in list(_registry.values()):
+        entry = {"name": m.name, "labels": m.labels}
+        if isinstance(m, Histogram):
+            entry.update(count=m.count, mean=m.sum / m.count if m.count else None,
+                         p50=m.quantile(0.5), p99=m.quantile(0.99))
+        else:
+            entry["value"] = m.value
+        out.append(entry)
+    return json.dumps(out, default=str)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = render_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = render_text(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Start the metrics endpoint on a daemon thread. Returns the server (None if the port is taken)."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        logger.error(f"Metrics endpoint on {host}:{port} unavailable: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"Metrics-{port}", daemon=True).start()
+    logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,18 @@
+-- Gap ledger: one row per websocket hole detected by direct_feed (see backfill.py)
+CREATE TABLE IF NOT EXISTS feed_gaps (
+    id BIGSERIAL PRIMARY KEY,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    market TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    reason TEXT,
+    from_id BIGINT,
+    to_id BIGINT,
+    gap_start TIMESTAMPTZ,
+    gap_end TIMESTAMPTZ,
+    status TEXT NOT NULL,
+    rows_filled INTEGER DEFAULT 0,
+    filled_at TIMESTAMPTZ,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_feed_gaps_detected ON feed_gaps (detected_at DESC);
@@ -0,0 +1,30 @@
+-- Instrument registry: canonical instrument dimension + integer keys on the tick tables (see instruments.py)
+CREATE TABLE IF NOT EXISTS instruments (
+    instrument_id SERIAL PRIMARY KEY,
+    market TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    venue TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    underlying TEXT,
+    quote TEXT,
+    expiry TIMESTAMPTZ,
+    strike DOUBLE PRECISION,
+    option_type VARCHAR(4),
+    first_seen TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_seen TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (market, symbol)
+);
+
+CREATE INDEX IF NOT EXISTS idx_instruments_underlying ON instruments (underlying, kind, expiry);
+
+-- Rows written before this migration keep instrument_id NULL
+ALTER TABLE market_ticks ADD COLUMN IF NOT EXISTS instrument_id INTEGER;
+ALTER TABLE derivatives_stats ADD COLUMN IF NOT EXISTS instrument_id INTEGER;
+ALTER TABLE orderbook_snapshots ADD COLUMN IF NOT EXISTS instrument_id INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_market_ticks_instrument_time ON market_ticks (instrument_id, time DESC);
+CREATE INDEX IF NOT EXISTS idx_derivatives_instrument_time ON derivatives_stats (instrument_id, time DESC);
+CREATE INDEX IF NOT EXISTS idx_orderbook_instrument_time ON orderbook_snapshots (instrument_id, time DESC);
+
+-- feature_engine used to key features by 'btcusdt'; readers now look them up by canonical symbol
+UPDATE market_features SET symbol = upper(symbol) WHERE symbol <> upper(symbol);
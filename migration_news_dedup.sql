@@ -0,0 +1,18 @@
+-- News dedup: one news_items row per headline (source + normalized title hash, see
+-- dedup.py) with first / last sighting; news_sentiment only gets the first one.
+-- news_sentiment is a hypertable, so a unique key there would have to include time
+-- and could not stop a re-scraped headline; the key lives in this plain table.
+CREATE TABLE IF NOT EXISTS news_items (
+    content_hash TEXT PRIMARY KEY, -- blake2b-128 hex of source + normalized title (+ amount)
+    source TEXT NOT NULL,
+    title TEXT,
+    first_seen TIMESTAMPTZ NOT NULL, -- = news_sentiment.time of the stored row
+    last_seen TIMESTAMPTZ NOT NULL,
+    seen_count BIGINT NOT NULL DEFAULT 1 -- Page loads / polls that carried it
+);
+
+CREATE INDEX IF NOT EXISTS idx_news_items_last_seen ON news_items (last_seen DESC);
+
+-- Rows written before this migration keep a NULL hash and are left as they are.
+ALTER TABLE news_sentiment ADD COLUMN IF NOT EXISTS content_hash TEXT; -- news_items.content_hash
+CREATE INDEX IF NOT EXISTS idx_news_hash ON news_sentiment (content_hash);
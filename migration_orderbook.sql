@@ -0,0 +1,16 @@
+-- Local L2 order book engine: periodic snapshots replace per-update mid-price rows
+CREATE TABLE IF NOT EXISTS orderbook_snapshots (
+    time TIMESTAMPTZ NOT NULL,
+    symbol TEXT NOT NULL,
+    source TEXT,
+    mid DOUBLE PRECISION,
+    weighted_mid DOUBLE PRECISION,
+    imbalance DOUBLE PRECISION,
+    bid_px DOUBLE PRECISION[],
+    bid_sz DOUBLE PRECISION[],
+    ask_px DOUBLE PRECISION[],
+    ask_sz DOUBLE PRECISION[]
+);
+
+SELECT create_hypertable('orderbook_snapshots', 'time', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_orderbook_symbol_time ON orderbook_snapshots (symbol, time DESC);
@@ -0,0 +1,10 @@
+-- Symbol universe: perpetuals direct_feed currently streams (see universe.py), read by feature_engine
+CREATE TABLE IF NOT EXISTS symbol_universe (
+    symbol TEXT PRIMARY KEY,
+    rank INTEGER,
+    quote_volume DOUBLE PRECISION,
+    pinned BOOLEAN NOT NULL DEFAULT FALSE,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    added_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
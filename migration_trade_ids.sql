@@ -0,0 +1,7 @@
+-- Exchange trade IDs on market_ticks: lets direct_feed and mitm_parser write the
+-- same print without double counting volume / CVD.
+ALTER TABLE market_ticks ADD COLUMN IF NOT EXISTS trade_id TEXT; -- '<market>:<exchange trade id>'
+
+-- Unique per trade; includes time because hypertable unique indexes must cover the partition column.
+-- Rows without an ID (quotes, legacy rows) are left out of the index entirely.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_market_ticks_trade ON market_ticks (symbol, trade_id, time) WHERE trade_id IS NOT NULL;
@@ -5,18 +5,33 @@ from datetime import datetime
 import json
 import os
 import sys
-import zlib
 import time
 import threading
 import queue
-import traceback
+import logging
+import functools
 import psycopg2 
-from bs4 import BeautifulSoup # Added for better HTML parsing
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from mitmproxy.net import encoding
 
 # --- Config Import Hack for mitmdump ---
 # Ensure we can import config.py from the same directory
 sys.path.append(os.path.dirname(__file__))
 import config
+import log_setup
+from tick_records import Tick, DerivTicker, TRADE, QUOTE, DERIV, trade_key
+from dedup import TradeDedup, NewsDedup, news_key
+import instruments
+import bulk_copy
+from spool import Spool, SpoolReplayer, copy_entries, NEWS as SPOOL_NEWS
+import ws_capture
+import metrics
+from latency import LatencyTracker
+from parse_pool import ParseLane
+from ws_codec import FlowDecoder, hint_from_handshake
+from routing import Router
+import news_extract
 
 # Target domains
 TARGET_DOMAINS = [
@@ -40,167 +55,325 @@ TARGET_DOMAINS = [
 
 OUTPUT_FILE = "captured_data.jsonl"
 
-try:
-    import brotli
-except ImportError:
-    brotli = None
+# mitmproxy already prints to the console; this only adds logs/mitm_parser.log behind the shared queue
+log_setup.setup("mitm_parser.log", stream=False)
+logger = logging.getLogger("CryptoParser")
+
+# --- Trade ID namespaces (see tick_records.trade_key) ---
+def venue_ts(*millis):
+    """First exchange timestamp present (epoch ms) as epoch seconds, None if the message carries none"""
+    for ms in millis:
+        if ms:
+            return float(ms) / 1000
+    return None
+
+
+def binance_market(url):
+    if "fstream" in url: return "binance-futures"
+    if "dstream" in url: return "binance-delivery"
+    return "binance-spot"
+
+
+def bybit_market(url):
+    """wss://stream.bybit.com/v5/public/linear -> bybit-linear; None when the socket type is unknown"""
+    if "/public/" not in url: return None
+    return "bybit-" + url.split("/public/", 1)[1].split("?")[0].split("/")[0]
+
 
 class DatabaseWriter(threading.Thread):
-    def __init__(self, q):
+    def __init__(self, q, spill=None, on_commit=None):
         super().__init__()
         self.queue = q
+        self.spill = spill  # Buffers that can't reach the DB go to the spool
+        self.on_commit = on_commit  # Called with every committed buffer (latency accounting)
         # Phase 7: Use Config Isolation
         self.db_uri = config.DB_URI 
         self.batch_size = config.BATCH_SIZE
         self.flush_interval = config.BATCH_INTERVAL
+        self.m_news_touched = metrics.counter("mitm_news_touched_total")  # Known headlines whose last_seen was bumped
         self.daemon = True 
         self.running = True
 
     def run(self):
-        debug_path = os.path.join(os.path.dirname(__file__), "writer_debug.log")
-        with open(debug_path, "w") as f:
-             f.write(f"[Writer] Process started. PID: {os.getpid()}\n")
-        
+        logger.info(f"[Writer] Thread started. PID: {os.getpid()}")
+
         buffer = []
         last_flush = time.time()
-        
-        # Real connection
         conn = None
-        cursor = None
-        try:
-            conn = psycopg2.connect(self.db_uri)
-            cursor = conn.cursor()
-            with open(debug_path, "a") as f: f.write(f"[Writer] Connected to DB (Port {config.DB_PORT})\n")
-        except Exception as e:
-             with open(debug_path, "a") as f: f.write(f"[Writer] DB CONNECT FAIL: {e}\n")
+        retry_at, backoff = 0.0, 1.0  # Reconnect schedule while the DB is down
 
         while self.running:
+            # Non-blocking fetch with small timeout
             try:
-                # Non-blocking fetch with small timeout
+                record = self.queue.get(timeout=0.1)
+                buffer.append(record)
+            except queue.Empty:
+                pass
+
+            # Auto-flush
+            now = time.time()
+            if not (len(buffer) >= self.batch_size or (now - last_flush > self.flush_interval and buffer)):
+                continue
+            batch, buffer, last_flush = buffer, [], now
+
+            if conn is None and now >= retry_at:
                 try:
-                    record = self.queue.get(timeout=0.1)
-                    buffer.append(record)
-                except queue.Empty:
-                    pass
-
-                # Auto-flush
-                now = time.time()
-                if len(buffer) >= self.batch_size or (now - last_flush > self.flush_interval and buffer):
-                    if conn:
-                        self.flush_batch(cursor, buffer)
-                        conn.commit()
-                    buffer = []
-                    last_flush = now
-                
+                    conn = psycopg2.connect(self.db_uri)
+                    backoff = 1.0
+                    logger.info(f"[Writer] Connected to DB (Port {config.DB_PORT})")
+                except Exception as e:
+                    retry_at, backoff = now + backoff, min(backoff * 2, 30.0)
+                    logger.error(f"[Writer] DB CONNECT FAIL (retry in {retry_at - now:.0f}s): {e}")
+            if conn is None:
+                self.lost(batch, "DB unavailable")
+                continue
+
+            try:
+                with conn.cursor() as cursor:
+                    self.flush_batch(cursor, batch)
+                conn.commit()
+                if self.on_commit:
+                    self.on_commit(batch)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # Connection is gone: spool the batch, reconnect on a later flush
+                self.lost(batch, f"connection lost: {e}")
+                try: conn.close()
+                except Exception: pass
+                bulk_copy.reset_staging(conn)
+                conn, retry_at = None, now + backoff
             except Exception as e:
-                with open(debug_path, "a") as f: f.write(f"Error: {e}\n")
-                if conn:
-                    try: conn.rollback()
-                    except: pass
-                traceback.print_exc()
-        
+                # Bad rows, not an outage: don't let them wedge the writer
+                logger.error(f"[Writer] Write error, dropping {len(batch)} records: {e}", exc_info=True)
+                try: conn.rollback()
+                except Exception: pass
+                bulk_copy.reset_staging(conn)
+
         if conn: conn.close()
-    
+
+    def lost(self, batch, reason):
+        """A batch that could not reach the DB goes to the spool (dropped without one)"""
+        if self.spill:
+            logger.error(f"[Writer] {reason}, spooling {len(batch)} records")
+            self.spill(batch)
+        else:
+            logger.error(f"[Writer] {reason}, dropping {len(batch)} records")
+
     def flush_batch(self, cursor, batch):
-        ticks = [r for r in batch if r['type'] == 'tick']
-        derivs = [r for r in batch if r['type'] == 'derivative']
-        news = [r for r in batch if r['type'] == 'news']
+        instruments.ensure(batch, cursor)
+        ticks, derivs, news = [], [], []
+        for r in batch:
+            # News/whale rows stay plain dicts; market data arrives as tick_records
+            if isinstance(r, dict): news.append(r)
+            elif r.kind == DERIV: derivs.append(r)
+            else: ticks.append(r)
         
         if ticks:
-             args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s)", (
-                 time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t['timestamp'])), 
-                 t['symbol'], t['price'], t['bid'], t['ask'], t['volume'], t['source'],
-                 t.get('side')
-             )).decode('utf-8') for t in ticks)
-             cursor.execute("INSERT INTO market_ticks (time, symbol, price, bid, ask, volume, source, side) VALUES " + args_str + " ON CONFLICT DO NOTHING")
+             # Full-precision time: the trade unique index only matches if both paths write the same instant
+             args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", t.tick_row()).decode('utf-8') for t in ticks)
+             cursor.execute("INSERT INTO market_ticks (time, symbol, price, bid, ask, volume, source, side, trade_id, instrument_id) VALUES " + args_str + " ON CONFLICT DO NOTHING")
 
         # Phase 7: Fixed Schema Drift (Added 'source' column)
         if derivs:
-             args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", (
-                 time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(d['timestamp'])), 
-                 d['symbol'], d.get('funding_rate', 0), d.get('open_interest', 0), d.get('turnover', 0), 
-                 d.get('iv', 0), d.get('delta', 0), d.get('gamma', 0),
-                 d.get('source'),  # Added source
-                 d.get('expiry'), d.get('strike', 0), d.get('option_type')
-             )).decode('utf-8') for d in derivs)
-             cursor.execute("INSERT INTO derivatives_stats (time, symbol, funding_rate, open_interest, turnover, iv, delta, gamma, source, expiry, strike, option_type) VALUES " + args_str + " ON CONFLICT DO NOTHING")
+             # Full-precision time, like ticks and direct_feed
+             args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", d.deriv_row()).decode('utf-8') for d in derivs)
+             cursor.execute("INSERT INTO derivatives_stats (time, symbol, funding_rate, open_interest, turnover, iv, delta, gamma, source, expiry, strike, option_type, instrument_id) VALUES " + args_str + " ON CONFLICT DO NOTHING")
 
         if news:
-             args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s)", (
-                 time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(n['timestamp'])), 
-                 n['source'], n['title'], n['currency'], n['sentiment'], n['amount']
-             )).decode('utf-8') for n in news)
-             # Note: schema.sql has raw_data JSONB, but simple insert ignores it (default null) which is fine for now
-             cursor.execute("INSERT INTO news_sentiment (time, source, title, currency, sentiment, amount) VALUES " + args_str + " ON CONFLICT DO NOTHING")
+             self.flush_news(cursor, news)
+
+    def flush_news(self, cursor, news):
+        """First sighting of a headline -> news_items + news_sentiment; repeats only bump last_seen"""
+        items = {}  # content_hash -> [first row, last_seen, seen]
+        for n in news:
+            key = n.get('content_hash') or news_key(n['source'], n['title'], n.get('amount'))  # Pre-dedup spool rows
+            item = items.get(key)
+            if item is None:
+                items[key] = [n, n['timestamp'], n.get('seen', 1)]
+            else:
+                if n['timestamp'] < item[0]['timestamp']: item[0] = n
+                item[1] = max(item[1], n['timestamp'])
+                item[2] += n.get('seen', 1)
+        ts = lambda t: time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t))
+
+        args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s)", (
+            key, n['source'], n['title'], ts(n['timestamp']), ts(last_seen), seen
+        )).decode('utf-8') for key, (n, last_seen, seen) in items.items())
+        cursor.execute("INSERT INTO news_items (content_hash, source, title, first_seen, last_seen, seen_count) VALUES "
+                       + args_str + " ON CONFLICT (content_hash) DO NOTHING RETURNING content_hash")
+        fresh = {row[0] for row in cursor.fetchall()}
+
+        known = [(key, ts(last_seen), seen) for key, (n, last_seen, seen) in items.items() if key not in fresh]
+        if known:
+            args_str = ",".join(cursor.mogrify("(%s,%s::timestamptz,%s)", k).decode('utf-8') for k in known)
+            cursor.execute("UPDATE news_items SET last_seen = GREATEST(news_items.last_seen, v.last_seen), "
+                           "seen_count = news_items.seen_count + v.seen FROM (VALUES " + args_str + ") "
+                           "AS v (content_hash, last_seen, seen) WHERE news_items.content_hash = v.content_hash")
+            self.m_news_touched.inc(len(known))
+
+        if fresh:
+            args_str = ",".join(cursor.mogrify("(%s,%s,%s,%s,%s,%s,%s)", (
+                ts(n['timestamp']), n['source'], n['title'], n['currency'], n['sentiment'], n['amount'], key
+            )).decode('utf-8') for key, (n, _, _) in items.items() if key in fresh)
+            # Note: schema.sql has raw_data JSONB, but simple insert ignores it (default null) which is fine for now
+            cursor.execute("INSERT INTO news_sentiment (time, source, title, currency, sentiment, amount, content_hash) VALUES " + args_str)
+
+    def replay_batch(self, cursor, entries):
+        """Spool replay: tick rows via COPY, news through the regular insert"""
+        copy_entries(cursor, entries)
+        news = [row for table, row, _ in entries if table == SPOOL_NEWS]
+        if news:
+            self.flush_batch(cursor, news)
 
     def stop(self):
         self.running = False
 
 
 class CryptoParser:
-    def __init__(self):
-        self.debug_log = os.path.join(os.path.dirname(__file__), "parser_debug.log")
-        with open(self.debug_log, "w") as f:
-            f.write("Parser initialized\n")
-            
+    def __init__(self, start_writer=True):
+        logger.info("Parser initialized")
+
         # Initialize DB Writer Pipeline
         # Phase 7: Bounded Queue
         self.queue = queue.Queue(maxsize=config.QUEUE_MAX_SIZE)
-        self.writer = DatabaseWriter(self.queue)
-        self.writer.start()
-        with open(self.debug_log, "a") as f:
-            f.write("DB Writer Process Started\n")
+        # Overflow / DB-outage buffer; replayed once the writer has caught up
+        self.spool = Spool("mitm_parser", directory=os.path.join(os.path.dirname(__file__), config.SPOOL_DIR))
+        # Per-hop latency histograms; recv_ts is the arrival time of the message being parsed
+        # (per lane thread, see the recv_ts property)
+        self.latency = LatencyTracker("mitm")
+        self._local = threading.local()
+        # Same (symbol, trade_id) seen twice in this process is dropped before the queue
+        self.dedup = TradeDedup("mitm")
+        # Headlines the news pages repeat on every reload: counted in memory, not re-queued
+        self.news_dedup = NewsDedup("mitm")
+        self.writer = DatabaseWriter(self.queue, spill=self.spool.extend, on_commit=self.latency.committed)
+        self.replayer = SpoolReplayer(
+            self.spool, ready=lambda: self.queue.qsize() < config.QUEUE_MAX_SIZE // 2,
+            flush_fn=self.writer.replay_batch)
+        # Parsing is off mitmproxy's event thread: websocket frames (small, latency
+        # sensitive) and HTTP responses (news pages, big JSON) get separate lanes so a
+        # slow page never queues in front of a trade
+        self.ws_lane = ParseLane("ws", self.parse_frame, config.MITM_WS_WORKERS, config.MITM_WS_QUEUE,
+                                 sharded=True)
+        self.http_lane = ParseLane("http", self.parse_response, config.MITM_HTTP_WORKERS, config.MITM_HTTP_QUEUE)
+        self.html_procs = None  # Process pool for news_extract (page parsing holds the GIL)
+        # The http lane only hands pages to the pool; results come back through a done callback
+        self.html_slots = threading.BoundedSemaphore(config.MITM_HTML_PENDING)
+        self.m_html_dropped = metrics.counter("mitm_parse_dropped_total", lane="html")
+        self.html_drop_log = log_setup.Tally(logger, "HTML process pool busy: dropped {n:,} pages in last {secs}s")
+        # flow.id -> FlowDecoder, from websocket_start until the flow's end marker leaves the ws lane
+        self.decoders = {}
+        self.m_decoders = metrics.gauge("mitm_ws_decoders")
+        self.router = self.build_router()
+        # start_writer=False: offline replay drains self.queue itself and parses inline (see ws_replay)
+        if start_writer:
+            self.writer.start()
+            self.replayer.start()
+            self.ws_lane.start()
+            self.http_lane.start()
+            if config.MITM_HTML_PROCESSES > 0:
+                # spawn, not fork: this process already runs writer and mitmproxy threads
+                self.html_procs = ProcessPoolExecutor(config.MITM_HTML_PROCESSES,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            metrics.serve(config.MITM_METRICS_PORT)
+        # Raw frame capture for offline replay (config.CAPTURE_DIR); None when off
+        self.recorder = ws_capture.from_config("mitm_parser")
+        # Writer queue overflow is logged once per window, not per record
+        self.spool_log = log_setup.Tally(logger, "Writer queue full: spooled {n:,} records in last {secs}s")
+        logger.info("DB Writer Thread Started" if start_writer else "Offline mode: no writer, parsing inline")
 
     def __del__(self):
+        for lane in ('ws_lane', 'http_lane'):
+            if hasattr(self, lane):
+                getattr(self, lane).stop()
+        if getattr(self, 'html_procs', None):
+            self.html_procs.shutdown(wait=False, cancel_futures=True)
         if hasattr(self, 'writer'):
             self.writer.stop()
-
-    def is_target(self, url):
-        return any(domain in url for domain in TARGET_DOMAINS)
-
-    def decode_message(self, content):
-        if not isinstance(content, bytes): return str(content)
-        try: return content.decode('utf-8')
-        except: pass
-        try: return zlib.decompress(content, 16 + zlib.MAX_WBITS).decode('utf-8')
-        except: pass
-        try: return zlib.decompress(content, -zlib.MAX_WBITS).decode('utf-8')
-        except: pass
-        if brotli:
-            try: return brotli.decompress(content).decode('utf-8')
-            except: pass
-        return None
-
-    def push_to_queue(self, record_type, data):
-        """Push structured data to DB Writer Queue"""
-        payload = data.copy()
-        payload['type'] = record_type
+        if hasattr(self, 'replayer'):
+            self.replayer.stop()
+        if getattr(self, 'recorder', None):
+            self.recorder.close()
+
+    @property
+    def recv_ts(self):
+        return getattr(self._local, "recv_ts", None)
+
+    @recv_ts.setter
+    def recv_ts(self, value):
+        self._local.recv_ts = value
+
+    def arrival_ts(self):
+        """Timestamp for a record whose message carries no exchange time"""
+        return self.recv_ts or time.time()
+
+    def build_router(self):
+        """Host (+ url path / frame topic) -> parser; see routing"""
+        router = Router(TARGET_DOMAINS)
+        # Websocket frames; topics are the words parse_* look for in the topic / stream / channel
+        # Topic match is case-sensitive: v5 trades arrive as publicTrade.<symbol>
+        router.register("ws", "bybit.com", self.parse_bybit, topics=("ticker", "publicTrade", "trade", "mark_price", "book"),
+                        bind=lambda url: {"market": bybit_market(url)})
+        router.register("ws", "deribit.com", self.parse_deribit, topics=("ticker",))
+        router.register("ws", "binance.com", self.parse_binance, topics=("forceOrder", "aggTrade", "ticker"),
+                        bind=lambda url: {"market": binance_market(url)})
+        # HTTP JSON
+        router.register("json", "cryptopanic.com", self.parse_cryptopanic)
+        router.register("json", "dexcheck.ai", self.parse_whale_alert)
+        router.register("json", "whale-alert.io", self.parse_whale_alert)
+        router.register("json", "bybit.com", self.parse_bybit, path="api")
+        # Server-rendered pages: per-site rules or the <title> (news_extract)
+        for domain in TARGET_DOMAINS:
+            router.register("html", domain, functools.partial(self.parse_html_content, source=domain))
+        return router
+
+    def decode_message(self, content, flow_id=None, is_text=False):
+        """Frame payload as text; codec state (e.g. a context-takeover inflater) lives per flow"""
+        if flow_id is None:
+            return FlowDecoder().decode(content, is_text)
+        decoder = self.decoders.get(flow_id)
+        if decoder is None:  # Flow opened before the addon loaded, or offline replay
+            decoder = self.decoders[flow_id] = FlowDecoder()
+            self.m_decoders.set(len(self.decoders))
+        return decoder.decode(content, is_text)
+
+    def push_to_queue(self, record, venue_time=True):
+        """Push a tick record (or news dict) to DB Writer Queue"""
+        if not isinstance(record, dict):
+            if record.kind == TRADE and self.dedup.is_duplicate(record):
+                return
+            self.latency.enqueued(record, self.recv_ts, venue_time=venue_time)
         try:
-            self.queue.put(payload, block=False)
+            self.queue.put(record, block=False)
         except queue.Full:
-            with open(self.debug_log, "a") as f: f.write("Queue Full, dropping packet\n")
+            self.spool.append(record)
+            self.spool_log.add()
 
-    def save_csv(self, row):
-        rtype = 'tick'
-        if row.get('funding_rate') or row.get('iv'):
-            rtype = 'derivative'
-        self.push_to_queue(rtype, row)
+    def save_csv(self, record, venue_time=True):
+        """venue_time=False when the record had no exchange timestamp and carries the receive time"""
+        self.push_to_queue(record, venue_time)
 
     def save_news_csv(self, row):
-        self.push_to_queue('news', row)
+        payload = row.copy()
+        payload['type'] = 'news'
+        if not self.news_dedup.admit(payload):
+            return
+        self.push_to_queue(payload)
 
     def log_error(self, context, error):
-        with open(self.debug_log, "a") as f: f.write(f"[{context}] Error: {error}\n")
+        # Malformed frames repeat: the shared listener writes each distinct error once per window
+        logger.error(f"[{context}] Error: {error}")
 
-    def parse_bybit(self, data):
+    def parse_bybit(self, data, market=None):
         try:
             topic = data.get("topic", "")
-            if any(x in topic for x in ["ticker", "trade", "mark_price", "book"]):
+            if any(x in topic for x in ["ticker", "publicTrade", "trade", "mark_price", "book"]):
+                envelope_ms = data.get("ts")  # Venue send time of the message
                 payload = data.get("data", [])
                 if isinstance(payload, dict): payload = [payload]
                 
                 for item in payload:
-                    symbol = item.get("s", "Unknown")
+                    inst = instruments.intern(market or "bybit", item.get("s", "Unknown"))
+                    symbol = inst.symbol
                     price = item.get("c") or item.get("p") or item.get("p1")
                     bid = item.get("b1")
                     ask = item.get("a1")
@@ -210,31 +383,44 @@ class CryptoParser:
                     if "m" in item:
                         side = "SELL" if item.get("m") else "BUY"
                     elif item.get("S"):
-                        side = item.get("S")
+                        side = item.get("S").upper()  # v5 'Buy' / 'Sell', as direct_feed stores it
 
                     if price:
-                        self.save_csv({
-                            "timestamp": time.time(),
-                            "source": f"Bybit_{topic.split('.')[0]}",
-                            "symbol": symbol,
-                            "price": float(price) if price else None,
-                            "bid": float(bid) if bid else None,
-                            "ask": float(ask) if ask else None,
-                            "volume": float(volume) if volume else None,
-                            "side": side,
-                            "open_interest": float(item.get("openInterest")) if item.get("openInterest") else None,
-                            "funding_rate": float(item.get("fundingRate")) if item.get("fundingRate") else None,
-                            "turnover": float(item.get("turnover24h")) if item.get("turnover24h") else None,
-                            "iv": None, "delta": None, "gamma": None,
-                            "expiry": None, "strike": None, "option_type": None
-                        })
+                        source = f"Bybit_{topic.split('.')[0]}"
+                        ts = venue_ts(item.get("T"), envelope_ms)
+                        funding = item.get("fundingRate")
+                        if funding and float(funding):
+                            # Perp ticker carrying funding -> derivatives_stats
+                            self.save_csv(DerivTicker(
+                                ts or self.arrival_ts(), symbol, float(price),
+                                bid=float(bid) if bid else None,
+                                ask=float(ask) if ask else None,
+                                volume=float(volume) if volume else None,
+                                side=side, source=source,
+                                open_interest=float(item.get("openInterest")) if item.get("openInterest") else None,
+                                funding_rate=float(funding),
+                                turnover=float(item.get("turnover24h")) if item.get("turnover24h") else None,
+                                instrument=inst
+                            ), venue_time=ts is not None)
+                        else:
+                            self.save_csv(Tick(
+                                TRADE if side else QUOTE,
+                                ts or self.arrival_ts(), symbol, float(price),
+                                bid=float(bid) if bid else None,
+                                ask=float(ask) if ask else None,
+                                volume=float(volume) if volume else None,
+                                side=side, source=source,
+                                trade_id=trade_key(market, item.get("i")) if side and market else None,
+                                instrument=inst
+                            ), venue_time=ts is not None)
         except Exception as e:
             self.log_error("Bybit Parse", e)
 
-    def parse_binance(self, data):
+    def parse_binance(self, data, market="binance-spot"):
         try:
             stream = data.get("stream", "")
             payload = data.get("data", {})
+            event_ms = payload.get("E")  # Venue event time
             
             if "forceOrder" in stream:
                 o = payload.get("o", {})
@@ -242,18 +428,12 @@ class CryptoParser:
                 price = o.get("p")
                 qty = o.get("q")
                 if symbol and price:
-                     self.save_csv({
-                        "timestamp": time.time(),
-                        "source": "Binance_Liq",
-                        "symbol": symbol,
-                        "price": float(price),
-                        "bid": None, "ask": None,
-                        "volume": float(qty),
-                        "side": o.get("S"),
-                        "open_interest": None, "funding_rate": None, "turnover": None,
-                        "iv": None, "delta": None, "gamma": None,
-                        "expiry": None, "strike": None, "option_type": None
-                    })
+                     inst = instruments.intern(market, symbol)
+                     ts = venue_ts(o.get("T"), event_ms)
+                     self.save_csv(Tick(
+                        TRADE, ts or self.arrival_ts(), inst.symbol, float(price),
+                        volume=float(qty), side=o.get("S"), source="Binance_Liq", instrument=inst
+                    ), venue_time=ts is not None)
 
             elif "aggTrade" in stream:
                 symbol = payload.get("s")
@@ -261,36 +441,25 @@ class CryptoParser:
                 qty = payload.get("q")
                 is_maker = payload.get("m") 
                 if symbol and price:
-                    self.save_csv({
-                        "timestamp": float(payload.get("T", time.time()*1000)) / 1000,
-                        "source": "Binance_Spot",
-                        "symbol": symbol,
-                        "price": float(price),
-                        "bid": None, "ask": None,
-                        "volume": float(qty),
-                        "side": "SELL" if is_maker else "BUY",
-                        "open_interest": None, "funding_rate": None, "turnover": None,
-                        "iv": None, "delta": None, "gamma": None,
-                        "expiry": None, "strike": None, "option_type": None
-                    })
+                    inst = instruments.intern(market, symbol)
+                    ts = venue_ts(payload.get("T"), event_ms)
+                    self.save_csv(Tick(
+                        TRADE, ts or self.arrival_ts(), inst.symbol, float(price),
+                        volume=float(qty), side="SELL" if is_maker else "BUY", source="Binance_Spot",
+                        trade_id=trade_key(market, payload.get("a")), instrument=inst
+                    ), venue_time=ts is not None)
 
             elif "ticker" in stream:
                 symbol = payload.get("s")
                 close_price = payload.get("c")
                 volume = payload.get("v")
                 if symbol and close_price:
-                     self.save_csv({
-                        "timestamp": time.time(),
-                        "source": "Binance_Ticker",
-                        "symbol": symbol,
-                        "price": float(close_price),
-                        "bid": None, "ask": None,
-                        "volume": float(volume),
-                        "side": None,
-                        "open_interest": None, "funding_rate": None, "turnover": None,
-                        "iv": None, "delta": None, "gamma": None,
-                        "expiry": None, "strike": None, "option_type": None
-                    })
+                     inst = instruments.intern(market, symbol)
+                     ts = venue_ts(event_ms)
+                     self.save_csv(Tick(
+                        QUOTE, ts or self.arrival_ts(), inst.symbol, float(close_price),
+                        volume=float(volume), source="Binance_Ticker", instrument=inst
+                    ), venue_time=ts is not None)
         except Exception as e:
             self.log_error("Binance Parse", e)
 
@@ -304,36 +473,31 @@ class CryptoParser:
                 price = item.get("last_price")
                 greeks = item.get("greeks", {})
                 iv = item.get("mark_iv")
-                
-                expiry, strike, option_type = None, None, None
-                try:
-                    match = re.search(r'^[A-Z]+-(\d{1,2}[A-Z]{3}\d{2})-(\d+)-([CP])$', symbol)
-                    if match:
-                        date_str = match.group(1)
-                        expiry = datetime.strptime(date_str, "%d%b%y").replace(tzinfo=None)
-                        strike = float(match.group(2))
-                        option_type = "CALL" if match.group(3) == "C" else "PUT"
-                except: pass
 
                 if symbol and price:
-                    self.save_csv({
-                        "timestamp": time.time(),
-                        "source": "Deribit",
-                        "symbol": symbol,
-                        "price": float(price) if price else None,
-                        "bid": float(item.get("best_bid_price")) if item.get("best_bid_price") else None,
-                        "ask": float(item.get("best_ask_price")) if item.get("best_ask_price") else None,
-                        "volume": float(item.get("stats", {}).get("volume")) if item.get("stats", {}).get("volume") else None,
-                        "side": item.get("tick_direction"), 
-                        "open_interest": float(item.get("open_interest")) if item.get("open_interest") else None,
-                        "funding_rate": None, "turnover": None,
-                        "iv": float(iv) if iv else None,
-                        "delta": float(greeks.get("delta")) if greeks and greeks.get("delta") else None,
-                        "gamma": float(greeks.get("gamma")) if greeks and greeks.get("gamma") else None,
-                        "expiry": str(expiry) if expiry else None,
-                        "strike": strike,
-                        "option_type": option_type
-                    })
+                    # Expiry / strike / type are parsed once per instrument by the registry
+                    inst = instruments.intern("deribit", symbol)
+                    symbol = inst.symbol
+                    ts = venue_ts(item.get("timestamp"))
+                    record_args = dict(
+                        bid=float(item.get("best_bid_price")) if item.get("best_bid_price") else None,
+                        ask=float(item.get("best_ask_price")) if item.get("best_ask_price") else None,
+                        volume=float(item.get("stats", {}).get("volume")) if item.get("stats", {}).get("volume") else None,
+                        side=item.get("tick_direction"),
+                        source="Deribit", instrument=inst
+                    )
+                    if iv:
+                        self.save_csv(DerivTicker(
+                            ts or self.arrival_ts(), symbol, float(price), **record_args,
+                            open_interest=float(item.get("open_interest")) if item.get("open_interest") else None,
+                            iv=float(iv),
+                            delta=float(greeks.get("delta")) if greeks and greeks.get("delta") else None,
+                            gamma=float(greeks.get("gamma")) if greeks and greeks.get("gamma") else None,
+                            expiry=inst.expiry, strike=inst.strike, option_type=inst.option_type
+                        ), venue_time=ts is not None)
+                    else:
+                        self.save_csv(Tick(QUOTE, ts or self.arrival_ts(), symbol, float(price), **record_args),
+                                      venue_time=ts is not None)
         except Exception as e:
             self.log_error("Deribit Parse", e)
 
@@ -385,103 +549,105 @@ class CryptoParser:
         except Exception as e:
             self.log_error("WhaleAlert Parse", e)
 
-    def parse_html_content(self, url, html_content):
-        """Advanced HTML parsing for sites that server-side render"""
+    def parse_html_content(self, url, body, charset=None, source="GeneralNews"):
+        """Advanced HTML parsing for sites that server-side render (see news_extract)"""
+        if self.html_procs is None:
+            try:
+                for row in news_extract.extract(url, body, charset, source):
+                    self.save_news_csv(row)
+            except Exception as e:
+                self.log_error("HTML Parse", e)
+            return
+        # Never wait on the pool here: a lane thread blocked on a slow page would stall
+        # every REST/JSON response queued behind it
+        if not self.html_slots.acquire(blocking=False):
+            self.m_html_dropped.inc()
+            self.html_drop_log.add()
+            return
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # 1. Decrypt.co Specific
-            if "decrypt.co" in url:
-                articles = soup.find_all('article')
-                for article in articles[:5]: # Top 5 only
-                    title_tag = article.find('h3') or article.find('h2')
-                    if title_tag:
-                        self.save_news_csv({
-                            "timestamp": time.time(),
-                            "source": "Decrypt",
-                            "title": title_tag.get_text().strip(),
-                            "amount": None,
-                            "currency": "Crypto",
-                            "sentiment": "Neutral"
-                        })
-                return
-
-            # 2. BeInCrypto Specific
-            if "beincrypto.com" in url:
-                articles = soup.select('.story-card-text') 
-                for article in articles[:5]:
-                    title = article.get_text().strip()
-                    if title:
-                        self.save_news_csv({
-                            "timestamp": time.time(),
-                            "source": "BeInCrypto",
-                            "title": title,
-                            "amount": None,
-                            "currency": "Crypto",
-                            "sentiment": "Neutral"
-                        })
-                return
-
-            # 3. Generic Fallback (Title Tag)
-            title = soup.title.string if soup.title else ""
-            if title:
-                # Deduce source
-                source = "GeneralNews"
-                for d in TARGET_DOMAINS:
-                    if d in url: source = d; break
-                
-                self.save_news_csv({
-                     "timestamp": time.time(),
-                     "source": source,
-                     "title": title.strip(),
-                     "amount": None,
-                     "currency": "Crypto",
-                     "sentiment": "Neutral"
-                })
+            self.html_procs.submit(news_extract.extract, url, body, charset, source).add_done_callback(self.html_done)
+        except Exception as e:  # Pool shut down / broken
+            self.html_slots.release()
+            self.log_error("HTML Parse", e)
 
-        except Exception as e:
+    def html_done(self, future):
+        """Done callback for a news_extract job (runs on the pool's result thread)"""
+        self.html_slots.release()
+        try:
+            for row in future.result():
+                self.save_news_csv(row)
+        except Exception as e:  # Includes CancelledError at shutdown
             self.log_error("HTML Parse", e)
 
     def response(self, flow: mitmproxy.http.HTTPFlow):
-        # DEBUG: Log all traffic to see what's happening
-        with open(self.debug_log, "a") as f:
-            f.write(f"Seen: {flow.request.pretty_url} | Type: {flow.response.headers.get('content-type', '')}\n")
-
-        if not self.is_target(flow.request.pretty_url): return
-        
         ctype = flow.response.headers.get("content-type", "").lower()
-        
+        kind = "json" if "json" in ctype else "html" if "html" in ctype else None
+        if kind is None: return
+        route = self.router.resolve(flow, kind)
+        if route is None or not route.handlers: return
+        # Hand over the still-compressed body; decompression happens on the lane too
+        self.http_lane.submit(route, ctype, flow.response.raw_content,
+                              flow.response.headers.get("content-encoding", ""), time.time())
+
+    def parse_response(self, route, ctype, raw, content_encoding, recv_ts):
+        self.recv_ts = recv_ts
         try:
+            body = encoding.decode(raw, content_encoding) if content_encoding and raw else raw
+            if not body: return
+            handler = route.dispatch("")
+            if handler is None: return
             if "json" in ctype:
-                data = json.loads(flow.response.text)
-                url = flow.request.pretty_url
-                if "cryptopanic.com" in url: self.parse_cryptopanic(data)
-                elif "dexcheck" in url or "whale" in url: self.parse_whale_alert(data)
-                elif "bybit.com" in url and "api" in url: self.parse_bybit(data)
-            
-            elif "html" in ctype:
-                # Handle generic news sites
-                self.parse_html_content(flow.request.pretty_url, flow.response.text)
-                
+                handler(json.loads(body))
+            else:
+                charset = ctype.split("charset=", 1)[1].split(";")[0].strip() if "charset=" in ctype else None
+                handler(route.url, body, charset)
+
         except Exception as e:
              self.log_error("HTTP Response Parse", e)
 
-    def websocket_message(self, flow: mitmproxy.http.HTTPFlow):
-        if not self.is_target(flow.request.pretty_url): return
+    def websocket_start(self, flow: mitmproxy.http.HTTPFlow):
+        if self.router.resolve(flow, "ws") is None: return
+        self.decoders[flow.id] = FlowDecoder(hint_from_handshake(flow.response.headers if flow.response else None))
+        self.m_decoders.set(len(self.decoders))
 
+    def websocket_message(self, flow: mitmproxy.http.HTTPFlow):
+        route = self.router.resolve(flow, "ws")
+        if route is None: return
+        message = flow.websocket.messages[-1]
+        recv_ts = time.time()
+        if self.recorder: self.recorder.record(route.url, message.content, recv_ts)
+        if not route.handlers: return
+        # Sharded by flow: frames of one connection are parsed in arrival order
+        self.ws_lane.submit(route, message.content, recv_ts, flow.id, message.is_text, key=flow.id)
+
+    def websocket_end(self, flow: mitmproxy.http.HTTPFlow):
+        if flow.id not in self.decoders: return
+        # Queued behind the flow's last frames; evicting here could race the worker
+        if not self.ws_lane.submit(None, None, None, flow.id, False, key=flow.id):
+            self.decoders.pop(flow.id, None)
+
+    def parse_frame(self, route, content, recv_ts, flow_id=None, is_text=False):
+        if content is None:  # websocket_end marker
+            self.decoders.pop(flow_id, None)
+            self.m_decoders.set(len(self.decoders))
+            return
+        self.recv_ts = recv_ts
         try:
-            message = flow.websocket.messages[-1]
-            decoded = self.decode_message(message.content)
+            decoded = self.decode_message(content, flow_id, is_text)
             if decoded:
-                data = json.loads(decoded)
-                url = flow.request.pretty_url
-                if "bybit.com" in url: self.parse_bybit(data)
-                elif "deribit.com" in url: self.parse_deribit(data)
-                elif "binance.com" in url: self.parse_binance(data)
+                handler = route.dispatch(decoded)
+                if handler is not None:
+                    handler(json.loads(decoded))
         except Exception as e:
             # We don't want to spam log for every malformed packet, but basic catching is good
             self.log_error("WS Message", e)
 
-addons = [
-    CryptoParser()
-]
+def __getattr__(name):
+    # mitmdump reads `addons` once the script is loaded. Built on first access, so importing
+    # this module (ws_replay, bench_pipeline) doesn't start the writer, lanes, process pool
+    # and metrics endpoint.
+    global addons
+    if name == "addons":
+        addons = [CryptoParser()]
+        return addons
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,294 @@
+import time
+import codecs
+from html.parser import HTMLParser
+import config
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+# --- News Page Extraction ---
+# Headlines from server-side rendered news pages. extract() is a pure function
+# of (url, body) with no access to the parser's queue or log, so mitm_parser can
+# run it in a worker process.
+#
+# What to pull from a page is a per-site Rule (SITE_RULES, matched on the url);
+# how to parse it is a backend (config.NEWS_EXTRACTOR):
+#   "selectolax" -> lexbor C parser + CSS selectors
+#   "lxml"       -> libxml2 HTML parser + XPath
+#   "stream"     -> stdlib HTMLParser fed in chunks; stops as soon as the rule
+#                   (or, without one, the <title>) is satisfied, so most pages
+#                   are never tokenized past the first few KB
+#   "bs4"        -> full BeautifulSoup tree (the old path, kept for bench_html)
+#   "auto"       -> best installed of selectolax, lxml, stream
+# Every backend returns the same rows; a site whose rule finds nothing falls back
+# to the page <title>, like pages without a rule.
+
+STREAM_CHUNK = 16384
+
+
+def news_row(source, title):
+    return {
+        "timestamp": time.time(),
+        "source": source,
+        "title": title,
+        "amount": None,
+        "currency": "Crypto",
+        "sentiment": "Neutral"
+    }
+
+
+def _clean(text):
+    return " ".join(text.split()) if text else ""
+
+
+class Selector:
+    """Simple selector: 'tag', '.class' or 'tag.class'"""
+    __slots__ = ("tag", "cls", "css", "xpath")
+
+    def __init__(self, text):
+        self.css = text.strip()
+        tag, _, cls = self.css.partition(".")
+        self.tag = tag.lower() or None
+        self.cls = cls or None
+        cond = f"[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]" if cls else ""
+        self.xpath = f".//{self.tag or '*'}{cond}"
+
+    def matches(self, tag, attrs):
+        if self.tag and tag != self.tag:
+            return False
+        if self.cls:
+            classes = next((v for k, v in attrs if k == "class"), None) or ""
+            return self.cls in classes.split()
+        return True
+
+
+class Rule:
+    """Headlines on one site: each of the first `limit` `container` elements gives the text of
+    its first `titles` match (selectors tried in order); without a container, the first `limit`
+    matches of `titles` in document order."""
+    __slots__ = ("source", "titles", "container", "limit")
+
+    def __init__(self, source, titles, container=None, limit=5):
+        self.source = source
+        self.titles = tuple(Selector(t) for t in titles.split(","))
+        self.container = Selector(container) if container else None
+        self.limit = limit
+
+
+SITE_RULES = {
+    "decrypt.co": Rule("Decrypt", "h3, h2", container="article"),
+    "beincrypto.com": Rule("BeInCrypto", ".story-card-text"),
+    "cointelegraph.com": Rule("Cointelegraph", ".post-card-inline__title", container="article"),
+    "coindesk.com": Rule("CoinDesk", "h2, h3, .card-title", container="article"),
+    "thedefiant.io": Rule("TheDefiant", "h2, h3", container="article"),
+    "blockworks.co": Rule("Blockworks", "h2, h3", container="article"),
+}
+
+
+def rule_for(url):
+    for domain, rule in SITE_RULES.items():
+        if domain in url:
+            return rule
+    return None
+
+
+def _text(body, charset):
+    if isinstance(body, str):
+        return body
+    try:
+        return body.decode(charset or "utf-8", "replace")
+    except LookupError:
+        return body.decode("utf-8", "replace")
+
+
+# --- Backends: (body, rule, charset) -> (headlines, page title) ---
+def _selectolax(body, rule, charset):
+    tree = LexborHTMLParser(_text(body, charset))
+    node = tree.css_first("title")
+    page_title = node.text() if node is not None else None
+    found = []
+    if rule is not None:
+        if rule.container is not None:
+            for box in tree.css(rule.container.css)[:rule.limit]:
+                for sel in rule.titles:
+                    node = box.css_first(sel.css)
+                    if node is not None:
+                        found.append(node.text())
+                        break
+        else:
+            found = [n.text() for n in tree.css(", ".join(s.css for s in rule.titles))[:rule.limit]]
+    return found, page_title
+
+
+def _lxml(body, rule, charset):
+    doc = lxml_html.document_fromstring(_text(body, charset))
+    page_title = doc.findtext(".//title")
+    found = []
+    if rule is not None:
+        if rule.container is not None:
+            for box in doc.xpath(rule.container.xpath)[:rule.limit]:
+                for sel in rule.titles:
+                    nodes = box.xpath(sel.xpath)
+                    if nodes:
+                        found.append(nodes[0].text_content())
+                        break
+        else:
+            found = [n.text_content() for n in doc.xpath(" | ".join(s.xpath for s in rule.titles))[:rule.limit]]
+    return found, page_title
+
+
+def _bs4(body, rule, charset):
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=charset if isinstance(body, bytes) else None)
+    page_title = soup.title.string if soup.title else None
+    found = []
+    if rule is not None:
+        if rule.container is not None:
+            for box in soup.select(rule.container.css)[:rule.limit]:
+                for sel in rule.titles:
+                    node = box.select_one(sel.css)
+                    if node is not None:
+                        found.append(node.get_text())
+                        break
+        else:
+            found = [n.get_text() for n in soup.select(", ".join(s.css for s in rule.titles))[:rule.limit]]
+    return found, page_title
+
+
+class _Done(Exception):
+    pass
+
+
+class StreamExtractor(HTMLParser):
+    """Tracks only the elements the rule needs; raises _Done once it has them all"""
+
+    def __init__(self, rule):
+        super().__init__(convert_charrefs=True)
+        self.rule = rule
+        self.found = []
+        self.page_title = None
+        self.seen = 0  # Containers (or title matches) seen so far
+        self._title = None  # Text parts while inside <title>
+        self._box_tag = None  # Open container: tag name, nesting depth, best match per selector
+        self._box_depth = 0
+        self._box_hits = {}
+        self._cap = None  # Open title match: [selector index, tag, depth, text parts]
+
+    def handle_starttag(self, tag, attrs):
+        rule = self.rule
+        if tag == "title" and self.page_title is None and self._title is None:
+            self._title = []
+        if rule is None:
+            return
+        if self._cap is not None:
+            if tag == self._cap[1]:
+                self._cap[2] += 1
+            return
+        if rule.container is not None:
+            if self._box_tag is not None:
+                if tag == self._box_tag:
+                    self._box_depth += 1
+            elif rule.container.matches(tag, attrs):
+                self._box_tag, self._box_depth, self._box_hits = tag, 1, {}
+                return
+            if self._box_tag is None:
+                return
+            for i, sel in enumerate(rule.titles):
+                if i not in self._box_hits and sel.matches(tag, attrs):
+                    self._cap = [i, tag, 1, []]
+                    return
+        elif self.seen < rule.limit:
+            if any(sel.matches(tag, attrs) for sel in rule.titles):
+                self._cap = [0, tag, 1, []]
+                self.seen += 1
+
+    def handle_endtag(self, tag):
+        rule = self.rule
+        if tag == "title" and self._title is not None:
+            self.page_title, self._title = "".join(self._title), None
+            if rule is None:
+                raise _Done()
+        if self._cap is not None:
+            if tag != self._cap[1]:
+                return
+            self._cap[2] -= 1
+            if self._cap[2]:
+                return
+            index, _, _, parts = self._cap
+            self._cap = None
+            if rule.container is not None:
+                self._box_hits[index] = "".join(parts)
+            else:
+                self.found.append("".join(parts))
+                if self.seen >= rule.limit:
+                    raise _Done()
+            return
+        if self._box_tag is not None and tag == self._box_tag:
+            self._box_depth -= 1
+            if self._box_depth:
+                return
+            self._box_tag = None
+            if self._box_hits:
+                self.found.append(self._box_hits[min(self._box_hits)])
+            self.seen += 1
+            if self.seen >= rule.limit:
+                raise _Done()
+
+    def handle_data(self, data):
+        if self._title is not None:
+            self._title.append(data)
+        if self._cap is not None:
+            self._cap[3].append(data)
+
+
+def _stream(body, rule, charset):
+    parser = StreamExtractor(rule)
+    try:
+        if isinstance(body, str):
+            for i in range(0, len(body), STREAM_CHUNK):
+                parser.feed(body[i:i + STREAM_CHUNK])
+        else:
+            try:
+                decoder = codecs.getincrementaldecoder(charset or "utf-8")("replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            for i in range(0, len(body), STREAM_CHUNK):
+                parser.feed(decoder.decode(body[i:i + STREAM_CHUNK]))
+        parser.close()
+    except _Done:
+        pass
+    return parser.found, parser.page_title
+
+
+BACKENDS = {"selectolax": _selectolax, "lxml": _lxml, "stream": _stream, "bs4": _bs4}
+INSTALLED = {"selectolax": LexborHTMLParser is not None, "lxml": lxml_html is not None, "stream": True,
+             "bs4": BeautifulSoup is not None}
+
+
+def backend_name(preferred=None):
+    preferred = preferred or config.NEWS_EXTRACTOR
+    if preferred == "auto" or not INSTALLED.get(preferred):
+        return next(b for b in ("selectolax", "lxml", "stream") if INSTALLED[b])
+    return preferred
+
+
+def extract(url, body, charset=None, source="GeneralNews", backend=None):
+    """News rows from one page; `body` is the transfer-decoded HTML (bytes or str)"""
+    rule = rule_for(url)
+    found, page_title = BACKENDS[backend_name(backend)](body, rule, charset)
+    titles = [t for t in (_clean(t) for t in found) if t]
+    if titles:
+        return [news_row(rule.source, t) for t in titles]
+    page_title = _clean(page_title)
+    return [news_row(source, page_title)] if page_title else []
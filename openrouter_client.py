@@ -4,17 +4,11 @@ import logging
 import httpx
 from itertools import cycle
 import config
+import log_setup
 
 # --- Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [OpenRouterCouncil] %(message)s',
-    handlers=[
-        logging.FileHandler(f"{config.LOG_DIR}/openrouter_client.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger("OpenRouterCouncil")
+# Also imported by council: only this client's records go to openrouter_client.log
+logger = log_setup.setup("openrouter_client.log", '%(asctime)s [OpenRouterCouncil] %(message)s', name="OpenRouterCouncil")
 
 class KeyRotator:
     def __init__(self):
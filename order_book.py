@@ -0,0 +1,281 @@
+import time
+from array import array
+from bisect import bisect_left
+import config
+from tick_records import BookSnapshot
+
+# --- Local L2 Order Books ---
+# Maintains full-depth books from Binance diff depth (<sym>@depth@100ms) and
+# Bybit orderbook.50 streams. Each side is a pair of parallel array('d')
+# (price key, size) kept sorted best-first, so updates are a bisect + in-place
+# edit and top-N reads are slices, no per-level dicts or objects.
+#
+# Sequencing:
+#   Binance: REST snapshot (lastUpdateId) + buffered diffs. Futures chain on pu == previous u,
+#            spot on U == previous u + 1. Any break -> NEED_SNAPSHOT.
+#   Bybit:   "snapshot" resets the book, "delta" must have u == previous u + 1.
+#            Any break -> NEED_RESUBSCRIBE (a fresh subscription replays a snapshot).
+
+NEED_SNAPSHOT = "snapshot"
+NEED_RESUBSCRIBE = "resubscribe"
+
+MAX_PENDING = 2000  # Diffs buffered per book while a REST snapshot is in flight
+
+
+class BookSide:
+    __slots__ = ("keys", "sizes", "is_bid")
+
+    def __init__(self, is_bid):
+        # Bids are stored as -price so both sides sort ascending from the best level
+        self.keys = array('d')
+        self.sizes = array('d')
+        self.is_bid = is_bid
+
+    def clear(self):
+        del self.keys[:]
+        del self.sizes[:]
+
+    def update(self, price, size):
+        key = -price if self.is_bid else price
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size:
+                self.sizes[i] = size
+            else:
+                del keys[i]
+                del self.sizes[i]
+        elif size:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def trim(self, max_levels):
+        if len(self.keys) > max_levels:
+            del self.keys[max_levels:]
+            del self.sizes[max_levels:]
+
+    def best(self):
+        if not self.keys:
+            return None, None
+        key = self.keys[0]
+        return (-key if self.is_bid else key), self.sizes[0]
+
+    def prices(self, n):
+        head = self.keys[:n]
+        return [-k for k in head] if self.is_bid else head.tolist()
+
+    def volume(self, n):
+        return sum(self.sizes[:n])
+
+    def vwap(self, n):
+        sizes = self.sizes[:n]
+        total = sum(sizes)
+        if not total:
+            return None
+        notional = sum(k * s for k, s in zip(self.keys[:n], sizes))
+        return (-notional if self.is_bid else notional) / total
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class OrderBook:
+    def __init__(self, symbol, source, max_levels=None):
+        self.symbol = symbol
+        self.source = source
+        self.max_levels = max_levels or config.ORDERBOOK_MAX_LEVELS
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = None
+        self.synced = False
+        self.awaiting_first = False  # Binance: first diff after a snapshot has looser rules
+        self.updated_at = 0.0
+        self.last_persist = 0.0
+
+    def load_snapshot(self, bids, asks, update_id, ts=None):
+        self.bids.clear()
+        self.asks.clear()
+        self._apply_levels(bids, asks)
+        self.last_update_id = update_id
+        self.synced = True
+        self.updated_at = ts or time.time()
+
+    def apply(self, bids, asks, update_id, ts=None):
+        self._apply_levels(bids, asks)
+        self.last_update_id = update_id
+        self.updated_at = ts or time.time()
+
+    def _apply_levels(self, bids, asks):
+        for price, size in bids:
+            self.bids.update(float(price), float(size))
+        for price, size in asks:
+            self.asks.update(float(price), float(size))
+        self.bids.trim(self.max_levels)
+        self.asks.trim(self.max_levels)
+
+    # --- Analytics (on demand) ---
+    def top_of_book(self):
+        """(bid, bid_size, ask, ask_size)"""
+        bid, bid_sz = self.bids.best()
+        ask, ask_sz = self.asks.best()
+        return bid, bid_sz, ask, ask_sz
+
+    def mid(self):
+        bid, _, ask, _ = self.top_of_book()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def depth_weighted_mid(self, levels=None):
+        """Cross-weighted VWAP mid over the top `levels`: leans toward the thinner side."""
+        n = levels or config.ORDERBOOK_DEPTH
+        bid_vwap, ask_vwap = self.bids.vwap(n), self.asks.vwap(n)
+        bid_vol, ask_vol = self.bids.volume(n), self.asks.volume(n)
+        if bid_vwap is None or ask_vwap is None:
+            return None
+        return (bid_vwap * ask_vol + ask_vwap * bid_vol) / (bid_vol + ask_vol)
+
+    def imbalance(self, levels=None):
+        """(bid_vol - ask_vol) / (bid_vol + ask_vol) over the top `levels`, in [-1, 1]."""
+        n = levels or config.ORDERBOOK_DEPTH
+        bid_vol, ask_vol = self.bids.volume(n), self.asks.volume(n)
+        total = bid_vol + ask_vol
+        return (bid_vol - ask_vol) / total if total else None
+
+    def snapshot(self, levels=None):
+        n = levels or config.ORDERBOOK_DEPTH
+        return BookSnapshot(
+            self.updated_at, self.symbol, self.source,
+            self.bids.prices(n), self.bids.sizes[:n].tolist(),
+            self.asks.prices(n), self.asks.sizes[:n].tolist(),
+            mid=self.mid(), weighted_mid=self.depth_weighted_mid(n), imbalance=self.imbalance(n)
+        )
+
+
+class OrderBookManager:
+    def __init__(self, snapshot_interval=None):
+        self.snapshot_interval = snapshot_interval or config.ORDERBOOK_SNAPSHOT_INTERVAL
+        self.books = {}       # (source, symbol) -> OrderBook
+        self.pending = {}     # (source, symbol) -> diffs buffered until the REST snapshot lands
+        self.requested = set()
+        self.resyncs = 0
+        self.gaps = 0
+
+    def book(self, source, symbol):
+        key = (source, symbol)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = OrderBook(symbol, source)
+        return book
+
+    def get(self, source, symbol):
+        return self.books.get((source, symbol))
+
+    def forget(self, symbol):
+        """Drop every book (all sources) for an unsubscribed symbol"""
+        for key in [k for k in self.books if k[1] == symbol]:
+            del self.books[key]
+            self.pending.pop(key, None)
+            self.requested.discard(key)
+
+    def _request_snapshot(self, key):
+        if key in self.requested:
+            return None
+        self.requested.add(key)
+        self.resyncs += 1
+        return NEED_SNAPSHOT
+
+    # --- Binance ---
+    def on_binance_diff(self, source, payload, futures=True):
+        """Apply one depthUpdate. Returns NEED_SNAPSHOT when the caller must fetch REST depth."""
+        symbol = payload.get("s")
+        key = (source, symbol)
+        book = self.book(source, symbol)
+
+        if not book.synced:
+            buf = self.pending.setdefault(key, [])
+            if len(buf) < MAX_PENDING:
+                buf.append(payload)
+            return self._request_snapshot(key)
+
+        if not self._binance_step(book, payload, futures):
+            book.synced = False
+            self.gaps += 1
+            self.pending[key] = [payload]
+            return self._request_snapshot(key)
+        return None
+
+    def on_binance_snapshot(self, source, symbol, snapshot, futures=True):
+        """Load REST depth and replay buffered diffs. Returns NEED_SNAPSHOT if they don't line up."""
+        key = (source, symbol)
+        book = self.book(source, symbol)
+        self.requested.discard(key)
+        book.load_snapshot(snapshot.get("bids", []), snapshot.get("asks", []), snapshot.get("lastUpdateId"))
+        book.awaiting_first = True
+
+        for payload in self.pending.pop(key, []):
+            if not self._binance_step(book, payload, futures):
+                book.synced = False
+                self.gaps += 1
+                return self._request_snapshot(key)
+        return None
+
+    def _binance_step(self, book, payload, futures):
+        """Sequence-check and apply one diff; False on a gap."""
+        first, last = payload.get("U"), payload.get("u")
+        if first is None or last is None:
+            return False
+        lid = book.last_update_id
+        if last < lid or (not futures and last == lid):
+            return True  # Older than the snapshot: drop
+        if book.awaiting_first:
+            if not (first <= lid + 1 and last >= lid):
+                return False
+            book.awaiting_first = False
+        elif futures:
+            if payload.get("pu") != lid:
+                return False
+        elif first != lid + 1:
+            return False
+        ts = payload.get("T") or payload.get("E")
+        book.apply(payload.get("b", []), payload.get("a", []), last, ts / 1000 if ts else None)
+        return True
+
+    # --- Bybit ---
+    def on_bybit(self, source, msg):
+        """Apply an orderbook.N message. Returns NEED_RESUBSCRIBE on a sequence gap."""
+        item = msg.get("data", {})
+        symbol = item.get("s")
+        book = self.book(source, symbol)
+        update_id = item.get("u")
+        ts = msg.get("ts")
+        ts = ts / 1000 if ts else None
+
+        if msg.get("type") == "snapshot" or update_id == 1:
+            book.load_snapshot(item.get("b", []), item.get("a", []), update_id, ts)
+            self.requested.discard((source, symbol))
+            return None
+        if not book.synced:
+            return None  # Waiting for the snapshot that follows a (re)subscribe
+        if update_id != book.last_update_id + 1:
+            book.synced = False
+            self.gaps += 1
+            if (source, symbol) in self.requested:
+                return None
+            self.requested.add((source, symbol))
+            self.resyncs += 1
+            return NEED_RESUBSCRIBE
+        book.apply(item.get("b", []), item.get("a", []), update_id, ts)
+        return None
+
+    # --- Persistence ---
+    def snapshot_if_due(self, source, symbol, now=None):
+        """A BookSnapshot record if this book hasn't been persisted for snapshot_interval."""
+        book = self.books.get((source, symbol))
+        if book is None or not book.synced:
+            return None
+        now = now or time.time()
+        if now - book.last_persist < self.snapshot_interval:
+            return None
+        book.last_persist = now
+        return book.snapshot()
@@ -0,0 +1,91 @@
+import time
+import queue
+import logging
+import threading
+import metrics
+import log_setup
+
+logger = logging.getLogger("ParsePool")
+
+# --- Parse Lanes ---
+# mitmproxy calls the addon hooks on its event loop thread, so anything slow in
+# response() / websocket_message() stalls every proxied connection. The hooks
+# only pick the lane and hand over references to what they need (url, raw
+# bytes, recv_ts); decoding and parsing happen on the lane's worker threads.
+#
+# A lane is a bounded queue plus N daemon threads:
+#   sharded=True  -> one queue per worker, jobs routed by key (e.g. the socket
+#                    url) so frames of one connection are parsed in order
+#   sharded=False -> one shared queue, any idle worker takes the next job
+# A full lane drops the job (the hook must never block) and counts it.
+#
+# Metrics per lane:
+#   mitm_parse_queue_depth (gauge), mitm_parse_dropped_total (counter)
+#   mitm_parse_wait_ms (histogram: submit -> worker picks it up)
+#   mitm_parse_ms (histogram: handler run time)
+
+
+class ParseLane:
+    def __init__(self, name, handler, workers=1, capacity=1000, sharded=False, service="mitm"):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queues = [queue.Queue(maxsize=capacity) for _ in range(self.workers if sharded else 1)]
+        self.threads = []
+        self.m_depth = metrics.gauge(f"{service}_parse_queue_depth", lane=name)
+        self.m_dropped = metrics.counter(f"{service}_parse_dropped_total", lane=name)
+        self.m_wait = metrics.histogram(f"{service}_parse_wait_ms", lane=name)
+        self.m_parse = metrics.histogram(f"{service}_parse_ms", lane=name)
+        self.drop_log = log_setup.Tally(logger, f"Parse lane '{name}' full: dropped {{n:,}} jobs in last {{secs}}s")
+
+    def start(self):
+        for i in range(self.workers):
+            q = self.queues[i % len(self.queues)]
+            t = threading.Thread(target=self._run, args=(q,), name=f"Parse-{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+        logger.info(f"Parse lane '{self.name}': {self.workers} workers, {len(self.queues)} queue(s)")
+
+    def depth(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def submit(self, *job, key=None):
+        """Queue handler(*job); runs it right here when the lane was never started (offline replay)"""
+        if not self.threads:
+            self._call(job)
+            return True
+        q = self.queues[hash(key) % len(self.queues)] if key is not None and len(self.queues) > 1 else self.queues[0]
+        try:
+            q.put_nowait((time.perf_counter(), job))
+        except queue.Full:
+            self.m_dropped.inc()
+            self.drop_log.add()
+            return False
+        self.m_depth.set(self.depth())
+        return True
+
+    def _call(self, job):
+        start = time.perf_counter()
+        try:
+            self.handler(*job)
+        except Exception as e:
+            logger.error(f"Parse lane '{self.name}' handler error: {e}")
+        self.m_parse.observe((time.perf_counter() - start) * 1000)
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            if item is None:  # Shutdown sentinel
+                break
+            queued_at, job = item
+            self.m_wait.observe((time.perf_counter() - queued_at) * 1000)
+            self.m_depth.set(self.depth())
+            self._call(job)
+
+    def stop(self):
+        for i in range(len(self.threads)):
+            try:
+                self.queues[i % len(self.queues)].put_nowait(None)
+            except queue.Full:
+                pass  # Daemon threads; the process is going away anyway
+        self.threads = []
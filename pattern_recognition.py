@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine
 import config
+import instruments
 import logging
 
 # --- Logging ---
@@ -13,15 +14,15 @@ class PatternRecognizer:
         self.engine = create_engine(config.DB_URI)
 
     def fetch_ohlcv(self, symbol="btcusdt", limit=100):
-        query = f"""
+        query = """
             SELECT time, price, volume 
             FROM market_ticks 
-            WHERE symbol = '{symbol}' 
+            WHERE symbol = %(symbol)s
             AND source NOT LIKE '%%Book%%' 
             AND source NOT LIKE '%%Depth%%' 
-            ORDER BY time DESC LIMIT {limit}
+            ORDER BY time DESC LIMIT %(limit)s
         """
-        df = pd.read_sql(query, self.engine)
+        df = pd.read_sql(query, self.engine, params={"symbol": instruments.canonical(symbol), "limit": limit})
         if df.empty:
              return None
         
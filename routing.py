@@ -0,0 +1,98 @@
+import functools
+import metrics
+
+# --- Flow Routing ---
+# Which parser sees a flow is decided once per flow, not per message:
+#   1. the request host is matched against the registered domains by suffix
+#      (stream.bybit.com -> bybit.com), one dict probe per label, and the answer
+#      is cached per host;
+#   2. the routes for that domain and kind ("ws", "json", "html") that accept the
+#      url are bound to it (e.g. the Bybit market from the socket path) and the
+#      result is stored in flow.metadata, so later messages of the flow cost one
+#      dict lookup. Untargeted flows cache None and are dropped right there.
+# A route may also name topics: substrings the frame text must contain (checked
+# before JSON decoding, like ws_decoder.MARKERS). Routes of one host are tried in
+# registration order and the first whose topics match gets the frame; frames no
+# route wants (acks, pongs, unused channels) are never decoded.
+
+METADATA_KEY = "crypto_route_"
+
+
+class Route:
+    __slots__ = ("kind", "domain", "handler", "topics", "path", "bind")
+
+    def __init__(self, kind, domain, handler, topics=None, path=None, bind=None):
+        self.kind = kind
+        self.domain = domain
+        self.handler = handler
+        self.topics = tuple(topics) if topics else None  # None = every message
+        self.path = path  # Substring the url must contain; None = any
+        self.bind = bind  # url -> extra kwargs for the handler, evaluated once per flow
+
+    def accepts(self, url):
+        return self.path is None or self.path in url
+
+
+class FlowRoute:
+    """Routes one flow resolved to, with handlers already bound to its url"""
+    __slots__ = ("domain", "url", "handlers")
+
+    def __init__(self, domain, url, routes):
+        self.domain = domain
+        self.url = url
+        self.handlers = [(r.topics, functools.partial(r.handler, **r.bind(url)) if r.bind else r.handler)
+                         for r in routes]
+
+    def dispatch(self, text):
+        """Handler for one message, None if no route wants it"""
+        for topics, handler in self.handlers:
+            if topics is None or any(t in text for t in topics):
+                return handler
+        return None
+
+
+class Router:
+    def __init__(self, domains=(), cache_size=10000, service="mitm"):
+        self.domains = set(domains)  # Targeted even without a route (e.g. frame capture)
+        self.routes = {}  # (kind, domain) -> [Route]
+        self.hosts = {}  # host -> registered domain or None
+        self.cache_size = cache_size
+        self.service = service
+
+    def register(self, kind, domain, handler, topics=None, path=None, bind=None):
+        self.domains.add(domain)
+        self.routes.setdefault((kind, domain), []).append(Route(kind, domain, handler, topics, path, bind))
+        self.hosts.clear()
+
+    def domain_of(self, host):
+        try:
+            return self.hosts[host]
+        except KeyError:
+            pass
+        domain = None
+        labels = host.lower().rstrip(".").split(".")
+        for i in range(len(labels) - 1):
+            suffix = ".".join(labels[i:])
+            if suffix in self.domains:
+                domain = suffix
+                break
+        if len(self.hosts) >= self.cache_size:
+            self.hosts.clear()
+        self.hosts[host] = domain
+        return domain
+
+    def resolve(self, flow, kind):
+        """FlowRoute of `kind` for this flow (None = untargeted), cached in flow.metadata"""
+        key = METADATA_KEY + kind
+        try:
+            return flow.metadata[key]
+        except KeyError:
+            pass
+        domain = self.domain_of(flow.request.pretty_host)
+        route = None
+        if domain is not None:
+            url = flow.request.pretty_url
+            route = FlowRoute(domain, url, [r for r in self.routes.get((kind, domain), ()) if r.accepts(url)])
+        flow.metadata[key] = route
+        metrics.counter(f"{self.service}_routed_flows_total", kind=kind, domain=domain or "untargeted").inc()
+        return route
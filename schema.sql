@@ -4,6 +4,30 @@ CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE;
 DROP TABLE IF EXISTS market_ticks CASCADE;
 DROP TABLE IF EXISTS derivatives_stats CASCADE;
 DROP TABLE IF EXISTS news_sentiment CASCADE;
+DROP TABLE IF EXISTS news_items CASCADE;
+DROP TABLE IF EXISTS orderbook_snapshots CASCADE;
+DROP TABLE IF EXISTS feed_gaps CASCADE;
+DROP TABLE IF EXISTS symbol_universe CASCADE;
+DROP TABLE IF EXISTS instruments CASCADE;
+
+-- 0. Instruments (canonical dimension for every venue symbol, see instruments.py)
+CREATE TABLE IF NOT EXISTS instruments (
+    instrument_id SERIAL PRIMARY KEY,
+    market TEXT NOT NULL, -- 'binance-futures', 'bybit-option', 'deribit', ...
+    symbol TEXT NOT NULL, -- Canonical (upper-cased venue symbol), as stored in the tick tables
+    venue TEXT NOT NULL,
+    kind TEXT NOT NULL, -- 'spot', 'perp', 'future' or 'option'
+    underlying TEXT,
+    quote TEXT,
+    expiry TIMESTAMPTZ,
+    strike DOUBLE PRECISION,
+    option_type VARCHAR(4), -- 'CALL' or 'PUT'
+    first_seen TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_seen TIMESTAMPTZ NOT NULL DEFAULT now(), -- Last time a process registered it
+    UNIQUE (market, symbol)
+);
+
+CREATE INDEX IF NOT EXISTS idx_instruments_underlying ON instruments (underlying, kind, expiry);
 
 -- 1. Market Ticks (High Frequency)
 CREATE TABLE IF NOT EXISTS market_ticks (
@@ -14,7 +38,9 @@ CREATE TABLE IF NOT EXISTS market_ticks (
     ask DOUBLE PRECISION,
     volume DOUBLE PRECISION,
     source TEXT,
-    side VARCHAR(4) -- 'BUY' or 'SELL'
+    side VARCHAR(4), -- 'BUY' or 'SELL'
+    trade_id TEXT, -- '<market>:<exchange trade id>', NULL for quotes
+    instrument_id INTEGER -- instruments.instrument_id
 );
 
 -- Convert to Hypertable (partition by time)
@@ -22,6 +48,10 @@ SELECT create_hypertable('market_ticks', 'time', if_not_exists => TRUE);
 
 -- Index for fast symbol lookups ordered by time
 CREATE INDEX IF NOT EXISTS idx_market_ticks_symbol_time ON market_ticks (symbol, time DESC);
+CREATE INDEX IF NOT EXISTS idx_market_ticks_instrument_time ON market_ticks (instrument_id, time DESC);
+
+-- One row per exchange trade across all ingestion paths (hypertable unique indexes must include time)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_market_ticks_trade ON market_ticks (symbol, trade_id, time) WHERE trade_id IS NOT NULL;
 
 -- 2. Derivatives Stats (Funding, OI, Greeks)
 CREATE TABLE IF NOT EXISTS derivatives_stats (
@@ -36,11 +66,13 @@ CREATE TABLE IF NOT EXISTS derivatives_stats (
     source TEXT,
     expiry TIMESTAMPTZ, -- Option Expiry
     strike DOUBLE PRECISION, -- Option Strike
-    option_type VARCHAR(4) -- 'CALL' or 'PUT'
+    option_type VARCHAR(4), -- 'CALL' or 'PUT'
+    instrument_id INTEGER
 );
 
 SELECT create_hypertable('derivatives_stats', 'time', if_not_exists => TRUE);
 CREATE INDEX IF NOT EXISTS idx_derivatives_symbol_time ON derivatives_stats (symbol, time DESC);
+CREATE INDEX IF NOT EXISTS idx_derivatives_instrument_time ON derivatives_stats (instrument_id, time DESC);
 
 -- 3. News & Whales (Lower Frequency, Text Heavy)
 CREATE TABLE IF NOT EXISTS news_sentiment (
@@ -50,9 +82,73 @@ CREATE TABLE IF NOT EXISTS news_sentiment (
     currency TEXT,
     sentiment TEXT,
     amount DOUBLE PRECISION, -- For whale transactions
-    raw_data JSONB -- Store extra metadata like specific whale wallet addresses
+    raw_data JSONB, -- Store extra metadata like specific whale wallet addresses
+    content_hash TEXT -- news_items.content_hash; one row per headline (first sighting)
 );
 
 SELECT create_hypertable('news_sentiment', 'time', if_not_exists => TRUE);
 CREATE INDEX IF NOT EXISTS idx_news_time ON news_sentiment (time DESC);
 CREATE INDEX IF NOT EXISTS idx_news_currency ON news_sentiment (currency, time DESC);
+CREATE INDEX IF NOT EXISTS idx_news_hash ON news_sentiment (content_hash);
+
+-- Headline key (see dedup.py): a plain table because a hypertable unique index must
+-- include time. Re-scraped headlines bump last_seen here instead of adding rows.
+CREATE TABLE IF NOT EXISTS news_items (
+    content_hash TEXT PRIMARY KEY, -- blake2b-128 hex of source + normalized title (+ amount)
+    source TEXT NOT NULL,
+    title TEXT,
+    first_seen TIMESTAMPTZ NOT NULL, -- = news_sentiment.time of the stored row
+    last_seen TIMESTAMPTZ NOT NULL,
+    seen_count BIGINT NOT NULL DEFAULT 1 -- Page loads / polls that carried it
+);
+
+CREATE INDEX IF NOT EXISTS idx_news_items_last_seen ON news_items (last_seen DESC);
+
+-- 4. Order Book Snapshots (periodic top-N L2 from the local book engine)
+CREATE TABLE IF NOT EXISTS orderbook_snapshots (
+    time TIMESTAMPTZ NOT NULL,
+    symbol TEXT NOT NULL,
+    source TEXT,
+    mid DOUBLE PRECISION,
+    weighted_mid DOUBLE PRECISION, -- Depth-weighted mid over the stored levels
+    imbalance DOUBLE PRECISION, -- (bid_vol - ask_vol) / (bid_vol + ask_vol)
+    bid_px DOUBLE PRECISION[], -- Best first
+    bid_sz DOUBLE PRECISION[],
+    ask_px DOUBLE PRECISION[],
+    ask_sz DOUBLE PRECISION[],
+    instrument_id INTEGER
+);
+
+SELECT create_hypertable('orderbook_snapshots', 'time', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_orderbook_symbol_time ON orderbook_snapshots (symbol, time DESC);
+CREATE INDEX IF NOT EXISTS idx_orderbook_instrument_time ON orderbook_snapshots (instrument_id, time DESC);
+
+-- 5. Gap Ledger (websocket holes detected by direct_feed and their REST backfill)
+CREATE TABLE IF NOT EXISTS feed_gaps (
+    id BIGSERIAL PRIMARY KEY,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    market TEXT NOT NULL, -- 'binance-futures', 'bybit-linear', ...
+    symbol TEXT NOT NULL,
+    reason TEXT, -- 'reconnect' or 'sequence'
+    from_id BIGINT, -- Missing trade id range, when the venue has sequential ids
+    to_id BIGINT,
+    gap_start TIMESTAMPTZ, -- Last trade before the hole
+    gap_end TIMESTAMPTZ, -- First trade after it
+    status TEXT NOT NULL, -- 'open', 'filled', 'partial', 'failed'
+    rows_filled INTEGER DEFAULT 0,
+    filled_at TIMESTAMPTZ,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_feed_gaps_detected ON feed_gaps (detected_at DESC);
+
+-- 6. Symbol Universe (perpetuals direct_feed is streaming, see universe.py)
+CREATE TABLE IF NOT EXISTS symbol_universe (
+    symbol TEXT PRIMARY KEY, -- Venue symbol, e.g. 'BTCUSDT'
+    rank INTEGER, -- 24h quote volume rank on Binance futures, NULL when not ranked
+    quote_volume DOUBLE PRECISION,
+    pinned BOOLEAN NOT NULL DEFAULT FALSE, -- From UNIVERSE_SYMBOLS / UNIVERSE_FILE
+    active BOOLEAN NOT NULL DEFAULT TRUE, -- Currently subscribed
+    added_at TIMESTAMPTZ NOT NULL DEFAULT now(), -- Start of the current active spell
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
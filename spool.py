@@ -0,0 +1,347 @@
+import os
+import time
+import zlib
+import glob
+import struct
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import psycopg2
+import config
+import metrics
+import bulk_copy
+import instruments
+from tick_records import DERIV, BOOK
+
+logger = logging.getLogger("Spool")
+
+# --- Write-Ahead Spool ---
+# Overflow buffer for when the in-memory write queue is full (slow or restarting
+# Postgres). Records are batched in memory and appended to the active segment as
+# one frame per flush (large sequential writes, no per-tick syscalls). Segments
+# rotate at SPOOL_SEGMENT_BYTES. SpoolReplayer drains closed segments
+# oldest-first in large COPY batches once the live queue has room again. The
+# committed offset of each segment is checkpointed to <segment>.ack, so replay
+# survives restarts. A crash between a batch's commit and its .ack write replays
+# that batch once more: trades are absorbed by the trade-id unique index (the COPY
+# merge is ON CONFLICT DO NOTHING) and news by news_items, but quote / ticker /
+# book rows can then be written twice.
+#
+# With background=True (direct_feed, which appends from the event loop) a full
+# buffer is encoded and written on the spool's own thread; append() only buffers.
+#
+# Frame layout: >II (payload length, crc32) + pickle((SPOOL_FORMAT, entries))
+# An entry is (table, row, instrument key): the row is the plain COPY column
+# tuple, so frames don't depend on the record classes' slots. instrument_id is
+# filled in on replay when the record had no id yet. mitm news dicts are stored
+# as ("news", dict, None). Format 1 frames (pickled record lists) are still read.
+
+_FRAME = struct.Struct(">II")
+SEGMENT_GLOB = "*.seg"
+SPOOL_FORMAT = 2
+NEWS = "news"
+
+
+def spool_entry(record):
+    if isinstance(record, dict):
+        return (NEWS, record, None)
+    inst = record.instrument
+    key = inst.key if inst is not None and inst.instrument_id is None else None
+    if record.kind == DERIV:
+        return ("derivatives_stats", record.deriv_row(), key)
+    if record.kind == BOOK:
+        return ("orderbook_snapshots", record.book_row(), key)
+    return ("market_ticks", record.tick_row(), key)
+
+
+class Spool:
+    def __init__(self, name, directory=None, segment_bytes=None, flush_records=None, background=False):
+        self.name = name
+        self.directory = os.path.join(directory or config.SPOOL_DIR, name)
+        self.segment_bytes = segment_bytes or config.SPOOL_SEGMENT_BYTES
+        self.flush_records = flush_records or config.SPOOL_FLUSH_RECORDS
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()  # Guards the in-memory buffer
+        self._write_lock = threading.Lock()  # Guards the active segment
+        self._pending = []
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix=f"Spool-{name}") if background else None
+        self._scheduled = False  # A background flush is queued
+        existing = self.segments()
+        # Never append to a segment left by a previous run; it may end in a torn frame
+        self._seq = int(os.path.basename(existing[-1])[:-4]) + 1 if existing else 0
+        self._active = None
+        self._active_path = None
+        self._active_size = 0
+        self.m_spilled = metrics.counter("spool_records_spilled_total", spool=name)
+        self.m_depth = metrics.gauge("spool_depth_bytes", spool=name)
+        self.m_segments = metrics.gauge("spool_segments", spool=name)
+        self.refresh_depth()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{seq:012d}.seg")
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_GLOB)))
+
+    def append(self, record):
+        """Buffer one record; written out with the next flush()."""
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.flush_records
+        self.m_spilled.inc()
+        if full:
+            self._flush_full()
+
+    def extend(self, records):
+        """Buffer a whole batch (e.g. one a writer failed to commit)."""
+        with self._lock:
+            self._pending.extend(records)
+            full = len(self._pending) >= self.flush_records
+        self.m_spilled.inc(len(records))
+        if full:
+            self._flush_full()
+
+    def _flush_full(self):
+        if self._executor is None:
+            self.flush()
+            return
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.submit(self.flush)
+
+    def flush(self):
+        """Write buffered records to the active segment as a single frame."""
+        with self._lock:
+            self._scheduled = False
+            if not self._pending:
+                return
+            records, self._pending = self._pending, []
+        # Appends only wait for the swap above; encoding and I/O hold the write lock
+        with self._write_lock:
+            payload = pickle.dumps((SPOOL_FORMAT, [spool_entry(r) for r in records]), protocol=pickle.HIGHEST_PROTOCOL)
+            if self._active is None:
+                self._active_path = self._segment_path(self._seq)
+                self._active = open(self._active_path, "ab")
+                self._active_size = 0
+            self._active.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._active.flush()
+            if config.SPOOL_FSYNC:
+                os.fsync(self._active.fileno())
+            self._active_size += _FRAME.size + len(payload)
+            if self._active_size >= self.segment_bytes:
+                self._rotate()
+        self.refresh_depth()
+
+    def _rotate(self):
+        self._active.close()
+        self._active = None
+        self._active_path = None
+        self._seq += 1
+
+    def closed_segments(self):
+        """Segments safe to replay; if only the active one has data, close it first."""
+        self.flush()
+        with self._write_lock:
+            segments = [s for s in self.segments() if s != self._active_path]
+            if not segments and self._active is not None and self._active_size:
+                self._rotate()
+                segments = [s for s in self.segments() if s != self._active_path]
+        return segments
+
+    def refresh_depth(self):
+        depth, segments = 0, self.segments()
+        for path in segments:
+            try:
+                depth += os.path.getsize(path) - read_ack(path)
+            except OSError:
+                pass
+        self.m_depth.set(depth)
+        self.m_segments.set(len(segments))
+        return depth
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.flush()
+        with self._write_lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+
+
+class NullSpool:
+    """Stand-in for offline runs (ws_replay, bench_pipeline): no directory, no thread, records are discarded."""
+
+    name = None
+
+    def append(self, record):
+        pass
+
+    def extend(self, records):
+        pass
+
+    def flush(self):
+        pass
+
+    def closed_segments(self):
+        return []
+
+    def refresh_depth(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+def read_ack(path):
+    try:
+        with open(path + ".ack") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_ack(path, offset):
+    tmp = path + ".ack.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(offset))
+    os.replace(tmp, path + ".ack")
+
+
+def read_frames(path, offset=0):
+    """Yield (end_offset, entries) for every intact frame after offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+            length, crc = _FRAME.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.error(f"Torn frame in {path} at offset {offset}, skipping rest of segment")
+                return
+            offset += _FRAME.size + length
+            data = pickle.loads(payload)
+            if isinstance(data, list):  # Format 1: pickled records
+                data = (1, [spool_entry(r) for r in data])
+            yield offset, data[1]
+
+
+def copy_entries(cursor, entries):
+    """Load spooled rows into their tables with binary COPY (ids for instruments that had none first)."""
+    keyed = [(i, instruments.intern(*key)) for i, (_, _, key) in enumerate(entries) if key is not None]
+    instruments.resolve([inst for _, inst in keyed], cursor)
+    ids = {i: inst.instrument_id for i, inst in keyed}
+    tables = {}
+    for i, (table, row, _) in enumerate(entries):
+        if table == NEWS:
+            continue
+        if i in ids:
+            row = row[:-1] + (ids[i],)
+        tables.setdefault(table, []).append(row)
+    for table, rows in tables.items():
+        bulk_copy.copy_rows(cursor, table, rows)
+
+
+class SpoolReplayer(threading.Thread):
+    """Flushes the spool's write buffer and drains closed segments back into Postgres.
+
+    ready() gates replay so the backlog only competes for the DB once the live
+    queue has caught up. flush_fn(cursor, entries) defaults to copy_entries.
+    """
+
+    def __init__(self, spool, ready=None, flush_fn=None, batch_rows=None, interval=0.5):
+        super().__init__(name=f"SpoolReplayer-{spool.name}")
+        self.spool = spool
+        self.ready = ready or (lambda: True)
+        self.flush_fn = flush_fn or copy_entries
+        self.batch_rows = batch_rows or config.SPOOL_REPLAY_BATCH
+        self.interval = interval
+        self.daemon = True
+        self.running = True
+        self.conn = None
+        self.m_replayed = metrics.counter("spool_records_replayed_total", spool=spool.name)
+        self.m_rate = metrics.gauge("spool_replay_rows_per_sec", spool=spool.name)
+        self.m_dropped = metrics.counter("spool_records_dropped_total", spool=spool.name)
+
+    def run(self):
+        while self.running:
+            try:
+                self.spool.flush()
+                if self.ready():
+                    for path in self.spool.closed_segments():
+                        if not self.running or not self.ready():
+                            break
+                        self.replay_segment(path)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.error(f"{self.name} DB unavailable, retrying: {e}")
+                self._drop_conn()
+                time.sleep(5)
+            except Exception as e:
+                logger.error(f"{self.name} error: {e}", exc_info=True)
+                self._drop_conn()
+                time.sleep(5)
+            self.m_rate.set(0)
+            time.sleep(self.interval)
+        self.spool.close()
+        self._drop_conn()
+
+    def _drop_conn(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            bulk_copy.reset_staging(self.conn)
+            self.conn = None
+
+    def replay_segment(self, path):
+        if self.conn is None:
+            self.conn = psycopg2.connect(config.DB_URI)
+        batch, end = [], read_ack(path)
+        start = time.time()
+        replayed = 0
+        for offset, entries in read_frames(path, end):
+            batch.extend(entries)
+            end = offset
+            if len(batch) >= self.batch_rows:
+                replayed += self._commit(path, batch, end)
+                batch = []
+                self.m_rate.set(replayed / max(time.time() - start, 1e-6))
+                if not self.running:
+                    return
+        if batch:
+            replayed += self._commit(path, batch, end)
+        os.remove(path)
+        if os.path.exists(path + ".ack"):
+            os.remove(path + ".ack")
+        self.spool.refresh_depth()
+        logger.info(f"{self.name} replayed {os.path.basename(path)} "
+                    f"({replayed} rows in {time.time() - start:.1f}s)")
+
+    def _commit(self, path, batch, end):
+        try:
+            with self.conn.cursor() as cursor:
+                self.flush_fn(cursor, batch)
+            self.conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except Exception as e:
+            # Bad rows, not a DB outage: acknowledge past them so the segment can't wedge replay
+            logger.error(f"{self.name} dropping {len(batch)} unloadable rows from {path}: {e}")
+            self.conn.rollback()
+            bulk_copy.reset_staging(self.conn)
+            write_ack(path, end)
+            self.m_dropped.inc(len(batch))
+            return 0
+        write_ack(path, end)
+        self.m_replayed.inc(len(batch))
+        self.spool.refresh_depth()
+        return len(batch)
+
+    def stop(self):
+        self.running = False
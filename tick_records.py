@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+# --- Tick Records ---
+# Compact, slotted records shared by direct_feed and mitm_parser.
+# The kind tag is set once by the parser that built the record, so writers route
+# with a single int compare instead of probing dict keys / source strings.
+
+TRADE = 0   # Executed print (aggTrade, publicTrade, liquidation)  -> market_ticks
+QUOTE = 1   # Top-of-book / ticker snapshot                        -> market_ticks
+DERIV = 2   # Funding / OI / greeks ticker (perps, options)         -> derivatives_stats
+BOOK = 3    # Periodic top-N L2 snapshot from order_book            -> orderbook_snapshots
+
+KIND_NAMES = {TRADE: "trade", QUOTE: "quote", DERIV: "deriv", BOOK: "book"}
+
+# Trade IDs are only unique within one venue market, so they are stored as
+# "<market>:<id>" (e.g. "binance-futures:1874391277") and both ingestion paths
+# produce the same string for the same print. See dedup.TradeDedup.
+#
+# `instrument` is the interned instruments.Instrument the record was parsed for;
+# its integer id (instrument_id column) is filled in by the writer thread.
+
+
+def _instrument_id(instrument):
+    return None if instrument is None else instrument.instrument_id
+
+
+def trade_key(market, trade_id):
+    return None if trade_id is None else f"{market}:{trade_id}"
+
+
+class Tick:
+    """A market_ticks row (trade or quote)."""
+    __slots__ = ("kind", "timestamp", "symbol", "price", "bid", "ask", "volume", "side", "source",
+                 "trade_id", "instrument", "recv_ts", "enq_ts")
+
+    def __init__(self, kind, timestamp, symbol, price, bid=None, ask=None, volume=None, side=None, source=None,
+                 trade_id=None, instrument=None):
+        self.kind = kind
+        self.timestamp = timestamp  # epoch seconds (float)
+        self.symbol = symbol
+        self.price = price
+        self.bid = bid
+        self.ask = ask
+        self.volume = volume
+        self.side = side
+        self.source = source
+        self.trade_id = trade_id  # trade_key(); None for quotes and venues without IDs
+        self.instrument = instrument
+        self.recv_ts = None  # Socket read / enqueue wall clock, see latency.LatencyTracker
+        self.enq_ts = None
+
+    def tick_row(self):
+        """Column tuple in bulk_copy.TABLES['market_ticks'] order"""
+        return (
+            datetime.fromtimestamp(self.timestamp, timezone.utc),
+            self.symbol, self.price, self.bid, self.ask, self.volume, self.source, self.side,
+            self.trade_id, _instrument_id(self.instrument),
+        )
+
+    def __repr__(self):
+        return f"<{KIND_NAMES.get(self.kind, self.kind)} {self.source} {self.symbol} {self.price}>"
+
+
+class DerivTicker(Tick):
+    """A derivatives_stats row. Keeps the quote fields so conflation/books can still read them."""
+    __slots__ = ("open_interest", "funding_rate", "turnover", "iv", "delta", "gamma",
+                 "expiry", "strike", "option_type")
+
+    def __init__(self, timestamp, symbol, price, bid=None, ask=None, volume=None, side=None, source=None,
+                 open_interest=None, funding_rate=None, turnover=None, iv=None, delta=None, gamma=None,
+                 expiry=None, strike=None, option_type=None, instrument=None):
+        Tick.__init__(self, DERIV, timestamp, symbol, price, bid, ask, volume, side, source, instrument=instrument)
+        self.open_interest = open_interest
+        self.funding_rate = funding_rate
+        self.turnover = turnover
+        self.iv = iv
+        self.delta = delta
+        self.gamma = gamma
+        self.expiry = expiry  # naive datetime (UTC) or None
+        self.strike = strike
+        self.option_type = option_type
+
+    def deriv_row(self):
+        """Column tuple in bulk_copy.TABLES['derivatives_stats'] order"""
+        return (
+            datetime.fromtimestamp(self.timestamp, timezone.utc),
+            self.symbol, self.funding_rate, self.open_interest, self.turnover,
+            self.iv, self.delta, self.gamma, self.source,
+            self.expiry, self.strike, self.option_type, _instrument_id(self.instrument),
+        )
+
+
+class BookSnapshot:
+    """An orderbook_snapshots row: top-N levels as parallel price/size lists plus book analytics."""
+    __slots__ = ("kind", "timestamp", "symbol", "source", "bid_px", "bid_sz", "ask_px", "ask_sz",
+                 "mid", "weighted_mid", "imbalance", "instrument", "recv_ts", "enq_ts")
+
+    def __init__(self, timestamp, symbol, source, bid_px, bid_sz, ask_px, ask_sz,
+                 mid=None, weighted_mid=None, imbalance=None):
+        self.kind = BOOK
+        self.timestamp = timestamp
+        self.symbol = symbol
+        self.source = source
+        self.bid_px = bid_px
+        self.bid_sz = bid_sz
+        self.ask_px = ask_px
+        self.ask_sz = ask_sz
+        self.mid = mid
+        self.weighted_mid = weighted_mid
+        self.imbalance = imbalance
+        self.instrument = None  # Set by the feed when the snapshot is queued
+        self.recv_ts = None
+        self.enq_ts = None
+
+    def book_row(self):
+        """Column tuple in bulk_copy.TABLES['orderbook_snapshots'] order"""
+        return (
+            datetime.fromtimestamp(self.timestamp, timezone.utc),
+            self.symbol, self.source, self.mid, self.weighted_mid, self.imbalance,
+            self.bid_px, self.bid_sz, self.ask_px, self.ask_sz, _instrument_id(self.instrument),
+        )
+
+    def __repr__(self):
+        return f"<book {self.source} {self.symbol} mid={self.mid}>"
@@ -0,0 +1,259 @@
+import os
+import time
+import asyncio
+import logging
+import aiohttp
+import config
+import metrics
+from datetime import datetime, timezone
+
+logger = logging.getLogger("Universe")
+
+# --- Dynamic Symbol Universe ---
+# The perpetuals MarketFeed streams (aggTrade + depth on Binance futures/spot,
+# publicTrade + orderbook on Bybit linear). The universe is:
+#   * pinned symbols: UNIVERSE_FILE (one per line, re-read on every refresh) or
+#     config.UNIVERSE_SYMBOLS, always included, plus
+#   * with UNIVERSE_TOP_N > 0, the N USDT perps with the highest 24h quote volume
+#     on Binance futures. Incumbents keep their slot until they fall below rank
+#     N + UNIVERSE_HYSTERESIS so the boundary doesn't churn every refresh.
+# Every socket owns a Subscription; a change is pushed to the open sockets as
+# incremental SUBSCRIBE / UNSUBSCRIBE (Binance) or op subscribe / unsubscribe
+# (Bybit), like deribit_manager does for option listings. Nothing reconnects and
+# no socket is opened per symbol. The active set is mirrored into the
+# symbol_universe table, which FeatureEngine re-reads every pass.
+
+BYBIT_BOOK_DEPTH = 50
+SEND_BATCH = {"binance": 50, "bybit": 10}  # Topics per subscribe message (Bybit caps args at 10)
+SEND_DELAY = {"binance": 0.25, "bybit": 0.05}  # Binance allows 5-10 inbound messages/s per socket
+
+
+def binance_topics(symbol):
+    low = symbol.lower()
+    return [f"{low}@aggTrade", f"{low}@depth@100ms"]
+
+
+def bybit_topics(symbol):
+    return [f"publicTrade.{symbol}", f"orderbook.{BYBIT_BOOK_DEPTH}.{symbol}"]
+
+
+def bybit_option_topics(coin):
+    return [f"tickers.{coin}"]
+
+
+def read_symbols(path):
+    """Symbols from a universe file: one per line, '#' comments allowed"""
+    with open(path) as f:
+        lines = (line.split("#", 1)[0].strip().upper() for line in f)
+        return [s for s in lines if s]
+
+
+class Subscription:
+    """Topics one websocket should carry. `desired` follows the universe, `live` is what the
+    open socket has been told, so sync() only sends the difference."""
+
+    def __init__(self, name, venue, topics_for, symbols=()):
+        self.name = name
+        self.venue = venue
+        self.topics_for = topics_for
+        self.desired = set()
+        self.live = set()
+        self.ws = None
+        self.lock = asyncio.Lock()
+        self._id = 0
+        self.set_symbols(symbols)
+
+    def set_symbols(self, symbols):
+        self.desired = {t for s in symbols for t in self.topics_for(s)}
+
+    def attach(self, ws, live=()):
+        """Socket is open and already carries `live` (e.g. streams passed in the URL)"""
+        self.ws = ws
+        self.live = set(live)
+
+    def detach(self):
+        self.ws = None
+        self.live = set()
+
+    async def sync(self):
+        async with self.lock:
+            ws = self.ws
+            if ws is None or ws.closed:
+                return  # Replayed in full on the next connect
+            drop = sorted(self.live - self.desired)
+            add = sorted(self.desired - self.live)
+            if drop:
+                await self.send(ws, "unsubscribe", drop)
+                self.live.difference_update(drop)
+            if add:
+                await self.send(ws, "subscribe", add)
+                self.live.update(add)
+            if drop or add:
+                logger.info(f"{self.name}: +{len(add)} / -{len(drop)} topics ({len(self.live)} live)")
+
+    async def send(self, ws, method, topics):
+        size = SEND_BATCH[self.venue]
+        for i in range(0, len(topics), size):
+            batch = topics[i:i + size]
+            if self.venue == "binance":
+                self._id += 1
+                await ws.send_json({"method": method.upper(), "params": batch, "id": self._id})
+            else:
+                await ws.send_json({"op": method, "args": batch})
+            metrics.counter("feed_subscription_msgs_total", stream=self.name, method=method).inc()
+            await asyncio.sleep(SEND_DELAY[self.venue])
+
+
+class SymbolUniverse:
+    def __init__(self, feed):
+        self.feed = feed
+        self.symbols = self.pinned()  # Usable before the first ranking lands
+        self.ranks = {}  # symbol -> (rank, 24h quote volume) from the last ranking
+        self.listed = {}  # market -> set of symbols the venue lists; missing = not checked
+        self.subscriptions = {}  # market -> [Subscription]
+        self.refreshed = False
+
+    def pinned(self):
+        if config.UNIVERSE_FILE and os.path.exists(config.UNIVERSE_FILE):
+            try:
+                return read_symbols(config.UNIVERSE_FILE)
+            except Exception as e:
+                logger.error(f"Unreadable universe file {config.UNIVERSE_FILE}: {e}")
+        return [s.upper() for s in config.UNIVERSE_SYMBOLS]
+
+    def for_market(self, market):
+        listed = self.listed.get(market)
+        return [s for s in self.symbols if listed is None or s in listed]
+
+    def subscription(self, market, name, venue, topics_for):
+        sub = Subscription(name, venue, topics_for, self.for_market(market))
+        self.subscriptions.setdefault(market, []).append(sub)
+        return sub
+
+    # --- Ranking ---
+    async def fetch_json(self, session, venue, url, params=None):
+        proxy = self.feed.proxy_manager.get_proxy(venue)
+        try:
+            async with session.get(url, params=params, proxy=proxy, ssl=False,
+                                   timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+        except Exception as e:
+            self.feed.proxy_manager.report_failure(venue, proxy, e)
+            raise
+
+    async def rank(self):
+        """USDT perps by 24h quote volume (Binance futures), plus spot / Bybit listings"""
+        async with aiohttp.ClientSession() as session:
+            futures, spot, bybit = await asyncio.gather(
+                self.fetch_json(session, "binance", f"{config.BINANCE_FUTURES_REST}/fapi/v1/ticker/24hr"),
+                self.fetch_json(session, "binance", f"{config.BINANCE_SPOT_REST}/api/v3/ticker/price"),
+                self.fetch_json(session, "bybit", f"{config.BYBIT_REST}/v5/market/tickers", {"category": "linear"}),
+                return_exceptions=True)
+        if isinstance(futures, Exception):
+            raise futures
+        # Dated delivery contracts (BTCUSDT_250926) share the endpoint
+        perps = [t for t in futures if t["symbol"].endswith("USDT") and "_" not in t["symbol"]]
+        perps.sort(key=lambda t: float(t.get("quoteVolume") or 0), reverse=True)
+        self.ranks = {t["symbol"]: (i, float(t.get("quoteVolume") or 0)) for i, t in enumerate(perps)}
+        self.listed["binance-futures"] = set(self.ranks)
+        for market, result, extract in (
+                ("binance-spot", spot, lambda r: {t["symbol"] for t in r}),
+                ("bybit-linear", bybit, lambda r: {t["symbol"] for t in r["result"]["list"]})):
+            if isinstance(result, Exception):
+                logger.error(f"{market} listing unavailable, keeping the previous one: {result}")
+                continue
+            self.listed[market] = extract(result)
+        return [t["symbol"] for t in perps]
+
+    def choose(self, pinned, ranked):
+        """Pinned symbols, then incumbents still inside the hysteresis band, then by rank"""
+        top_n = config.UNIVERSE_TOP_N
+        band = top_n + config.UNIVERSE_HYSTERESIS
+        chosen = list(dict.fromkeys(pinned))
+        free = [s for s in ranked if s not in chosen]
+        keep = [s for s in free if s in self.symbols and self.ranks[s][0] < band][:top_n]
+        fill = [s for s in free if s not in keep][:top_n - len(keep)]
+        chosen += sorted(keep + fill, key=lambda s: self.ranks[s][0])
+        return chosen[:config.UNIVERSE_MAX_SYMBOLS]
+
+    # --- Refresh ---
+    async def refresh(self):
+        pinned = self.pinned()
+        wanted = pinned
+        if config.UNIVERSE_TOP_N > 0:
+            try:
+                wanted = self.choose(pinned, await self.rank())
+            except Exception as e:
+                # Keep the current ranked set (and any newly pinned symbols) until the venue answers
+                logger.error(f"Universe ranking failed: {e}")
+                wanted = list(dict.fromkeys(pinned + [s for s in self.symbols if s in self.ranks]))
+
+        added = [s for s in wanted if s not in self.symbols]
+        removed = [s for s in self.symbols if s not in wanted]
+        self.symbols = wanted
+        for market, subs in self.subscriptions.items():
+            symbols = self.for_market(market)
+            for sub in subs:
+                sub.set_symbols(symbols)
+        for symbol in removed:
+            self.feed.forget_symbol(symbol)
+        await asyncio.gather(*(sub.sync() for subs in self.subscriptions.values() for sub in subs))
+
+        metrics.gauge("feed_universe_symbols").set(len(wanted))
+        if added or removed or not self.refreshed:
+            metrics.counter("feed_universe_changes_total", action="added").inc(len(added))
+            metrics.counter("feed_universe_changes_total", action="removed").inc(len(removed))
+            logger.info(f"Universe: {len(wanted)} symbols (+{added} / -{removed})")
+        await self.persist(pinned)
+        self.refreshed = True
+
+    async def refresh_loop(self):
+        while self.feed.running:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Universe refresh error: {e}")
+            await asyncio.sleep(config.UNIVERSE_REFRESH_INTERVAL)
+
+    # --- symbol_universe table ---
+    async def persist(self, pinned):
+        if self.feed.db_pool is None:
+            return
+        rows = [(s, self.ranks.get(s, (None, None))[0], self.ranks.get(s, (None, None))[1], s in pinned)
+                for s in self.symbols]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+        except Exception as e:
+            logger.error(f"symbol_universe write failed: {e}")
+
+    def _write(self, rows):
+        pool = self.feed.db_pool
+        conn = pool.get_conn()
+        now = datetime.fromtimestamp(time.time(), timezone.utc)
+        try:
+            with conn.cursor() as cur:
+                for symbol, rank, volume, pinned in rows:
+                    cur.execute(
+                        "INSERT INTO symbol_universe (symbol, rank, quote_volume, pinned, active, added_at, updated_at) "
+                        "VALUES (%s, %s, %s, %s, TRUE, %s, %s) "
+                        "ON CONFLICT (symbol) DO UPDATE SET rank = EXCLUDED.rank, quote_volume = EXCLUDED.quote_volume, "
+                        "pinned = EXCLUDED.pinned, updated_at = EXCLUDED.updated_at, active = TRUE, "
+                        "added_at = CASE WHEN symbol_universe.active THEN symbol_universe.added_at "
+                        "ELSE EXCLUDED.added_at END",
+                        (symbol, rank, volume, pinned, now, now))
+                cur.execute("UPDATE symbol_universe SET active = FALSE, updated_at = %s "
+                            "WHERE active AND NOT (symbol = ANY(%s))", (now, [r[0] for r in rows]))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.put_conn(conn)
+
+
+def load_active(conn):
+    """Active universe for other services (FeatureEngine), pinned first then by volume rank"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT symbol FROM symbol_universe WHERE active ORDER BY pinned DESC, rank NULLS LAST, symbol")
+        return [row[0] for row in cur.fetchall()]
@@ -0,0 +1,135 @@
+import os
+import glob
+import gzip
+import time
+import struct
+import logging
+import threading
+import config
+
+logger = logging.getLogger("WsCapture")
+
+# --- Raw Websocket Capture ---
+# Writes every raw frame with its receive timestamp to gzip chunk files so a
+# busy session can be replayed offline (see ws_replay.py). A chunk is closed and
+# a new one started every CAPTURE_CHUNK_SECONDS or CAPTURE_CHUNK_FRAMES.
+#
+# Frame layout: >dBHI (recv_ts, is_text, stream name length, payload length)
+#               + stream name (utf-8) + payload
+# The stream name tells the replayer which parser the frame belongs to.
+
+_HEADER = struct.Struct(">dBHI")
+CHUNK_GLOB = "*.frames.gz"
+
+
+class FrameRecorder:
+    def __init__(self, directory, name, chunk_seconds=None, chunk_frames=None):
+        self.directory = directory
+        self.name = name
+        self.chunk_seconds = chunk_seconds or config.CAPTURE_CHUNK_SECONDS
+        self.chunk_frames = chunk_frames or config.CAPTURE_CHUNK_FRAMES
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+        self._frames = 0
+        self._seq = 0
+        self.frames_total = 0
+
+    def _open(self, now):
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now))
+        path = os.path.join(self.directory, f"{self.name}-{stamp}-{self._seq:05d}.frames.gz")
+        self._seq += 1
+        # Level 1: capture must stay cheap next to the live parsers
+        self._file = gzip.open(path, "wb", compresslevel=1)
+        self._opened_at = now
+        self._frames = 0
+        logger.info(f"Capturing frames to {path}")
+
+    def record(self, stream, payload, recv_ts=None):
+        """Append one raw frame (str or bytes) tagged with its stream name."""
+        now = recv_ts or time.time()
+        is_text = isinstance(payload, str)
+        data = payload.encode("utf-8") if is_text else bytes(payload)
+        name = stream.encode("utf-8")
+        with self._lock:
+            if self._file is None or self._frames >= self.chunk_frames or now - self._opened_at >= self.chunk_seconds:
+                self._close_chunk()
+                self._open(now)
+            self._file.write(_HEADER.pack(now, is_text, len(name), len(data)) + name + data)
+            self._frames += 1
+            self.frames_total += 1
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_chunk()
+
+
+def from_config(name):
+    """A FrameRecorder under config.CAPTURE_DIR, or None when capture is off."""
+    if not config.CAPTURE_DIR:
+        return None
+    return FrameRecorder(config.CAPTURE_DIR, name)
+
+
+def chunk_files(path):
+    """Chunk files for a capture directory (or a single chunk file), oldest first."""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(path, CHUNK_GLOB)))
+
+
+def read_frames(path, recorder=None):
+    """Yield (recv_ts, stream, payload) in receive order across all chunks.
+
+    Chunks from several recorders (e.g. direct_feed + mitm_parser) are merged by
+    timestamp unless `recorder` restricts the replay to one of them.
+    """
+    series = _series(chunk_files(path))
+    readers = [_read_chunk_series(files) for name, files in series.items() if recorder in (None, name)]
+    heads = []
+    for reader in readers:
+        frame = next(reader, None)
+        if frame is not None:
+            heads.append((frame, reader))
+    while heads:
+        i = min(range(len(heads)), key=lambda k: heads[k][0][0])
+        frame, reader = heads[i]
+        yield frame
+        nxt = next(reader, None)
+        if nxt is None:
+            heads.pop(i)
+        else:
+            heads[i] = (nxt, reader)
+
+
+def _series(files):
+    """Group chunk files by recorder name (everything before the timestamp)."""
+    groups = {}
+    for f in files:
+        groups.setdefault(os.path.basename(f).rsplit("-", 3)[0], []).append(f)
+    return groups
+
+
+def _read_chunk_series(files):
+    for path in files:
+        try:
+            with gzip.open(path, "rb") as f:
+                while True:
+                    header = f.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    ts, is_text, name_len, data_len = _HEADER.unpack(header)
+                    name = f.read(name_len).decode("utf-8")
+                    data = f.read(data_len)
+                    if len(data) < data_len:
+                        break
+                    yield ts, name, data.decode("utf-8") if is_text else data
+        except (EOFError, OSError) as e:
+            # Chunk cut short by a crash / kill: keep everything before the break
+            logger.warning(f"Truncated capture chunk {path}: {e}")
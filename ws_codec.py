@@ -0,0 +1,120 @@
+import time
+import zlib
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Websocket Payload Codecs ---
+# permessage-deflate is undone by mitmproxy itself (wsproto), so message content
+# is only compressed when the venue compresses at the application level: gzip or
+# zlib per message, raw deflate with or without context takeover (also what an
+# unhandled x-webkit-deflate-frame extension leaves behind), occasionally brotli.
+#
+# One FlowDecoder per websocket flow picks the codec without trial and error:
+#   text frames / binary starting with '{' or '[' -> plain UTF-8
+#   1f 8b                                         -> gzip (one shot per message)
+#   zlib header (CMF/FLG check)                   -> zlib stream
+#   no magic                                      -> raw deflate, else brotli
+# A stream codec (zlib / deflate / brotli) is locked for the flow, and zlib and
+# deflate keep one decompressobj for it, so context-takeover streams (messages
+# that continue the previous one's window and carry no header) decode. A locked
+# codec that fails is dropped and the message is sniffed again.
+#
+# Counters: <service>_ws_frames_total{codec}, <service>_ws_decode_cpu_seconds_total{codec}
+# (thread CPU time; "undecodable" counts frames no codec could read).
+
+TEXT, PLAIN, GZIP, ZLIB, DEFLATE, BROTLI = "text", "plain", "gzip", "zlib", "deflate", "brotli"
+UNDECODABLE = "undecodable"
+SYNC_TAIL = b"\x00\x00\xff\xff"  # Empty stored block senders strip from each flushed message (RFC 7692)
+CODECS = (TEXT, PLAIN, GZIP, ZLIB, DEFLATE, BROTLI, UNDECODABLE)
+
+_counters = {}
+
+
+def _meters(service):
+    meters = _counters.get(service)
+    if meters is None:
+        meters = _counters[service] = (
+            {c: metrics.counter(f"{service}_ws_frames_total", codec=c) for c in CODECS},
+            {c: metrics.counter(f"{service}_ws_decode_cpu_seconds_total", codec=c) for c in CODECS})
+    return meters
+
+
+def sniff(content):
+    """Codec from the leading bytes, None when the payload has no magic"""
+    if content[:1] in (b"{", b"["):
+        return PLAIN
+    if content[:2] == b"\x1f\x8b":
+        return GZIP
+    if len(content) > 1 and content[0] & 0x0f == 8 and content[0] >> 4 <= 7 and (content[0] << 8 | content[1]) % 31 == 0:
+        return ZLIB
+    return None
+
+
+def hint_from_handshake(headers):
+    """Codec announced in the 101 response; permessage-deflate never reaches us deflated"""
+    ext = (headers.get("sec-websocket-extensions", "") if headers else "").lower()
+    if "deflate-frame" in ext:
+        return DEFLATE
+    return None
+
+
+class FlowDecoder:
+    """Codec state of one websocket flow. Not thread-safe: the ws parse lane is sharded so
+    one worker sees all frames of a flow."""
+
+    def __init__(self, hint=None, service="mitm"):
+        self.codec = hint  # Locked stream codec, None until one is seen
+        self.inflater = None
+        self.frames, self.cpu = _meters(service)
+
+    def decode(self, content, is_text=False):
+        """Message payload as str, None if no codec can read it"""
+        start = time.thread_time()
+        codec, text = self._decode(content, is_text)
+        self.frames[codec].inc()
+        self.cpu[codec].inc(time.thread_time() - start)
+        return text
+
+    def _decode(self, content, is_text):
+        if not isinstance(content, (bytes, bytearray)):
+            return TEXT, str(content)
+        if is_text:
+            return TEXT, content.decode("utf-8", "replace")
+        if self.codec is not None:
+            try:
+                return self.codec, self._stream(content)
+            except Exception:  # zlib.error, brotli.error, UnicodeDecodeError
+                self.codec, self.inflater = None, None  # Flow switched codec / new stream: sniff again
+        codec = sniff(content)
+        try:
+            if codec == PLAIN:
+                return PLAIN, content.decode("utf-8")
+            if codec == GZIP:
+                return GZIP, zlib.decompress(content, 16 + zlib.MAX_WBITS).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError):
+            pass  # '{' / '[' can also open a fixed-Huffman deflate block
+        for candidate in ((ZLIB,) if codec == ZLIB else (DEFLATE, BROTLI)):
+            if candidate == BROTLI and brotli is None:
+                continue
+            self.codec, self.inflater = candidate, None
+            try:
+                return candidate, self._stream(content)
+            except Exception:
+                self.codec, self.inflater = None, None
+        return UNDECODABLE, None
+
+    def _stream(self, content):
+        if self.codec == BROTLI:
+            return brotli.decompress(content).decode("utf-8")
+        if self.inflater is None:
+            self.inflater = zlib.decompressobj(zlib.MAX_WBITS if self.codec == ZLIB else -zlib.MAX_WBITS)
+        data = content if content.endswith(SYNC_TAIL) else content + SYNC_TAIL
+        text = self.inflater.decompress(data).decode("utf-8")
+        if self.inflater.eof:
+            # The message closed its stream (per-message compression): the next one starts afresh
+            self.codec, self.inflater = None, None
+        return text
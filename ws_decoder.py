@@ -0,0 +1,223 @@
+import json
+from typing import List, Optional, Union
+import config
+
+# --- Websocket Frame Decoders ---
+# One decode(raw) callable per venue. It returns the envelope dict that
+# MarketFeed.parse_* expects, or None for frames we never parse (acks, pongs,
+# topics nobody reads).
+#
+# Backends (config.WS_DECODER):
+#   "msgspec" -> schema-typed: only the fields the parsers read are materialized,
+#                payloads of unwanted topics are never decoded (msgspec.Raw)
+#   "orjson"  -> fast generic decode
+#   "json"    -> stdlib fallback
+#   "auto"    -> best installed of the above
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson else json.loads
+
+# Substrings a frame must contain to be worth decoding at all (generic backends)
+MARKERS = {
+    "binance": ("aggTrade", "depth"),
+    "bybit": ("publicTrade", "orderbook", "tickers"),
+    "deribit": ('"params"',),
+}
+_BYTE_MARKERS = {venue: tuple(m.encode() for m in marks) for venue, marks in MARKERS.items()}
+
+
+def backend_name(preferred=None):
+    preferred = preferred or config.WS_DECODER
+    if preferred == "auto":
+        if msgspec: return "msgspec"
+        if orjson: return "orjson"
+        return "json"
+    if preferred == "msgspec" and not msgspec: return "orjson" if orjson else "json"
+    if preferred == "orjson" and not orjson: return "json"
+    return preferred
+
+
+def loads(raw):
+    """Generic full decode with the fastest installed library"""
+    return _loads(raw)
+
+
+def _generic_decoder(venue, loads_fn):
+    markers, byte_markers = MARKERS[venue], _BYTE_MARKERS[venue]
+
+    def decode(raw):
+        marks = byte_markers if isinstance(raw, (bytes, bytearray)) else markers
+        if not any(m in raw for m in marks):
+            return None
+        data = loads_fn(raw)
+        if venue == "deribit" and "params" not in data:
+            return None
+        return data
+    return decode
+
+
+# --- Typed Schemas (msgspec only) ---
+if msgspec is not None:
+    class Fields(msgspec.Struct):
+        """dict-style .get() so parse_* work unchanged on typed payloads"""
+        def get(self, key, default=None):
+            value = getattr(self, key, None)
+            return default if value is None else value
+
+    # Binance combined stream
+    class BinanceAggTrade(Fields):
+        a: Optional[int] = None  # Aggregate trade id (dedup / gap detection)
+        s: Optional[str] = None
+        p: Optional[str] = None
+        q: Optional[str] = None
+        m: Optional[bool] = None
+        T: Optional[int] = None
+
+    class BinanceDepth(Fields):
+        s: Optional[str] = None
+        E: Optional[int] = None
+        T: Optional[int] = None
+        U: Optional[int] = None
+        u: Optional[int] = None
+        pu: Optional[int] = None
+        b: List[List[str]] = []
+        a: List[List[str]] = []
+
+    class BinanceEnvelope(msgspec.Struct):
+        stream: str = ""
+        data: msgspec.Raw = msgspec.Raw()
+
+    # Bybit v5 public
+    class BybitTrade(Fields):
+        i: Optional[str] = None  # Trade id
+        T: Optional[int] = None
+        s: Optional[str] = None
+        S: Optional[str] = None
+        v: Optional[str] = None
+        p: Optional[str] = None
+
+    class BybitBook(Fields):
+        s: Optional[str] = None
+        b: List[List[str]] = []
+        a: List[List[str]] = []
+        u: Optional[int] = None
+        seq: Optional[int] = None
+
+    class BybitOptionTicker(Fields):
+        symbol: Optional[str] = None
+        lastPrice: Optional[str] = None
+        bid1Price: Optional[str] = None
+        ask1Price: Optional[str] = None
+        volume24h: Optional[str] = None
+        open_interest: Optional[str] = None
+        markIv: Optional[str] = None
+        delta: Optional[str] = None
+        gamma: Optional[str] = None
+
+    class BybitEnvelope(msgspec.Struct):
+        topic: str = ""
+        ts: Optional[int] = None
+        type: Optional[str] = None
+        data: msgspec.Raw = msgspec.Raw()
+
+    # Deribit JSON-RPC subscription notifications
+    class DeribitGreeks(Fields):
+        delta: Optional[float] = None
+        gamma: Optional[float] = None
+
+    class DeribitStats(Fields):
+        volume: Optional[float] = None
+
+    class DeribitTicker(Fields):
+        instrument_name: Optional[str] = None
+        timestamp: Optional[int] = None
+        last_price: Optional[float] = None
+        mark_iv: Optional[float] = None
+        best_bid_price: Optional[float] = None
+        best_ask_price: Optional[float] = None
+        open_interest: Optional[float] = None
+        funding_8h: Optional[float] = None
+        current_funding: Optional[float] = None
+        greeks: Optional[DeribitGreeks] = None
+        stats: Optional[DeribitStats] = None
+
+    class DeribitParams(msgspec.Struct):
+        channel: str = ""
+        data: msgspec.Raw = msgspec.Raw()
+
+    class DeribitFrame(msgspec.Struct):
+        params: Optional[DeribitParams] = None
+
+    # topic substring -> payload schema, checked in order
+    SCHEMAS = {
+        "binance": [("aggTrade", BinanceAggTrade), ("depth", BinanceDepth)],
+        "bybit": [("publicTrade", List[BybitTrade]), ("orderbook", BybitBook),
+                  ("tickers", Union[List[BybitOptionTicker], BybitOptionTicker])],
+        "deribit": [("ticker", DeribitTicker)],
+    }
+
+    def _typed_decoder(venue):
+        schemas = [(topic, msgspec.json.Decoder(schema)) for topic, schema in SCHEMAS[venue]]
+        fallback = _generic_decoder(venue, _loads)
+
+        def payload(topic, raw):
+            for marker, decoder in schemas:
+                if marker in topic:
+                    return decoder.decode(raw)
+            return None
+
+        if venue == "binance":
+            envelope = msgspec.json.Decoder(BinanceEnvelope)
+
+            def decode(raw):
+                try:
+                    env = envelope.decode(raw)
+                    data = payload(env.stream, env.data)
+                    return None if data is None else {"stream": env.stream, "data": data}
+                except (msgspec.ValidationError, msgspec.DecodeError):
+                    return fallback(raw)
+
+        elif venue == "bybit":
+            envelope = msgspec.json.Decoder(BybitEnvelope)
+
+            def decode(raw):
+                try:
+                    env = envelope.decode(raw)
+                    data = payload(env.topic, env.data)
+                    return None if data is None else {"topic": env.topic, "ts": env.ts, "type": env.type, "data": data}
+                except (msgspec.ValidationError, msgspec.DecodeError):
+                    return fallback(raw)
+
+        else:
+            envelope = msgspec.json.Decoder(DeribitFrame)
+
+            def decode(raw):
+                try:
+                    frame = envelope.decode(raw)
+                    if frame.params is None:
+                        return None
+                    data = payload(frame.params.channel, frame.params.data)
+                    return None if data is None else {"params": {"channel": frame.params.channel, "data": data}}
+                except (msgspec.ValidationError, msgspec.DecodeError):
+                    return fallback(raw)
+
+        return decode
+
+
+def get_decoder(venue, preferred=None):
+    """decode(raw) -> envelope dict or None, for 'binance' | 'bybit' | 'deribit'"""
+    name = backend_name(preferred)
+    if name == "msgspec":
+        return _typed_decoder(venue)
+    if name == "orjson":
+        return _generic_decoder(venue, orjson.loads)
+    return _generic_decoder(venue, json.loads)
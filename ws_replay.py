@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import queue
+import asyncio
+import argparse
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import config
+
+os.makedirs(config.LOG_DIR, exist_ok=True)
+import ws_capture
+from lane_queue import LaneQueue
+from spool import NullSpool
+
+# --- Websocket Replay Driver ---
+# Feeds a capture (see ws_capture) back through MarketFeed.parse_* or
+# CryptoParser.websocket_message with no network and no database.
+#   --speed 1   -> original pacing
+#   --speed 10  -> 10x faster
+#   --speed 0   -> as fast as possible (throughput run)
+# Reports frames/s, records produced, per-frame parse time and, when paced,
+# how far delivery fell behind schedule.
+
+UNBOUNDED = 10 ** 9
+RECORDERS = {"feed": "direct_feed", "mitm": "mitm_parser"}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def feed_target():
+    import direct_feed
+    feed = direct_feed.MarketFeed(None, None, spool=NullSpool())
+    feed.running = False  # No book resync / reconnect tasks; REST snapshots come from the capture
+    feed.write_queue = LaneQueue(UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    decoders = feed.decoders
+
+    async def dispatch(stream, payload):
+        if stream.startswith("binance_rest|"):
+            _, source, symbol, futures = stream.split("|")
+            feed.books.on_binance_snapshot(source, symbol, json.loads(payload), futures == "1")
+            await feed.persist_book(source, symbol, "binance-futures" if futures == "1" else "binance-spot")
+            return
+        venue = stream.split("_")[0]
+        data = decoders[venue](payload)
+        if data is None:
+            return
+        if stream == "binance":
+            await feed.parse_binance(data)
+        elif stream == "binance_spot":
+            await feed.parse_binance(data, source_suffix="_Spot")
+        elif venue == "bybit":
+            await feed.parse_bybit(data)
+        elif venue == "deribit":
+            await feed.parse_deribit(data["params"])
+
+    def drain():
+        n = 0
+        while feed.write_queue.qsize():
+            n += len(feed.write_queue.get_batch_nowait(10000))
+        return n
+
+    return dispatch, drain
+
+
+def mitm_target():
+    import mitm_parser
+    parser = mitm_parser.CryptoParser(start_writer=False)
+    parser.queue = queue.Queue()  # Unbounded: measure the parser, not the spool
+    flows = {}  # One flow per captured stream, so per-flow routing / decoder state is reused
+
+    async def dispatch(stream, payload):
+        flow = flows.get(stream)
+        if flow is None:
+            flow = flows[stream] = SimpleNamespace(
+                id=stream, metadata={}, request=SimpleNamespace(pretty_url=stream, pretty_host=urlsplit(stream).hostname or ""),
+                websocket=SimpleNamespace(messages=[None]))
+        flow.websocket.messages[-1] = SimpleNamespace(content=payload, is_text=isinstance(payload, str))
+        parser.websocket_message(flow)
+
+    def drain():
+        n = 0
+        while True:
+            try:
+                parser.queue.get_nowait()
+                n += 1
+            except queue.Empty:
+                return n
+
+    return dispatch, drain
+
+
+async def replay(frames, dispatch, drain, speed):
+    parse_us, lag_ms = [], []
+    produced = count = 0
+    first_ts = None
+    start = time.perf_counter()
+    for ts, stream, payload in frames:
+        if first_ts is None:
+            first_ts = ts
+        if speed > 0:
+            due = start + (ts - first_ts) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag_ms.append(max(0.0, time.perf_counter() - due) * 1000)
+        t0 = time.perf_counter()
+        await dispatch(stream, payload)
+        parse_us.append((time.perf_counter() - t0) * 1e6)
+        count += 1
+        if count % 1000 == 0:
+            produced += drain()
+    produced += drain()
+    return count, produced, time.perf_counter() - start, parse_us, lag_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured websocket frames through the parsers")
+    parser.add_argument("path", help="Capture directory (CAPTURE_DIR) or a single .frames.gz chunk")
+    parser.add_argument("--target", choices=["feed", "mitm"], default="feed")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = realtime, N = N x faster, 0 = max")
+    args = parser.parse_args()
+
+    dispatch, drain = feed_target() if args.target == "feed" else mitm_target()
+    frames = ws_capture.read_frames(args.path, RECORDERS[args.target])
+    count, produced, elapsed, parse_us, lag_ms = asyncio.run(replay(frames, dispatch, drain, args.speed))
+
+    pace = "max" if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"--- Replay {args.path} -> {args.target} ({pace}) ---")
+    print(f"frames    {count} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} frames/s)")
+    print(f"records   {produced}")
+    print(f"parse     p50 {percentile(parse_us, 50):.1f}us  p99 {percentile(parse_us, 99):.1f}us")
+    if lag_ms:
+        print(f"lag       p50 {percentile(lag_ms, 50):.2f}ms  p99 {percentile(lag_ms, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())